@@ -8,11 +8,12 @@ from trasim_simplified.util.flow_basic.basic_diagram import BasicDiagram
 
 
 def run_basic_diagram(cf_name_, tau_, is_jam_, cf_param_, initial_v=0., random_v=False,
-                      car_length_=5., start=0.01, end=1., step=0.02, plot=True, resume=False, parallel=True):
+                      car_length_=5., start=0.01, end=1., step=0.02, plot=True, resume=False, parallel=True,
+                      batch=False):
     diag = BasicDiagram(1000, car_length_, initial_v, random_v, cf_mode=cf_name_, cf_param=cf_param_)
     diag.run(start, end, step, resume=resume, file_name="result_" + cf_name_ + ("_jam" if is_jam_ else "") +
                                                         f"_{initial_v}_{random_v}",
-             dt=tau_, jam=is_jam_, state_update_method="Euler", parallel=parallel)
+             dt=tau_, jam=is_jam_, state_update_method="Euler", parallel=parallel, batch=batch)
     diag.get_by_equilibrium_state_func()
     if plot: diag.plot()
 
@@ -42,4 +43,4 @@ if __name__ == '__main__':
     # cf_param = {"omega": 0.8, "v0": 30}
     car_length = 5
     run_basic_diagram(cf_name, tau, False, cf_param, car_length_=car_length, initial_v=speed, resume=False,
-                      parallel=True)
+                      parallel=True, batch=True)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 18:02
+# @Author : yzbyx
+# @File : run_ctm_road.py
+# Software: PyCharm
+from trasim_simplified.core.constant import CFM
+from trasim_simplified.core.frame.macro.ctm_road import CTM_Road
+from trasim_simplified.util.timer import timer_no_log
+
+
+@timer_no_log
+def run_ctm_road():
+    dt = 1
+    warm_up_step = 0
+    sim_step = warm_up_step + int(600 / dt)
+
+    sim = CTM_Road()
+    main = sim.add_segment(2)
+    ramp = sim.add_segment(1)
+    down = sim.add_segment(2)
+    for lane in main:
+        lane.cell_config(50, 20, CFM.IDM, {}, 5, speed_limit=30., initial_density=5 / 1000)
+        lane.boundary_condition_config(5, flow_in=800)
+    ramp[0].cell_config(50, 5, CFM.IDM, {}, 5, speed_limit=20., initial_density=5 / 1000)
+    ramp[0].boundary_condition_config(5, flow_in=400)
+    for lane in down:
+        lane.cell_config(50, 20, CFM.IDM, {}, 5, speed_limit=30., initial_density=5 / 1000)
+    # 匝道汇入外侧车道，匝道优先级低于主线
+    sim.add_junction(main + ramp, down, turning=[[1, 0], [0, 1], [0, 1]], priority=[1, 1, 0.5])
+    sim.set_lane_change(0.1)
+
+    for step in sim.run(data_save=True, has_ui=True, frame_rate=10,
+                        warm_up_step=warm_up_step, sim_step=sim_step, dt=dt):
+        if step % 60 == 0:
+            print(step, [round(float(lane.cell_flow.mean() * 3600)) for lane in sim.lane_list])
+
+
+if __name__ == '__main__':
+    run_ctm_road()
@@ -3,18 +3,37 @@
 # @Author : yzbyx
 # @File : data_container.py
 # @Software : PyCharm
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Union
 
+import numpy as np
 import pandas as pd
 
-from trasim_simplified.core.constant import TrackInfo as Info
+from trasim_simplified.core.constant import TrackInfo as Info, V_TYPE
+from trasim_simplified.core.data.data_store import TrajectoryStore
+from trasim_simplified.core.kinematics.cfm import get_cf_id
+from trasim_simplified.core.kinematics.lcm import get_lc_id
+from trasim_simplified.msg.trasimError import TrasimError
 
 
 if TYPE_CHECKING:
+    from trasim_simplified.core.data.data_sink import TrajectorySink
     from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
+    from trasim_simplified.core.vehicle import Vehicle
 
 
 class DataContainer:
+    """
+    车道轨迹数据的列式记录器
+
+    每个仿真步将车道上所有车辆的各项记录信息一次性写入预分配的分块数组，仿真完成后按列拼接为DataFrame
+    """
+    CHUNK_SIZE = 2 ** 16
+    """每个数据块的行数"""
+    INT_INFO = {Info.lane_add_num, Info.id, Info.step, Info.car_type, Info.cf_id, Info.lc_id}
+    """整数类型的记录信息，其余为浮点数"""
+    _VEHICLE_INFO = {Info.safe_picud: "picud", Info.safe_picud_KK: "picud_KK"}
+    """逐车计算的记录信息"""
+
     def __init__(self, lane_abstract: 'LaneAbstract'):
         self.lane = lane_abstract
         self.data_pd: Optional[pd.DataFrame] = None
@@ -22,6 +41,25 @@ class DataContainer:
         self.total_car_list_has_data = None
         self.data_df: Optional[pd.DataFrame] = None
 
+        self._chunks: dict[str, list[np.ndarray]] = {}
+        """记录信息对应的数据块"""
+        self._chunk_row = 0
+        """最后一个数据块已写入的行数"""
+        self.row_num = 0
+        """已记录的总行数"""
+        self._column_cache: dict[str, tuple[np.ndarray, int]] = {}
+        """多个数据块时拼接的整列数据及其有效行数，写入新数据后只追加新增的行"""
+        self._car_rows: dict[int, tuple[np.ndarray, int]] = {}
+        """车辆ID对应的行号及其数量，查询单车数据时增量建立"""
+        self._car_rows_num = 0
+        self._car_data: dict[tuple[int, str], tuple[np.ndarray, int]] = {}
+        """(车辆ID, 记录信息)对应的单车历史数据及其数量，查询时只追加新记录的行"""
+
+        self.sink: Optional['TrajectorySink'] = None
+        """轨迹数据的流式输出，为None时数据全部保存在内存中"""
+        self._window = -1
+        """内存中数据所属的仿真步窗口"""
+
     def config(self, save_info=None, basic_info=True):
         """默认包含车辆ID"""
         if basic_info:
@@ -34,16 +72,237 @@ class DataContainer:
     def add_basic_info(self):
         self.save_info.update([Info.lane_add_num, Info.id, Info.time, Info.step])
 
+    def stream_to(self, path: str, flush_step: int = 1000, file_format: str = "parquet"):
+        """
+        将轨迹数据按仿真步窗口流式写入Parquet/Arrow数据集，内存中只保留当前窗口的数据
+
+        单车的历史数据（Vehicle.pos_list等）此时只包含当前窗口
+
+        :param path: 数据集目录
+        :param flush_step: 每个窗口的仿真步数
+        :param file_format: parquet或arrow
+        """
+        from trasim_simplified.core.data.data_sink import TrajectorySink  # 只在流式输出时导入pyarrow
+        self.sink = TrajectorySink(path, self.lane.add_num, flush_step, file_format)
+
+    def record(self):
+        """记录当前仿真步车道上所有车辆（障碍物除外）的数据"""
+        columns = self._get_step_columns()
+        if columns is None:
+            return
+        if self.sink is not None:
+            # 进入新的窗口前输出上一窗口的数据，保证内存中始终包含当前仿真步
+            window = self.lane.step_ // self.sink.flush_step
+            if window != self._window:
+                self.flush()
+                self._window = window
+        self._write(columns, len(columns[Info.id]))
+
+    def flush(self):
+        """将内存中的数据写入流式输出并清空，仿真结束（包括提前结束）时由run调用"""
+        if self.sink is None or self.row_num == 0:
+            return
+        self.sink.write({info: self.get_column(info) for info in self._chunks}, self._window)
+        self._chunks.clear()
+        self._chunk_row = 0
+        self.row_num = 0
+        self._column_cache.clear()
+        self._car_rows.clear()
+        self._car_rows_num = 0
+        self._car_data.clear()
+
+    def _get_step_columns(self) -> Optional[dict[str, Union[np.ndarray, float, int]]]:
+        lane = self.lane
+        state = lane.array_state
+        use_state = state is not None and not state.stale and state.car_num == len(lane.car_list)
+        if use_state:
+            order = state.get_order()
+            is_car = order[state.type[order] != V_TYPE.OBSTACLE]  # 按car_list顺序排列的非障碍物槽位
+            car_list = [state.car_list[i] for i in is_car]
+        else:
+            car_list = [car for car in lane.car_list if car.type != V_TYPE.OBSTACLE]
+        if len(car_list) == 0:
+            return None
+
+        # 车辆ID与仿真步始终记录，用于单车数据的查询
+        columns = {Info.id: state.ID[is_car] if use_state else np.array([car.ID for car in car_list]),
+                   Info.step: lane.step_}
+        for info in self.save_info:
+            if info in columns:
+                continue
+            if info == Info.lane_add_num:
+                value = lane.add_num
+            elif info == Info.time:
+                value = lane.time_
+            elif info == Info.Preceding_ID:
+                value = np.array([car.leader.ID if car.leader is not None else np.nan for car in car_list],
+                                 dtype=float)
+            elif info == Info.car_type:
+                value = state.type[is_car] if use_state else np.array([car.type for car in car_list])
+            elif info == Info.v_Length:
+                value = state.length[is_car] if use_state else np.array([car.length for car in car_list])
+            elif info == Info.cf_id:
+                value = np.array([get_cf_id(car.cf_model.name) for car in car_list])
+            elif info == Info.lc_id:
+                value = np.array([get_lc_id(None if car.lc_model is None else car.lc_model.name)
+                                  for car in car_list])
+            elif info in (Info.x, Info.v, Info.a):
+                name = {Info.x: "x", Info.v: "v", Info.a: "a"}[info]
+                value = getattr(state, name)[is_car] if use_state else \
+                    np.array([getattr(car, name) for car in car_list], dtype=float)
+            elif info in (Info.dv, Info.gap, Info.dhw, Info.thw, Info.safe_ttc, Info.safe_tit, Info.safe_tet):
+                value = self._get_safe_column(info, state, is_car, car_list) if use_state else \
+                    np.array([car.get_record_value(info) for car in car_list], dtype=float)
+            elif info in self._VEHICLE_INFO:
+                value = np.array([getattr(car, self._VEHICLE_INFO[info]) for car in car_list], dtype=float)
+            else:
+                raise TrasimError(f"{info}未创建！")
+            columns[info] = value
+        return columns
+
+    @staticmethod
+    def _get_safe_column(info, state, is_car, car_list: list['Vehicle']) -> np.ndarray:
+        """由数组化车道状态计算间距与安全指标，与Vehicle中对应属性的定义一致"""
+        dhw, gap, dv = state.dhw[is_car], state.gap[is_car], state.dv[is_car]
+        if info == Info.dv:
+            return dv
+        if info == Info.gap:
+            return gap
+        if info == Info.dhw:
+            return dhw
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if info == Info.thw:
+                return np.where(dv != 0, dhw / (- dv), np.nan)
+            ttc = np.where(dv != 0, gap / (- dv), np.nan)
+        if info == Info.safe_ttc:
+            return ttc
+        ttc_star = np.array([car.ttc_star for car in car_list], dtype=float)
+        in_range = (0 <= ttc) & (ttc <= ttc_star)
+        if info == Info.safe_tit:
+            return np.where(in_range, ttc_star - ttc, 0.)
+        return in_range.astype(float)
+
+    def _new_chunk(self, columns: dict):
+        for info in columns:
+            dtype = int if info in self.INT_INFO else float
+            chunks = self._chunks.setdefault(info, [])
+            if len(chunks) == 0 and self.row_num > 0:
+                raise TrasimError(f"{info}需要在仿真开始前配置！")
+            chunks.append(np.empty(self.CHUNK_SIZE, dtype=dtype))
+        self._chunk_row = 0
+
+    def _write(self, columns: dict, row_num: int):
+        start = 0
+        while start < row_num:
+            if len(self._chunks) == 0 or self._chunk_row == self.CHUNK_SIZE:
+                self._new_chunk(columns)
+            num = min(row_num - start, self.CHUNK_SIZE - self._chunk_row)
+            for info, value in columns.items():
+                self._chunks[info][-1][self._chunk_row: self._chunk_row + num] = \
+                    value if np.isscalar(value) else value[start: start + num]
+            self._chunk_row += num
+            start += num
+        self.row_num += row_num
+
+    @staticmethod
+    def _append(cache: dict, key, value: np.ndarray) -> np.ndarray:
+        """向cache[key]的缓冲数组（容量按倍数增长）追加value，返回追加后的有效数据"""
+        buffer, num = cache.get(key, (None, 0))
+        end = num + len(value)
+        if buffer is None or end > len(buffer):
+            new_buffer = np.empty(max(2 * end, 16), dtype=value.dtype)
+            if buffer is not None:
+                new_buffer[:num] = buffer[:num]
+            buffer = new_buffer
+        buffer[num: end] = value
+        cache[key] = (buffer, end)
+        return buffer[:end]
+
+    def _get_rows(self, chunks: list[np.ndarray], start: int, end: int) -> np.ndarray:
+        """获取数据块中[start, end)行的数据"""
+        size = self.CHUNK_SIZE
+        return np.concatenate([chunks[i][max(start - i * size, 0): min(end - i * size, size)]
+                               for i in range(start // size, (end - 1) // size + 1)])
+
+    def get_column(self, info: str) -> np.ndarray:
+        """获取已记录的整列数据，只有一个数据块时返回其视图"""
+        chunks = self._chunks.get(info, None)
+        if chunks is None:
+            raise TrasimError(f"{info}未记录！")
+        if len(chunks) == 1:
+            return chunks[0][:self._chunk_row]
+        buffer, num = self._column_cache.get(info, (None, 0))
+        if num == self.row_num:
+            return buffer[:num]
+        return self._append(self._column_cache, info, self._get_rows(chunks, num, self.row_num))
+
     def data_to_df(self):
-        data: dict[str, list] = {info: [] for info in self.save_info}
-        total_car_list_has_data = self.get_total_car_has_data()
         info_list = list(self.save_info)
-        for info in info_list:
-            for car in total_car_list_has_data:
-                data[info].extend(car.get_data_list(info))
-        self.data_df = pd.DataFrame(data, columns=info_list).sort_values(by=[Info.id, Info.time]).reset_index(drop=True)
+        if self.sink is not None:
+            self.flush()
+        if self.sink is not None and self.sink.part_num != 0:
+            data = self.sink.get_dataset().read(lane=self.lane.add_num, columns=info_list)
+        elif self.row_num == 0:
+            data = {info: np.empty(0, dtype=int if info in self.INT_INFO else float) for info in info_list}
+        else:
+            data = {info: self.get_column(info) for info in info_list}
+        self.data_df = pd.DataFrame(data, columns=info_list, copy=False)\
+            .sort_values(by=[Info.id, Info.time]).reset_index(drop=True)
         return self.data_df
 
+    def get_columns(self) -> dict[str, np.ndarray]:
+        """获取全部已记录的列数据（包括已流式输出的部分），始终包含车道编号、车辆ID与仿真步"""
+        if self.sink is not None:
+            self.flush()
+            if self.sink.part_num == 0:
+                return {}
+            df = self.sink.get_dataset().read(lane=self.lane.add_num)
+            columns = {info: df[info].to_numpy() for info in df.columns}
+        elif self.row_num == 0:
+            return {}
+        else:
+            columns = {info: self.get_column(info) for info in self._chunks}
+        if Info.lane_add_num not in columns:
+            columns[Info.lane_add_num] = np.full(len(columns[Info.id]), self.lane.add_num)
+        return columns
+
+    def to_store(self, path: str) -> TrajectoryStore:
+        """将轨迹数据写入内存映射存储，供DataProcessor与Plot按需读取"""
+        return TrajectoryStore.write(path, self.get_columns())
+
+    def _update_car_rows(self):
+        if self._car_rows_num == self.row_num:
+            return
+        rows = np.arange(self._car_rows_num, self.row_num)
+        ids = self.get_column(Info.id)[rows]
+        order = np.argsort(ids, kind="stable")
+        ids, rows = ids[order], rows[order]
+        split_index = np.where(np.diff(ids) != 0)[0] + 1
+        for id_, rows_ in zip(ids[np.concatenate([[0], split_index])], np.split(rows, split_index)):
+            self._append(self._car_rows, int(id_), rows_)
+        self._car_rows_num = self.row_num
+
+    def get_car_rows(self, car_id: int) -> np.ndarray:
+        """获取指定车辆在本车道记录的行号（按记录顺序）"""
+        self._update_car_rows()
+        buffer, num = self._car_rows.get(car_id, (None, 0))
+        if buffer is None:
+            return np.empty(0, dtype=int)
+        return buffer[:num]
+
+    def has_data(self, car_id: int):
+        return len(self.get_car_rows(car_id)) != 0
+
+    def get_car_data(self, car_id: int, info: str) -> np.ndarray:
+        """获取指定车辆在本车道记录的单项数据（按记录顺序）"""
+        rows = self.get_car_rows(car_id)
+        if len(rows) == 0:
+            return np.empty(0)
+        buffer, num = self._car_data.get((car_id, info), (None, 0))
+        if num == len(rows):
+            return buffer[:num]
+        return self._append(self._car_data, (car_id, info), self.get_column(info)[rows[num:]])
+
     def get_total_car_has_data(self):
         """仿真完成后调用"""
         if self.total_car_list_has_data is None:
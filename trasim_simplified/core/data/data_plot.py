@@ -17,6 +17,7 @@ from matplotlib.colors import Colormap
 
 
 from trasim_simplified.core.data.data_processor import Info as P_Info, DataProcessor, DetectLoopInfo as DLI
+from trasim_simplified.core.data.data_store import TrajectoryStore, get_df
 try:
     from trasim_simplified.core.constant import TrackInfo as C_Info
 except ImportError:
@@ -154,7 +155,7 @@ class Plot:
 
     @staticmethod
     def spatial_time_plot(
-        data_df: pd.DataFrame,
+        data_df: Union[pd.DataFrame, TrajectoryStore],
         car_id=-1,
         lane_add_num=0,
         color_info_name=None,
@@ -167,7 +168,19 @@ class Plot:
         color_bar=True,
         cmap_name="rainbow",
         frame_rate=10,
+        raster=False,
+        raster_shape: tuple[int, int] = (1000, 1500),
     ):
+        """
+        绘制时空图，所有车辆的轨迹线段一次性生成并绘制为一个LineCollection
+
+        :param raster: 是否将时空图累积为图像绘制（像素值为经过该像素的轨迹颜色值的平均），适用于车辆数很多的情况
+        :param raster_shape: 图像的像素数（位置方向, 时间方向）
+        """
+        data_df = get_df(data_df, lane_add_num, columns=[
+            C_Info.lane_add_num, C_Info.id, C_Info.step, C_Info.time, C_Info.x,
+            C_Info.v if color_info_name is None else color_info_name
+        ])
         if C_Info.lane_add_num in data_df.columns:
             data_df = data_df[data_df[C_Info.lane_add_num] == lane_add_num]
 
@@ -205,41 +218,121 @@ class Plot:
         cmap: Colormap = plt.get_cmap(cmap_name)
         cmap.set_over("w")
         cmap.set_under("k")
-        for id_ in data_df[C_Info.id].unique():
-            if car_id != id_ and single_plot:
-                continue
-            car_info = data_df[data_df[C_Info.id] == id_]
-            car_info = car_info.sort_values(by=[C_Info.time]).reset_index(drop=True)
-            color_data_single = car_info[color_info_name]
-            temp_ = car_info[C_Info.x]
-            pos_ = car_info[C_Info.x]
-            time_ = car_info[C_Info.time]
-            step_ = car_info[C_Info.step]
-            for time__, temp__, pos in DataProcessor.data_shear(
-                temp_, pos_, time_, step_
-            ):
-                if pos[1] - pos[0] > 1:
-                    Plot._lines_color(
-                        ax,
-                        time__,
-                        temp__,
-                        color_data_single[pos[0] : pos[1]],
-                        value_range,
-                        cmap,
-                        line_width=base_line_width
-                        if car_id != id_
-                        else base_line_width * 5,
-                    )
+        id_s = data_df[C_Info.id].to_numpy()
+        pos_s = data_df[C_Info.x].to_numpy(dtype=float)
+        time_s = data_df[C_Info.time].to_numpy(dtype=float)
+        color_s = data_df[color_info_name].to_numpy(dtype=float)
+        start = Plot._segment_start_index(id_s, data_df[C_Info.step].to_numpy(), pos_s)
+        is_target = id_s[start] == car_id
+        if single_plot:
+            start, is_target = start[is_target], is_target[is_target]
+
+        if raster:
+            Plot._raster_segments(
+                ax, time_s, pos_s, color_s, start[~is_target], value_range, cmap, raster_shape
+            )
+        else:
+            Plot._segments_color(
+                ax, time_s, pos_s, color_s, start[~is_target], value_range, cmap, base_line_width
+            )
+        # 目标车辆的轨迹绘制在最上层
+        Plot._segments_color(
+            ax, time_s, pos_s, color_s, start[is_target], value_range, cmap, base_line_width * 5
+        )
 
         if color_bar:
             cb: Colorbar = fig.colorbar(
                 ScalarMappable(
                     mc.Normalize(vmin=value_range[0], vmax=value_range[1]), cmap
-                )
+                ),
+                ax=ax,
             )
             cb.set_label(color_bar_name)
         return fig, ax
 
+    @staticmethod
+    def _segment_start_index(id_: np.ndarray, step: np.ndarray, pos: np.ndarray) -> np.ndarray:
+        """
+        按(车辆ID, 时间)排序的轨迹点中，与下一个点连成线段的点的序号
+
+        同一车辆、仿真步连续且位置未折返（环形边界）的相邻两点连成线段，与data_shear的分割方式一致
+        """
+        is_link = (np.diff(id_) == 0) & (np.diff(step) == 1) & (np.diff(pos) >= 0)
+        return np.flatnonzero(is_link)
+
+    @staticmethod
+    def _segments_color(
+        ax, data_x, data_y, color_value, start, value_range, cmap, line_width=0.2
+    ):
+        """将start对应的线段（start与start + 1两点）绘制为一个LineCollection"""
+        if len(start) == 0:
+            return None
+        seg = np.stack(
+            [np.column_stack([data_x[start], data_y[start]]),
+             np.column_stack([data_x[start + 1], data_y[start + 1]])],
+            axis=1,
+        )
+        lc = mcoll.LineCollection(
+            seg, colors=cmap(Plot._normalize(color_value[start], value_range)), linewidths=line_width
+        )
+        # 直接由端点范围更新坐标轴范围，避免逐条线段计算
+        ax.add_collection(lc, autolim=False)
+        ax.update_datalim([
+            (min(data_x[start].min(), data_x[start + 1].min()), min(data_y[start].min(), data_y[start + 1].min())),
+            (max(data_x[start].max(), data_x[start + 1].max()), max(data_y[start].max(), data_y[start + 1].max())),
+        ])
+        ax.autoscale(True)
+        return lc
+
+    @staticmethod
+    def _normalize(value: np.ndarray, value_range) -> np.ndarray:
+        if value_range[1] - value_range[0] != 0:
+            return (value - value_range[0]) / (value_range[1] - value_range[0])
+        return value
+
+    @staticmethod
+    def _raster_segments(
+        ax, data_x, data_y, color_value, start, value_range, cmap, shape
+    ):
+        """将start对应的线段按像素采样累积为图像并绘制，像素值为采样点颜色值的平均"""
+        row_num, col_num = shape
+        if len(start) == 0:
+            return None
+        end = start + 1
+        x_range = (min(data_x[start].min(), data_x[end].min()), max(data_x[start].max(), data_x[end].max()))
+        y_range = (min(data_y[start].min(), data_y[end].min()), max(data_y[start].max(), data_y[end].max()))
+        x_scale = (col_num - 1) / (x_range[1] - x_range[0]) if x_range[1] > x_range[0] else 0
+        y_scale = (row_num - 1) / (y_range[1] - y_range[0]) if y_range[1] > y_range[0] else 0
+        col_0, col_1 = (data_x[start] - x_range[0]) * x_scale, (data_x[end] - x_range[0]) * x_scale
+        row_0, row_1 = (data_y[start] - y_range[0]) * y_scale, (data_y[end] - y_range[0]) * y_scale
+
+        # 每条线段按跨越的像素数均匀采样，保证相邻采样点不跨越像素
+        sample_num = np.maximum(np.ceil(np.maximum(np.abs(col_1 - col_0), np.abs(row_1 - row_0))), 1).astype(int)
+        seg_index = np.repeat(np.arange(len(start)), sample_num)
+        offset = np.arange(len(seg_index)) - np.repeat(np.cumsum(sample_num) - sample_num, sample_num)
+        ratio = offset / sample_num[seg_index]
+        col = np.rint(col_0[seg_index] + (col_1 - col_0)[seg_index] * ratio).astype(int)
+        row = np.rint(row_0[seg_index] + (row_1 - row_0)[seg_index] * ratio).astype(int)
+        pixel = row * col_num + col
+        value = color_value[start][seg_index]
+        is_valid = ~np.isnan(value)
+
+        count = np.bincount(pixel[is_valid], minlength=row_num * col_num)
+        value_sum = np.bincount(pixel[is_valid], weights=value[is_valid], minlength=row_num * col_num)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            image = (value_sum / count).reshape(row_num, col_num)
+        im = ax.imshow(
+            image,
+            origin="lower",
+            extent=(x_range[0], x_range[1], y_range[0], y_range[1]),
+            aspect="auto",
+            interpolation="nearest",
+            cmap=cmap,
+            vmin=value_range[0],
+            vmax=value_range[1],
+        )
+        return im
+
     @staticmethod
     def remove_outliers(data: np.ndarray):
         data = data[~np.isnan(data)]
@@ -266,12 +359,7 @@ class Plot:
         color_value = np.array(color_value).reshape(-1)
         color_value = color_value[:-1]
         seg = np.array([(a, b) for a, b in zip(points[:-1], points[1:])])
-
-        if value_range[1] - value_range[0] != 0:
-            color_value = (color_value - value_range[0]) / (
-                value_range[1] - value_range[0]
-            )
-        colors = cmap(color_value)
+        colors = cmap(Plot._normalize(color_value, value_range))
         lc = mcoll.LineCollection(seg, colors=colors, linewidths=line_width)
 
         ax.add_collection(lc)
@@ -304,7 +392,7 @@ class Plot:
 
     @staticmethod
     def plot_density_map(
-        df: pd.DataFrame,
+        df: Union[pd.DataFrame, TrajectoryStore],
         lane_id: int,
         dt: float,
         d_step: int,
@@ -321,40 +409,12 @@ class Plot:
             ax: plt.Axes = ax
             ax.set_title(titles[i])
 
-        full_df = df.copy()
-
-        df = df[df[C_Info.lane_add_num] == lane_id]
-
-        k = []
-        q = []
-        v = []
-
-        if step_range is None:
-            step_range = (df[C_Info.step].min(), df[C_Info.step].max())
-
-        time_sections = np.arange(step_range[0], step_range[1] + 1, d_step)
+        result, time_sections, space_sections = DataProcessor.aggregate_edie_grid(
+            df, lane_id, dt, d_step, d_space, step_range=step_range, space_range=space_range
+        )
         time_sections_zip = list(zip(time_sections[:-1], time_sections[1:]))
-
-        if space_range is None:
-            space_range = (df[C_Info.x].min(), df[C_Info.x].max())
-
-        space_sections = np.arange(space_range[0], space_range[1] + 1e-6, d_space)
         space_sections_zip = list(zip(space_sections[:-1], space_sections[1:]))
-
-        for start, _ in space_sections_zip:
-            _, result = DataProcessor.aggregate_as_detect_loop(
-                full_df,
-                lane_id,
-                lane_length=np.inf,
-                pos=start,
-                width=d_space,
-                dt=dt,
-                d_step=d_step,
-                step_range=step_range,
-            )
-            k.append(result[DLI.HCM_kA])
-            q.append(result[DLI.HCM_qA])
-            v.append(result[DLI.HCM_vA])
+        k, q, v = result[DLI.HCM_kA], result[DLI.HCM_qA], result[DLI.HCM_vA]
 
         for i, ax in enumerate(axes):
             data = np.array(k if i == 0 else (q if i == 1 else v))
@@ -9,6 +9,8 @@ from typing import Union
 import numpy as np
 import pandas as pd
 
+from trasim_simplified.core.data.data_store import TrajectoryStore, get_df
+
 try:
     from traj_process.tools import Info as C_Info
 except ImportError:
@@ -16,6 +18,9 @@ except ImportError:
 
 
 class DataProcessor:
+    DETECT_LOOP_COLUMNS = [C_Info.lane_add_num, C_Info.id, C_Info.step, C_Info.time, C_Info.x, C_Info.v]
+    """aggregate_as_detect_loop需要的记录信息"""
+
     @staticmethod
     def print(result: Union[dict, tuple]):
         if isinstance(result, tuple):
@@ -54,8 +59,10 @@ class DataProcessor:
         }
 
     @staticmethod
-    def aggregate(df: pd.DataFrame, lane_id: int, lane_length: float):
+    def aggregate(df: Union[pd.DataFrame, TrajectoryStore], lane_id: int, lane_length: float):
         """集计指标计算"""
+        df = get_df(df, lane_id, columns=[C_Info.lane_add_num, C_Info.id, C_Info.step, C_Info.a, C_Info.v,
+                                          C_Info.gap, C_Info.dv, C_Info.dhw, C_Info.thw])
         if lane_id >= 0:
             df = df[df[C_Info.lane_add_num] == lane_id]
         aggregate_all_result = {}
@@ -118,7 +125,7 @@ class DataProcessor:
 
     @staticmethod
     def aggregate_as_detect_loop(
-        df: pd.DataFrame,
+        df: Union[pd.DataFrame, TrajectoryStore],
         lane_id: int,
         lane_length: float,
         pos: float,
@@ -130,7 +137,7 @@ class DataProcessor:
         """
         以传感线圈的方式检测交通参数（HCM的平均速度定义）
 
-        :param df: 车辆的基础数据
+        :param df: 车辆的基础数据，或内存映射存储（只加载对应车道需要的列）
         :param lane_id: 车道ID
         :param lane_length: 道路长度 [m], 开边界一般就填大数
         :param step_range: 总的检测始末仿真时刻(两个数)
@@ -140,6 +147,7 @@ class DataProcessor:
         :param d_step: 每个检测周期的总仿真步
         :return: 包含顺序集计交通参数列表的字典
         """
+        df = get_df(df, lane_id, columns=DataProcessor.DETECT_LOOP_COLUMNS)
         if lane_id >= 0:
             df = df[df[C_Info.lane_add_num] == lane_id]
         min_width = dt * np.max(df[C_Info.v])
@@ -151,92 +159,49 @@ class DataProcessor:
             is_return = True
             end_pos -= lane_length
 
+        x = df[C_Info.x].to_numpy()
         if not is_return:
-            pos_in = df[(pos <= df[C_Info.x]) & (df[C_Info.x] <= end_pos)]
+            is_in = (pos <= x) & (x <= end_pos)
         else:
-            pos_in = df[(pos <= df[C_Info.x]) | (df[C_Info.x] <= end_pos)]
+            is_in = (pos <= x) | (x <= end_pos)
 
         if step_range is None:
             step_range = (df[C_Info.step].min(), df[C_Info.step].max())
 
         time_sections = np.arange(step_range[0], step_range[1] + 1, d_step)
-        time_sections_zip = zip(time_sections[:-1], time_sections[1:])
-
-        # 计算时间平均车速
-        # 每辆车的地点车速为线圈范围内速度点的平均（前提是数据点之间的采样时间间隔相同）
-        time_avg_speed_list = []
-        space_avg_speed_by_time_avg_speed_list = []
-        q_list = []  # veh/s
-        time_occ_list = []
-        # HCM计算方式
-        d_A_list = []
-        t_A_list = []
+        time_block_num = len(time_sections) - 1
         area_A = width * d_step * dt
 
-        aggregate_loop_result = {}
-        aggregate_Edie_result = {}
+        step = df[C_Info.step].to_numpy()
+        time_block = (step - time_sections[0]) // d_step
+        is_in &= (step >= time_sections[0]) & (time_block < time_block_num)
 
-        for time_start, time_end in time_sections_zip:
-            d_a = 0
-            t_a = 0
-            car_num_in = 0
-            avg_speed_list_per_traj = []  # 每段轨迹的平均速度
-
-            for id_ in df[C_Info.id].unique():
-                single_data = pos_in[pos_in[C_Info.id] == id_]
-                single_data = single_data[
-                    (single_data[C_Info.time] >= time_start)
-                    & (single_data[C_Info.time] < time_end)
-                ]
-                single_data = single_data.sort_values(by=[C_Info.step]).reset_index(
-                    drop=True
-                )
-
-                for time, speed, pos in DataProcessor.data_shear(
-                    single_data[C_Info.v].to_numpy(),
-                    single_data[C_Info.x].to_numpy(),
-                    single_data[C_Info.time].to_numpy(),
-                    single_data[C_Info.step].to_numpy(),
-                    shear_pos=False,
-                    shear_step=True,
-                ):
-                    if len(time) == 0:
-                        continue
-
-                    avg_speed_list_per_traj.append(np.mean(speed))
-
-                    pos_data = single_data[C_Info.x][pos[0] : pos[1]].to_numpy()
-                    if pos_data[0] > pos_data[-1]:
-                        #  如果轨迹点折返
-                        d_a += lane_length - pos_data[0] + pos_data[-1]
-                    else:
-                        d_a += pos_data[-1] - pos_data[0]
-
-                    t_a += time[-1] - time[0]
-
-                    # 行驶距离补偿
-                    d_a += (speed[0] + speed[-1]) / 2 * dt
-                    # 行驶时间补偿
-                    t_a += dt
-
-                    car_num_in += 1
-            steps_has_car = len(
-                pos_in[
-                    (pos_in[C_Info.time] >= time_start)
-                    & (pos_in[C_Info.time] < time_end)
-                ]
-            )
-
-            time_avg_speed_list.append(np.mean(avg_speed_list_per_traj))  # 时间平均车速
+        # 线圈范围内的轨迹按照（时间块, 车辆, 连续仿真步）划分为轨迹段，一次性计算各段的行驶距离与时间
+        segment = DataProcessor._get_segments(
+            df[C_Info.id].to_numpy()[is_in], step[is_in], time_block[is_in],
+            x[is_in], df[C_Info.v].to_numpy()[is_in], df[C_Info.time].to_numpy()[is_in], lane_length, dt
+        )
+        block, d_seg, t_seg, v_seg = segment
+        car_num_in = np.bincount(block, minlength=time_block_num)
+        steps_has_car = np.bincount(time_block[is_in], minlength=time_block_num)
+        d_A = np.bincount(block, weights=d_seg, minlength=time_block_num)
+        t_A = np.bincount(block, weights=t_seg, minlength=time_block_num)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # 每辆车的地点车速为线圈范围内速度点的平均（前提是数据点之间的采样时间间隔相同）
+            time_avg_speed = np.bincount(block, weights=v_seg, minlength=time_block_num) / car_num_in
             # 地点车速的调和平均为空间平均车速
-            space_avg_speed_by_time_avg_speed_list.append(
-                1 / np.mean(1 / np.array(avg_speed_list_per_traj))
-            )
-            q_list.append(car_num_in / (d_step * dt))
-            time_occ_list.append(steps_has_car / d_step)
+            space_avg_speed = car_num_in / np.bincount(block, weights=1 / v_seg, minlength=time_block_num)
+
+        time_avg_speed_list = time_avg_speed.tolist()
+        space_avg_speed_by_time_avg_speed_list = space_avg_speed.tolist()
+        q_list = (car_num_in / (d_step * dt)).tolist()  # veh/s
+        time_occ_list = (steps_has_car / d_step).tolist()
+        # HCM计算方式
+        d_A_list = d_A.tolist()
+        t_A_list = t_A.tolist()
 
-            d_A_list.append(d_a)
-            t_A_list.append(t_a)
+        aggregate_loop_result = {}
+        aggregate_Edie_result = {}
 
         aggregate_loop_result["loop_q(veh/h)"] = (np.array(q_list) * 3600).tolist()
         aggregate_loop_result["loop_time_occ"] = time_occ_list
@@ -272,6 +237,99 @@ class DataProcessor:
 
         return aggregate_loop_result, aggregate_Edie_result
 
+    @staticmethod
+    def aggregate_edie_grid(
+        df: Union[pd.DataFrame, TrajectoryStore],
+        lane_id: int,
+        dt: float,
+        d_step: int,
+        d_space: float,
+        step_range: Sequence[int, int] = None,
+        space_range: Sequence[float, float] = None,
+    ):
+        """
+        时空网格上的HCM(Edie)集计，一次遍历得到所有网格的流量、密度与速度
+
+        环形边界的轨迹在返回点处断开，网格边界上的轨迹点归入下游网格（最后一个网格包含终点）
+
+        :param df: 车辆的基础数据，或内存映射存储
+        :param lane_id: 车道ID
+        :param dt: 仿真步长 [s]
+        :param d_step: 每个时间块的仿真步数
+        :param d_space: 每个空间块的长度 [m]
+        :param step_range: 总的检测始末仿真步
+        :param space_range: 总的检测始末位置 [m]
+        :return: ({集计指标: 矩阵（空间块 × 时间块）}, 时间块分界仿真步, 空间块分界位置)
+        """
+        df = get_df(df, lane_id, columns=DataProcessor.DETECT_LOOP_COLUMNS)
+        if lane_id >= 0:
+            df = df[df[C_Info.lane_add_num] == lane_id]
+        min_width = dt * np.max(df[C_Info.v])
+        assert d_space > min_width, f"至少将空间块的长度设置在{min_width}以上！"
+
+        if step_range is None:
+            step_range = (df[C_Info.step].min(), df[C_Info.step].max())
+        if space_range is None:
+            space_range = (df[C_Info.x].min(), df[C_Info.x].max())
+        time_sections = np.arange(step_range[0], step_range[1] + 1, d_step)
+        space_sections = np.arange(space_range[0], space_range[1] + 1e-6, d_space)
+        time_block_num, space_block_num = len(time_sections) - 1, len(space_sections) - 1
+
+        step, x = df[C_Info.step].to_numpy(), df[C_Info.x].to_numpy()
+        time_block = (step - time_sections[0]) // d_step
+        space_block = np.floor((x - space_sections[0]) / d_space).astype(int)
+        space_block[(space_block == space_block_num) & (x <= space_sections[-1])] = space_block_num - 1
+        is_in = (step >= time_sections[0]) & (time_block < time_block_num) & \
+                (x >= space_sections[0]) & (space_block < space_block_num)
+        block = space_block[is_in] * time_block_num + time_block[is_in]
+
+        block, d_seg, t_seg, _ = DataProcessor._get_segments(
+            df[C_Info.id].to_numpy()[is_in], step[is_in], block, x[is_in], df[C_Info.v].to_numpy()[is_in],
+            df[C_Info.time].to_numpy()[is_in], np.inf, dt, shear_pos=True
+        )
+        shape = (space_block_num, time_block_num)
+        d_A = np.bincount(block, weights=d_seg, minlength=shape[0] * shape[1]).reshape(shape)
+        t_A = np.bincount(block, weights=t_seg, minlength=shape[0] * shape[1]).reshape(shape)
+        area_A = d_space * d_step * dt
+        with np.errstate(divide="ignore", invalid="ignore"):
+            v_A = d_A / t_A
+        result = {
+            DetectLoopInfo.HCM_dA: d_A,
+            DetectLoopInfo.HCM_tA: t_A,
+            DetectLoopInfo.HCM_A: area_A,
+            DetectLoopInfo.HCM_qA: d_A / area_A * 3600,
+            DetectLoopInfo.HCM_kA: t_A / area_A * 1000,
+            DetectLoopInfo.HCM_vA: v_A,
+            DetectLoopInfo.HCM_vA_KPH: v_A * 3.6,
+        }
+        return result, time_sections, space_sections
+
+    @staticmethod
+    def _get_segments(id_: np.ndarray, step: np.ndarray, block: np.ndarray, x: np.ndarray, v: np.ndarray,
+                      time: np.ndarray, lane_length: float, dt: float, shear_pos=False):
+        """
+        将轨迹点按照（分块, 车辆ID）以及仿真步的连续性划分为轨迹段
+
+        :param block: 轨迹点所属的时空分块编号
+        :param shear_pos: 是否在位置返回点（环形边界）处断开轨迹，否则折返的距离按lane_length补偿
+        :return: (轨迹段所属分块, 行驶距离 [m], 行驶时间 [s], 平均速度 [m/s])
+        """
+        order = np.lexsort((step, id_, block))
+        id_, step, block, x, v, time = id_[order], step[order], block[order], x[order], v[order], time[order]
+        is_start = np.ones(len(order), dtype=bool)
+        is_start[1:] = (block[1:] != block[:-1]) | (id_[1:] != id_[:-1]) | (np.diff(step) != 1)
+        if shear_pos:
+            is_start[1:] |= np.diff(x) < 0
+        start = np.flatnonzero(is_start)
+        end = np.append(start[1:], len(order)) - 1
+
+        d_seg = x[end] - x[start]
+        d_seg[x[start] > x[end]] += lane_length  # 轨迹点折返
+        d_seg += (v[start] + v[end]) / 2 * dt  # 行驶距离补偿
+        t_seg = time[end] - time[start] + dt  # 行驶时间补偿
+        v_seg = np.add.reduceat(v, start) / (end - start + 1) if len(start) != 0 else np.empty(0)
+        return block[start], d_seg, t_seg, v_seg
+
     @staticmethod
     def data_shear(
         temp_=None, pos_=None, time_=None, step_=None, shear_pos=True, shear_step=True
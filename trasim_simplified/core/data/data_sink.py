@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 17:40
+# @Author : yzbyx
+# @File : data_sink.py
+# Software: PyCharm
+import json
+import os
+import shutil
+from typing import Iterator, Optional, Union, Sequence
+
+import numpy as np
+import pandas as pd
+
+from trasim_simplified.core.constant import TrackInfo as Info
+from trasim_simplified.msg.trasimError import TrasimError
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = feather = pq = None
+
+
+def _check_pyarrow():
+    if pa is None:
+        raise TrasimError("轨迹数据的流式读写需要安装pyarrow！")
+
+
+class TrajectorySink:
+    """
+    轨迹数据的流式输出
+
+    按照车道与仿真步窗口分区（lane=车道编号/window=仿真步 // flush_step），每个窗口的数据写入一个Parquet/Arrow文件
+    """
+    FILE_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+    META_FILE = "_meta.json"
+    """数据集信息文件，以下划线开头，读取数据集时会被忽略"""
+
+    def __init__(self, path: str, lane_add_num: int, flush_step: int = 1000, file_format: str = "parquet"):
+        _check_pyarrow()
+        if file_format not in self.FILE_FORMATS:
+            raise TrasimError(f"{file_format}格式不支持！可选格式为{list(self.FILE_FORMATS.keys())}")
+        self.path = path
+        self.lane_add_num = lane_add_num
+        self.flush_step = int(flush_step)
+        """单个文件包含的仿真步数"""
+        self.file_format = file_format
+        self.part_num = 0
+        """当前车道已写入的文件数"""
+
+        lane_dir = os.path.join(self.path, f"lane={self.lane_add_num}")
+        if os.path.isdir(lane_dir):
+            shutil.rmtree(lane_dir)  # 清除该车道上一次仿真的输出
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, self.META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"flush_step": self.flush_step, "file_format": self.file_format}, f)
+
+    def write(self, columns: dict[str, np.ndarray], window: int):
+        """将一个仿真步窗口内的列数据写入数据集"""
+        table = pa.table(columns)
+        dir_ = os.path.join(self.path, f"lane={self.lane_add_num}", f"window={int(window)}")
+        os.makedirs(dir_, exist_ok=True)
+        file = os.path.join(dir_, f"part-{self.part_num:05d}{self.FILE_FORMATS[self.file_format]}")
+        if self.file_format == "parquet":
+            pq.write_table(table, file)
+        else:
+            feather.write_feather(table, file, compression="uncompressed")
+        self.part_num += 1
+
+    def get_dataset(self) -> 'TrajectoryDataset':
+        return TrajectoryDataset(self.path)
+
+
+class TrajectoryDataset:
+    """
+    流式输出的轨迹数据集，按车道、车辆ID范围、仿真步范围惰性读取
+
+    范围均为左闭右开区间 [start, end)，None代表不限制
+    """
+    PARTITION_FIELDS = ["lane", "window"]
+
+    def __init__(self, path: str):
+        _check_pyarrow()
+        self.path = path
+        with open(os.path.join(path, TrajectorySink.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.flush_step: int = meta["flush_step"]
+        self.file_format: str = meta["file_format"]
+        self.dataset = ds.dataset(path, format="parquet" if self.file_format == "parquet" else "ipc",
+                                  partitioning="hive")
+
+    @property
+    def lanes(self) -> list[int]:
+        """数据集中包含的车道编号"""
+        lanes = {ds.get_partition_keys(fragment.partition_expression).get("lane", None)
+                 for fragment in self.dataset.get_fragments()}
+        return sorted(int(lane) for lane in lanes if lane is not None)
+
+    def _get_filter(self, lane: Optional[Union[int, Sequence[int]]],
+                    id_range: Optional[tuple[Optional[int], Optional[int]]],
+                    step_range: Optional[tuple[Optional[int], Optional[int]]]):
+        conditions = []
+        if lane is not None:
+            lane = [lane] if isinstance(lane, (int, np.integer)) else list(lane)
+            conditions.append(ds.field("lane").isin(lane))
+        if id_range is not None:
+            if id_range[0] is not None:
+                conditions.append(ds.field(Info.id) >= id_range[0])
+            if id_range[1] is not None:
+                conditions.append(ds.field(Info.id) < id_range[1])
+        if step_range is not None:
+            # 先按窗口分区过滤文件，再按仿真步过滤行
+            if step_range[0] is not None:
+                conditions.append(ds.field("window") >= step_range[0] // self.flush_step)
+                conditions.append(ds.field(Info.step) >= step_range[0])
+            if step_range[1] is not None:
+                conditions.append(ds.field("window") <= (step_range[1] - 1) // self.flush_step)
+                conditions.append(ds.field(Info.step) < step_range[1])
+        if len(conditions) == 0:
+            return None
+        expression = conditions[0]
+        for condition in conditions[1:]:
+            expression = expression & condition
+        return expression
+
+    def _get_columns(self, columns: Optional[Sequence[str]]):
+        if columns is None:
+            return [name for name in self.dataset.schema.names if name not in self.PARTITION_FIELDS]
+        return list(columns)
+
+    def read(self, lane: Optional[Union[int, Sequence[int]]] = None,
+             id_range: Optional[tuple[Optional[int], Optional[int]]] = None,
+             step_range: Optional[tuple[Optional[int], Optional[int]]] = None,
+             columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        读取满足条件的轨迹数据
+
+        :param lane: 车道编号（lane_add_num）或其列表
+        :param id_range: 车辆ID范围
+        :param step_range: 仿真步范围
+        :param columns: 读取的列，None代表全部
+        """
+        table = self.dataset.to_table(columns=self._get_columns(columns),
+                                      filter=self._get_filter(lane, id_range, step_range))
+        return table.to_pandas()
+
+    def iter_batches(self, lane: Optional[Union[int, Sequence[int]]] = None,
+                     id_range: Optional[tuple[Optional[int], Optional[int]]] = None,
+                     step_range: Optional[tuple[Optional[int], Optional[int]]] = None,
+                     columns: Optional[Sequence[str]] = None,
+                     batch_size: int = 2 ** 16) -> Iterator[pd.DataFrame]:
+        """与read相同，但按批次逐个返回，用于数据量超出内存的情况"""
+        for batch in self.dataset.to_batches(columns=self._get_columns(columns),
+                                             filter=self._get_filter(lane, id_range, step_range),
+                                             batch_size=batch_size):
+            if batch.num_rows != 0:
+                yield batch.to_pandas()
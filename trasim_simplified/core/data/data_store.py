@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 18:20
+# @Author : yzbyx
+# @File : data_store.py
+# Software: PyCharm
+import json
+import os
+from typing import Optional, Sequence, Union, Iterator
+
+import numpy as np
+import pandas as pd
+
+from trasim_simplified.core.constant import TrackInfo as Info
+from trasim_simplified.msg.trasimError import TrasimError
+
+
+class TrajectoryStore:
+    """
+    基于内存映射的轨迹数据存储
+
+    每列数据保存为一个.npy文件，行按照(车辆ID, 仿真步)排序，同一车辆的轨迹连续存放；
+    另外保存每辆车的起始行号以及按仿真步排序的行号索引，读取时只加载需要的行
+    """
+    META_FILE = "meta.json"
+    WRITE_BLOCK = 2 ** 20
+    """写入时每次处理的行数"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, self.META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.columns: list[str] = meta["columns"]
+        """包含的记录信息"""
+        self.row_num: int = meta["row_num"]
+        self._mmaps: dict[str, np.ndarray] = {}
+
+        self.ids = self._load("_ids")
+        """按升序排列的车辆ID"""
+        self.id_offsets = self._load("_id_offsets")
+        """车辆ID对应的起始行号，长度为车辆数 + 1"""
+        self.steps = self._load("_steps")
+        """按升序排列的仿真步"""
+        self.step_offsets = self._load("_step_offsets")
+        """仿真步在step_rows中的起始位置，长度为仿真步数 + 1"""
+        self.step_rows = self._load("_step_rows")
+        """按照仿真步排序的行号"""
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r")
+
+    @classmethod
+    def write(cls, path: str, columns: dict[str, np.ndarray]) -> 'TrajectoryStore':
+        """
+        将列数据写入存储目录
+
+        :param path: 存储目录
+        :param columns: 记录信息对应的列数据，需包含车辆ID与仿真步
+        """
+        if Info.id not in columns or Info.step not in columns:
+            raise TrasimError(f"轨迹数据需包含{Info.id}与{Info.step}！")
+        os.makedirs(path, exist_ok=True)
+        ids, steps = np.asarray(columns[Info.id]), np.asarray(columns[Info.step])
+        order = np.lexsort((steps, ids))
+        row_num = len(order)
+
+        names = list(columns.keys())
+        for i, name in enumerate(names):
+            column = np.asarray(columns[name])
+            mmap = np.lib.format.open_memmap(os.path.join(path, f"{i}.npy"), mode="w+",
+                                             dtype=column.dtype, shape=(row_num,))
+            for start in range(0, row_num, cls.WRITE_BLOCK):
+                mmap[start: start + cls.WRITE_BLOCK] = column[order[start: start + cls.WRITE_BLOCK]]
+            mmap.flush()
+            del mmap
+
+        ids, id_start = np.unique(ids[order], return_index=True)
+        steps = steps[order]
+        step_rows = np.argsort(steps, kind="stable")
+        unique_steps, step_start = np.unique(steps[step_rows], return_index=True)
+        np.save(os.path.join(path, "_ids.npy"), ids)
+        np.save(os.path.join(path, "_id_offsets.npy"), np.append(id_start, row_num))
+        np.save(os.path.join(path, "_steps.npy"), unique_steps)
+        np.save(os.path.join(path, "_step_offsets.npy"), np.append(step_start, row_num))
+        np.save(os.path.join(path, "_step_rows.npy"), step_rows)
+        with open(os.path.join(path, cls.META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"columns": names, "row_num": row_num}, f, ensure_ascii=False)
+        return cls(path)
+
+    def __len__(self):
+        return self.row_num
+
+    def __getitem__(self, info: str) -> np.ndarray:
+        """获取整列数据的内存映射"""
+        if info not in self._mmaps:
+            if info not in self.columns:
+                raise TrasimError(f"{info}未记录！")
+            self._mmaps[info] = self._load(str(self.columns.index(info)))
+        return self._mmaps[info]
+
+    def get_vehicle_rows(self, id_: int) -> slice:
+        index = int(np.searchsorted(self.ids, id_))
+        if index == len(self.ids) or self.ids[index] != id_:
+            return slice(0, 0)
+        return slice(int(self.id_offsets[index]), int(self.id_offsets[index + 1]))
+
+    def get_step_rows(self, step_range: Sequence[int]) -> np.ndarray:
+        """仿真步在[step_range[0], step_range[1]]范围内的行号（升序）"""
+        start = np.searchsorted(self.steps, step_range[0], side="left")
+        end = np.searchsorted(self.steps, step_range[1], side="right")
+        rows = self.step_rows[self.step_offsets[start]: self.step_offsets[end]]
+        return np.sort(rows)
+
+    def get_vehicle(self, id_: int, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """获取单车轨迹"""
+        rows = self.get_vehicle_rows(id_)
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({info: np.asarray(self[info][rows]) for info in columns}, columns=list(columns))
+
+    def iter_vehicles(self, columns: Optional[Sequence[str]] = None) -> Iterator[tuple[int, pd.DataFrame]]:
+        """逐车读取轨迹"""
+        for id_ in self.ids:
+            yield int(id_), self.get_vehicle(id_, columns)
+
+    def select(self, lane: Optional[Union[int, Sequence[int]]] = None,
+               step_range: Optional[Sequence[int]] = None,
+               id_range: Optional[Sequence[int]] = None,
+               columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        读取满足条件的轨迹数据，行顺序为(车辆ID, 仿真步)
+
+        :param lane: 车道编号（lane_add_num）或其列表
+        :param step_range: 仿真步范围（闭区间）
+        :param id_range: 车辆ID范围（闭区间）
+        :param columns: 读取的列，None代表全部
+        """
+        columns = self.columns if columns is None else [info for info in columns if info in self.columns]
+        if id_range is not None:
+            start = int(np.searchsorted(self.ids, id_range[0], side="left"))
+            end = int(np.searchsorted(self.ids, id_range[1], side="right"))
+            rows = np.arange(self.id_offsets[start], self.id_offsets[end])
+        else:
+            rows = None
+        if step_range is not None:
+            step_rows = self.get_step_rows(step_range)
+            rows = step_rows if rows is None else np.intersect1d(rows, step_rows, assume_unique=True)
+        if lane is not None:
+            lane = [lane] if isinstance(lane, (int, np.integer)) else list(lane)
+            lane_data = self[Info.lane_add_num] if rows is None else self[Info.lane_add_num][rows]
+            is_in = np.isin(lane_data, lane)
+            rows = np.where(is_in)[0] if rows is None else rows[is_in]
+        if rows is None:
+            data = {info: np.asarray(self[info]) for info in columns}
+        else:
+            data = {info: self[info][rows] for info in columns}
+        return pd.DataFrame(data, columns=columns)
+
+    def to_df(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        return self.select(columns=columns)
+
+
+def get_df(data: Union[pd.DataFrame, TrajectoryStore], lane: Optional[int] = None,
+           step_range: Optional[Sequence[int]] = None, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    统一处理DataFrame与TrajectoryStore输入，TrajectoryStore只加载指定车道、仿真步范围与列的数据
+
+    :param lane: 车道编号，None或小于0代表全部车道
+    """
+    if isinstance(data, TrajectoryStore):
+        lane = None if lane is None or lane < 0 else lane
+        return data.select(lane=lane, step_range=step_range, columns=columns)
+    return data
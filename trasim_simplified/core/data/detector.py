@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 19:05
+# @Author : yzbyx
+# @File : detector.py
+# Software: PyCharm
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from trasim_simplified.core.constant import V_TYPE
+from trasim_simplified.core.data.data_processor import DetectLoopInfo as DLI
+
+if TYPE_CHECKING:
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
+
+
+class VirtualDetector:
+    """
+    仿真过程中在线更新的虚拟线圈检测器，不依赖轨迹数据的记录
+
+    每个仿真步对检测区域[pos, pos + width]内的车辆采样，并根据车辆相邻两步的位置判断是否越过检测器起点，
+    每d_step个仿真步输出一次集计结果：
+
+    1. 流量、时间平均车速（越线车辆速度的算术平均）、空间平均车速（越线车辆速度的调和平均）由越线车辆计算；
+    2. 时间占有率、HCM(Edie)的流量、密度与速度由检测区域内的采样计算
+    """
+
+    def __init__(self, lane: 'LaneAbstract', pos: float, width: float, d_step: int):
+        self.lane = lane
+        self.pos = pos
+        """检测区域起点 [m]"""
+        self.width = width
+        """检测区域长度 [m]"""
+        self.d_step = d_step
+        """每个检测周期的仿真步数"""
+
+        self._pre_id = np.empty(0, dtype=int)
+        self._pre_x = np.empty(0)
+        self._reset_interval()
+        self.start_step_list: list[int] = []
+        """各检测周期的起始仿真步"""
+        self.result: dict[str, list[float]] = {
+            DLI.Q: [], DLI.Time_Occ: [], DLI.K_By_Time_Occ: [], DLI.Vt: [], DLI.Vs_By_Vt: [],
+            DLI.HCM_dA: [], DLI.HCM_tA: [], DLI.HCM_qA: [], DLI.HCM_kA: [], DLI.HCM_vA: []
+        }
+        """检测结果，每个检测周期一个值"""
+
+    def _reset_interval(self):
+        self._step_num = 0
+        self._start_step = None
+        self._car_num_in = 0
+        self._speed_sum = 0.
+        self._inv_speed_sum = 0.
+        self._sample_num = 0
+        self._d_sum = 0.
+
+    def _get_lane_data(self):
+        lane = self.lane
+        state = lane.array_state
+        if state is not None and not state.stale and state.car_num == len(lane.car_list):
+            order = state.get_order()
+            is_car = order[state.type[order] != V_TYPE.OBSTACLE]
+            return state.ID[is_car], state.x[is_car], state.v[is_car]
+        car_list = [car for car in lane.car_list if car.type != V_TYPE.OBSTACLE]
+        return (np.array([car.ID for car in car_list], dtype=int),
+                np.array([car.x for car in car_list], dtype=float),
+                np.array([car.v for car in car_list], dtype=float))
+
+    def update(self):
+        """在每个仿真步的状态更新前调用"""
+        lane = self.lane
+        dt = lane.dt
+        if self._start_step is None:
+            self._start_step = lane.step_
+        id_, x, v = self._get_lane_data()
+
+        end_pos = self.pos + self.width
+        if lane.is_circle and end_pos > lane.lane_length:
+            is_in = (self.pos <= x) | (x <= end_pos - lane.lane_length)
+        else:
+            is_in = (self.pos <= x) & (x <= end_pos)
+        self._sample_num += int(np.count_nonzero(is_in))
+        self._d_sum += float(np.sum(v[is_in])) * dt
+
+        # 与上一仿真步的位置比较，判断是否越过检测器起点
+        index = np.searchsorted(self._pre_id, id_)
+        index[index == len(self._pre_id)] = 0
+        has_pre = (self._pre_id[index] == id_) if len(self._pre_id) > 0 else np.zeros(len(id_), dtype=bool)
+        pre_x = self._pre_x[index] if len(self._pre_id) > 0 else np.zeros(len(id_))
+        if lane.is_circle:
+            # 越过环形车道终点的车辆位置展开后比较
+            x_unwrap = np.where(x < pre_x, x + lane.lane_length, x)
+            is_cross = ((pre_x < self.pos) & (self.pos <= x_unwrap)) | \
+                       ((pre_x < self.pos + lane.lane_length) & (self.pos + lane.lane_length <= x_unwrap))
+        else:
+            is_cross = (pre_x < self.pos) & (self.pos <= x)
+        is_cross &= has_pre
+        speed = v[is_cross]
+        self._car_num_in += len(speed)
+        self._speed_sum += float(np.sum(speed))
+        with np.errstate(divide="ignore"):
+            self._inv_speed_sum += float(np.sum(1 / speed))
+
+        order = np.argsort(id_)
+        self._pre_id, self._pre_x = id_[order], x[order]
+
+        self._step_num += 1
+        if self._step_num == self.d_step:
+            self._output()
+
+    def _output(self):
+        dt = self.lane.dt
+        period = self.d_step * dt
+        area_A = self.width * period
+        t_A = self._sample_num * dt
+        with np.errstate(divide="ignore", invalid="ignore"):
+            v_t = np.float64(self._speed_sum) / self._car_num_in
+            v_s = self._car_num_in / np.float64(self._inv_speed_sum)
+            v_A = np.float64(self._d_sum) / t_A
+        time_occ = self._sample_num / self.d_step
+
+        self.start_step_list.append(self._start_step)
+        self.result[DLI.Q].append(self._car_num_in / period * 3600)
+        self.result[DLI.Time_Occ].append(time_occ)
+        self.result[DLI.K_By_Time_Occ].append(time_occ / self.width * 1000)
+        self.result[DLI.Vt].append(float(v_t))
+        self.result[DLI.Vs_By_Vt].append(float(v_s))
+        self.result[DLI.HCM_dA].append(self._d_sum)
+        self.result[DLI.HCM_tA].append(t_A)
+        self.result[DLI.HCM_qA].append(self._d_sum / area_A * 3600)
+        self.result[DLI.HCM_kA].append(t_A / area_A * 1000)
+        self.result[DLI.HCM_vA].append(float(v_A))
+        self._reset_interval()
+
+    def to_df(self) -> pd.DataFrame:
+        """各检测周期的结果，索引为周期起始仿真步"""
+        return pd.DataFrame(self.result, index=pd.Index(self.start_step_list, name="start_step"))
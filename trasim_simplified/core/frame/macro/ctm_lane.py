@@ -20,24 +20,26 @@ class CTM_Lane:
         self.index = 0
         self.is_circle = is_circle
         self.road: Optional[CTM_Road] = None
-        self.cell_speed_limit: Optional[list[float]] = []
-        self.cell_length: Optional[list[float]] = []
+        self.cell_speed_limit: np.ndarray = np.empty(0)
+        self.cell_length: np.ndarray = np.empty(0)
         self.cell_diagram: Optional[list[CFModel]] = []
+        self._diagram_groups: list[tuple[CFModel, float, np.ndarray]] = []
+        """(基本图模型, 限速, 元胞索引)，基本图按组批量计算"""
 
-        self.cell_car_length: Optional[list[float]] = []
+        self.cell_car_length: np.ndarray = np.empty(0)
         """车辆长度 [m]"""
-        self.cell_car_num: Optional[list[float]] = []
-        self.cell_speed: Optional[list[float]] = []
+        self.cell_car_num: np.ndarray = np.empty(0)
+        self.cell_speed: np.ndarray = np.empty(0)
         """交通流流速 [m/s]"""
-        self.cell_density: Optional[list[float]] = []
+        self.cell_density: np.ndarray = np.empty(0)
         """交通流密度 [veh/m]"""
-        self.cell_flow: Optional[list[float]] = []
+        self.cell_flow: np.ndarray = np.empty(0)
         """交通流流量 [veh/s]"""
 
-        self.cell_flow_in: Optional[list[float]] = []
-        self.cell_flow_out: Optional[list[float]] = []
-        self.cell_jam_density: Optional[list[float]] = []
-        self.cell_car_length_upstream: Optional[list[float]] = []
+        self.cell_flow_in: np.ndarray = np.empty(0)
+        self.cell_flow_out: np.ndarray = np.empty(0)
+        self.cell_jam_density: np.ndarray = np.empty(0)
+        self.cell_car_length_upstream: np.ndarray = np.empty(0)
 
         self.flow_in: Optional[float] = None
         """边界流入流量 [veh/s]"""
@@ -45,17 +47,21 @@ class CTM_Lane:
         """边界最大流出流量 [veh/s]"""
         self.flow_in_car_length = None
 
-        self.cell_speed_list = []
-        self.cell_density_list = []
-        self.cell_flow_list = []
-        self.cell_flow_in_list = []
-        self.cell_flow_out_list = []
+        self.cell_speed_list: Optional[np.ndarray] = None
+        """记录的元胞流速 (记录步数 × 元胞数)"""
+        self.cell_density_list: Optional[np.ndarray] = None
+        self.cell_flow_list: Optional[np.ndarray] = None
+        self.cell_flow_in_list: Optional[np.ndarray] = None
+        self.cell_flow_out_list: Optional[np.ndarray] = None
 
-        self.step_list = []
-        self.time_list = []
+        self.step_list: Optional[np.ndarray] = None
+        """记录的仿真步 (记录步数,)"""
+        self.time_list: Optional[np.ndarray] = None
+        self.record_num = 0
+        """已记录的步数"""
 
         self.lane_length = 0
-        self.cell_start_pos = []
+        self.cell_start_pos: np.ndarray = np.empty(0)
 
         self.step_ = 0
         """当前仿真步次"""
@@ -78,24 +84,34 @@ class CTM_Lane:
         self.has_ui = False
         self.ui = CTM_UI(self)
 
+    @property
+    def cell_num(self):
+        return len(self.cell_length)
+
     def cell_config(self, cell_length: float, cell_num: int, cfm_name: str, cfm_param: dict[str, float], car_length=5.,
                     speed_limit=30., initial_density=0):
-        self.cell_length.extend([cell_length] * cell_num)
+        start = self.cell_num
         cfm = get_cf_model(None, cfm_name, cfm_param)
         self.cell_diagram.extend([cfm] * cell_num)
-        self.cell_car_length.extend([car_length] * cell_num)
-        self.cell_speed_limit.extend([speed_limit] * cell_num)
-        self.cell_car_num.extend([initial_density * cell_length] * cell_num)
-        density = initial_density
-        self.cell_density.extend([density] * cell_num)
-        flow = self.cell_diagram[-1].basic_diagram_k_to_q(1 / initial_density, car_length, speed_limit)
-        jam_density = self.cell_diagram[-1].get_jam_density(car_length)
-        self.cell_jam_density.extend([jam_density] * cell_num)
-        self.cell_flow.extend([flow] * cell_num)
-        self.cell_speed.extend([flow / density] * cell_num)
-
-        for i in range(cell_num):
-            self.cell_start_pos.append(self.lane_length + cell_length * i)
+        self._diagram_groups.append((cfm, speed_limit, np.arange(start, start + cell_num)))
+
+        def extend(array, value):
+            return np.concatenate([array, np.full(cell_num, value, dtype=float)])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            flow = cfm.basic_diagram_k_to_q(1 / initial_density, car_length, speed_limit)
+            speed = flow / initial_density
+        self.cell_length = extend(self.cell_length, cell_length)
+        self.cell_car_length = extend(self.cell_car_length, car_length)
+        self.cell_speed_limit = extend(self.cell_speed_limit, speed_limit)
+        self.cell_car_num = extend(self.cell_car_num, initial_density * cell_length)
+        self.cell_density = extend(self.cell_density, initial_density)
+        self.cell_jam_density = extend(self.cell_jam_density, cfm.get_jam_density(car_length))
+        self.cell_flow = extend(self.cell_flow, flow)
+        self.cell_speed = extend(self.cell_speed, speed)
+
+        self.cell_start_pos = extend(self.cell_start_pos, 0)
+        self.cell_start_pos[start:] = self.lane_length + cell_length * np.arange(cell_num)
         self.lane_length += cell_length * cell_num
 
     def boundary_condition_config(self, flow_in_car_length, flow_in=0, flow_out=np.inf):
@@ -121,6 +137,8 @@ class CTM_Lane:
         """run()是否为迭代器"""
         self.has_ui = has_ui
         """是否显示UI"""
+        if self.data_save:
+            self._record_init(max(self.sim_step - max(self.warm_up_step, self.step_), 0))
         if self.has_ui and not self.road_control:
             self.ui.ui_init(caption=caption, frame_rate=frame_rate)
 
@@ -137,78 +155,81 @@ class CTM_Lane:
             self.time_ += self.dt
             if self.has_ui and not self.road_control: self.ui.ui_update()
 
+    def _record_init(self, record_step: int):
+        """按照需要记录的步数预分配记录数组"""
+        shape = (record_step, self.cell_num)
+        self.step_list = np.zeros(record_step, dtype=int)
+        self.time_list = np.zeros(record_step)
+        self.cell_flow_list, self.cell_density_list, self.cell_speed_list, \
+            self.cell_flow_in_list, self.cell_flow_out_list = (np.full(shape, np.nan) for _ in range(5))
+        self.record_num = 0
+
     def record(self):
-        self.step_list.append([self.step_] * len(self.cell_flow))
-        self.time_list.append([self.time_] * len(self.cell_flow))
-        self.cell_flow_list.append(self.cell_flow.copy())
-        self.cell_density_list.append(self.cell_density.copy())
-        self.cell_speed_list.append(self.cell_speed.copy())
-        self.cell_flow_in_list.append(self.cell_flow_in.copy())
-        self.cell_flow_out_list.append(self.cell_flow_out.copy())
+        i = self.record_num
+        if i == len(self.step_list):
+            return
+        self.step_list[i] = self.step_
+        self.time_list[i] = self.time_
+        self.cell_flow_list[i] = self.cell_flow
+        self.cell_density_list[i] = self.cell_density
+        self.cell_speed_list[i] = self.cell_speed
+        if len(self.cell_flow_in) == self.cell_num:
+            self.cell_flow_in_list[i] = self.cell_flow_in
+            self.cell_flow_out_list[i] = self.cell_flow_out
+        self.record_num += 1
+
+    def cell_diagram_flow(self, density: np.ndarray, car_length: np.ndarray) -> np.ndarray:
+        """各元胞基本图在给定密度下的流量 [veh/s]，按照基本图分组批量计算"""
+        flow = np.empty(len(density))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for cfm, speed_limit, index in self._diagram_groups:
+                flow[index] = cfm.basic_diagram_k_to_q(1 / density[index], car_length[index], speed_limit)
+        return flow
+
+    def cell_demand(self) -> np.ndarray:
+        """各元胞的发送流量 [veh/s]"""
+        return np.minimum(self.cell_diagram_flow(self.cell_density, self.cell_car_length),
+                          self.cell_density * self.cell_length / self.dt)
+
+    def cell_supply(self) -> np.ndarray:
+        """各元胞的接收流量 [veh/s]"""
+        return (self.cell_jam_density - self.cell_density) * self.cell_length / self.dt
 
     def step(self):
-        self.cell_flow_in = []
-        for i, density in enumerate(self.cell_density):
-            if i != 0:
-                flow_in = min(
-                    self.cell_diagram[i - 1].basic_diagram_k_to_q(
-                        1 / self.cell_density[i - 1], self.cell_car_length[i - 1], self.cell_speed_limit[i - 1]
-                    ), self.cell_density[i - 1] * self.cell_length[i - 1] / self.dt,
-                    (self.cell_jam_density[i] - self.cell_density[i]) * self.cell_length[i] / self.dt)
-            else:
-                if self.is_circle:
-                    flow_in = min(
-                        self.cell_diagram[-1].basic_diagram_k_to_q(
-                            1 / self.cell_density[-1], self.cell_car_length[-1], self.cell_speed_limit[-1]
-                        ), self.cell_density[-1] * self.cell_length[-1] / self.dt,
-                        (self.cell_jam_density[i] - self.cell_density[i]) * self.cell_length[i] / self.dt)
-                else:
-                    flow_in = min(
-                        self.flow_in,
-                        (self.cell_jam_density[i] - self.cell_density[i]) * self.cell_length[i] / self.dt)
-            self.cell_flow_in.append(flow_in)
-
-        if not self.is_circle:
-            self.cell_flow_out = self.cell_flow_in[1:]  # 此处缺失的在update_state函数里补充
-            self.cell_car_length_upstream = [self.flow_in_car_length] + self.cell_car_length[1:]
+        demand = self.cell_demand()
+        supply = self.cell_supply()
+
+        self.cell_flow_in = np.empty(self.cell_num)
+        self.cell_flow_in[1:] = np.minimum(demand[:-1], supply[1:])
+        self.cell_flow_out = np.empty(self.cell_num)
+        self.cell_flow_out[:-1] = self.cell_flow_in[1:]
+        if self.is_circle:
+            self.cell_flow_in[0] = min(demand[-1], supply[0])
+            self.cell_flow_out[-1] = self.cell_flow_in[0]
+            self.cell_car_length_upstream = np.roll(self.cell_car_length, 1)
         else:
-            self.cell_flow_out = self.cell_flow_in[1:] + [self.cell_flow_in[0]]
-            self.cell_car_length_upstream = [self.cell_car_length[-1]] + self.cell_car_length[:-1]
+            self.cell_flow_in[0] = min(self.flow_in, supply[0])
+            self.cell_flow_out[-1] = min(demand[-1], self.flow_out)
+            self.cell_car_length_upstream = np.concatenate([[self.flow_in_car_length], self.cell_car_length[:-1]])
 
     def update_state(self):
-        for i, flow_in in enumerate(self.cell_flow_in):
-            if self.is_circle or i != len(self.cell_flow_in) - 1:
-                # 更新平均车长
-                flow_in_num = flow_in * self.dt
-                stay_num = self.cell_car_num[i] - self.cell_flow_out[i] * self.dt
-                self.cell_car_length[i] = (
-                        flow_in_num * self.cell_car_length_upstream[i] +
-                        stay_num * self.cell_car_length[i]
-                ) / (flow_in_num + stay_num)
-                self.cell_density[i] += (flow_in - self.cell_flow_out[i]) * self.dt / self.cell_length[i]
-            else:
-                flow_out = min(self.cell_diagram[-1].basic_diagram_k_to_q(
-                    1 / self.cell_density[-1], self.cell_car_length[-1], self.cell_speed_limit[-1]
-                ), self.cell_density[-1] * self.cell_length[-1] / self.dt, self.flow_out)
-                self.cell_density[i] += (flow_in - flow_out) * self.dt / self.cell_length[-1]
-                self.cell_flow_out.append(flow_out)  # 此处补充开边界末尾的flow_out
-                # 更新平均车长
-                flow_in_num = flow_in * self.dt
-                stay_num = self.cell_car_num[i] - self.cell_flow_out[i] * self.dt
-                self.cell_car_length[i] = (
-                      flow_in_num * self.cell_car_length_upstream[i] +
-                      stay_num * self.cell_car_length[i]
-                ) / (flow_in_num + stay_num)
-
-            self.cell_car_num[i] = self.cell_density[i] * self.cell_length[i]
-            self.cell_flow[i] = self.cell_diagram[i].basic_diagram_k_to_q(
-                1 / self.cell_density[i], self.cell_car_length[i], self.cell_speed_limit[i]
+        # 更新平均车长
+        flow_in_num = self.cell_flow_in * self.dt
+        stay_num = self.cell_car_num - self.cell_flow_out * self.dt
+        total_num = flow_in_num + stay_num
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.cell_car_length = np.where(
+                total_num != 0,
+                (flow_in_num * self.cell_car_length_upstream + stay_num * self.cell_car_length) / total_num,
+                self.cell_car_length
             )
-            self.cell_speed[i] = self.cell_flow[i] / self.cell_density[i]
+        self.cell_density = self.cell_density + (self.cell_flow_in - self.cell_flow_out) * self.dt / self.cell_length
+
+        self.cell_car_num = self.cell_density * self.cell_length
+        self.cell_flow = self.cell_diagram_flow(self.cell_density, self.cell_car_length)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.cell_speed = self.cell_flow / self.cell_density
 
     @property
     def cell_occ(self):
-        occ = []
-        for i, car_length in enumerate(self.cell_car_length):
-            occ.append(car_length * self.cell_car_num[i] / self.cell_length[i])
-        return occ
+        return self.cell_car_length * self.cell_car_num / self.cell_length
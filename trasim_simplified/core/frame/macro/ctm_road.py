@@ -5,9 +5,373 @@
 # Software: PyCharm
 from typing import Optional
 
+import numpy as np
+
 from trasim_simplified.core.frame.macro.ctm_lane import CTM_Lane
+from trasim_simplified.core.ui.ctm_ui import CTM_UI
+from trasim_simplified.msg.trasimError import TrasimError
+
+
+class CTM_Junction:
+    """
+    路段间的连接节点（合流/分流/一般节点）
+
+    上游车道末端元胞的发送流量按照转向比例分配到下游车道首个元胞，
+    下游接收能力不足时按照优先级与需求的乘积比例分配，上游按照FIFO原则以最受限的转向折减整体流出
+    """
+    def __init__(self, upstream: list[CTM_Lane], downstream: list[CTM_Lane],
+                 turning: Optional[np.ndarray] = None, priority: Optional[list[float]] = None):
+        self.upstream = upstream
+        self.downstream = downstream
+        if turning is None:
+            if len(upstream) == len(downstream):
+                turning = np.eye(len(upstream))
+            elif len(upstream) == 1 or len(downstream) == 1:
+                turning = np.full((len(upstream), len(downstream)), 1 / len(downstream))
+            else:
+                raise TrasimError("上下游车道数不同且均大于1时需要指定转向比例！")
+        self.turning = np.asarray(turning, dtype=float)
+        """转向比例矩阵 (上游车道数 × 下游车道数)，每行之和为1"""
+        assert self.turning.shape == (len(upstream), len(downstream))
+        assert np.allclose(self.turning.sum(axis=1), 1), "转向比例每行之和需要为1！"
+        self.priority = np.ones(len(upstream)) if priority is None else np.asarray(priority, dtype=float)
+        """上游车道的合流优先级"""
 
 
 class CTM_Road:
+    """
+    多车道多路段的CTM道路
+
+    所有车道的元胞打包为一个数组，车道内部的元胞连接、路段间的节点、边界条件以及相邻车道间的换道流量
+    均在一次向量化的step中计算
+    """
     def __init__(self):
-        self.lane_list: Optional[list[CTM_Lane]] = None
+        self.lane_list: Optional[list[CTM_Lane]] = []
+        self.segment_list: list[list[CTM_Lane]] = []
+        """路段列表，同一路段内索引相邻的车道可以换道"""
+        self.junction_list: list[CTM_Junction] = []
+
+        self.lc_rate = 0.
+        """换道流量系数 [1/s]，相邻车道密度差每秒以该比例向低密度车道松弛，建议不超过0.5/dt"""
+
+        self.cell_start: np.ndarray = np.empty(0, dtype=int)
+        """各车道在打包数组中的起始元胞索引"""
+        self.cell_length: np.ndarray = np.empty(0)
+        self.cell_jam_density: np.ndarray = np.empty(0)
+        self.cell_car_length: np.ndarray = np.empty(0)
+        """车辆长度 [m]"""
+        self.cell_car_num: np.ndarray = np.empty(0)
+        self.cell_density: np.ndarray = np.empty(0)
+        """交通流密度 [veh/m]"""
+        self.cell_flow: np.ndarray = np.empty(0)
+        """交通流流量 [veh/s]"""
+        self.cell_speed: np.ndarray = np.empty(0)
+        """交通流流速 [m/s]"""
+        self.cell_flow_in: np.ndarray = np.empty(0)
+        """纵向流入流量 [veh/s]"""
+        self.cell_flow_out: np.ndarray = np.empty(0)
+        """纵向流出流量 [veh/s]"""
+        self.cell_lc_in: np.ndarray = np.empty(0)
+        """换道流入流量 [veh/s]"""
+        self.cell_lc_out: np.ndarray = np.empty(0)
+        """换道流出流量 [veh/s]"""
+        self._cell_in_length: np.ndarray = np.empty(0)
+        """流入车辆(纵向与换道)的流量加权车长之和"""
+
+        self._diagram_groups: list[tuple] = []
+        self._link_up = self._link_down = np.empty(0, dtype=int)
+        """车道内部元胞连接"""
+        self._move_up = self._move_down = np.empty(0, dtype=int)
+        self._move_turning = self._move_priority = np.empty(0)
+        """节点转向连接"""
+        self._source_cell = self._sink_cell = np.empty(0, dtype=int)
+        self._source_flow = self._source_car_length = self._sink_flow = np.empty(0)
+        """边界条件"""
+        self._lc_from = self._lc_to = np.empty(0, dtype=int)
+        """换道连接（双向各记录一次）"""
+
+        self.cell_density_list: Optional[np.ndarray] = None
+        """记录的元胞密度 (记录步数 × 元胞数)"""
+        self.cell_flow_list: Optional[np.ndarray] = None
+        self.cell_speed_list: Optional[np.ndarray] = None
+        self.cell_lc_in_list: Optional[np.ndarray] = None
+        self.step_list: Optional[np.ndarray] = None
+        self.time_list: Optional[np.ndarray] = None
+        self.record_num = 0
+
+        self.step_ = 0
+        """当前仿真步次"""
+        self.time_ = 0
+        """当前仿真时长 [s]"""
+        self.yield_ = True
+        self.dt = 1
+        """仿真步长 [s]"""
+        self.warm_up_step = 0
+        self.sim_step = 0
+        self.data_save = False
+        self.has_ui = False
+        self.ui = CTM_UI(self)
+
+    @property
+    def lane_length(self):
+        return max([lane.lane_length for lane in self.lane_list], default=0)
+
+    @property
+    def cell_num(self):
+        return len(self.cell_length)
+
+    def add_segment(self, lane_num: int, is_circle=False) -> list[CTM_Lane]:
+        """添加路段，返回路段内从内到外的车道，车道需要再调用cell_config配置元胞"""
+        segment = []
+        for i in range(lane_num):
+            lane = CTM_Lane(is_circle)
+            lane.index = len(self.lane_list)
+            lane.ID = f"{len(self.segment_list)}-{i}"
+            lane.road = self
+            lane.road_control = True
+            self.lane_list.append(lane)
+            segment.append(lane)
+        self.segment_list.append(segment)
+        return segment
+
+    def add_junction(self, upstream: list[CTM_Lane], downstream: list[CTM_Lane],
+                     turning: Optional[np.ndarray] = None, priority: Optional[list[float]] = None) -> CTM_Junction:
+        junction = CTM_Junction(upstream, downstream, turning, priority)
+        self.junction_list.append(junction)
+        return junction
+
+    def set_lane_change(self, lc_rate: float):
+        self.lc_rate = lc_rate
+
+    def lane_slice(self, lane: CTM_Lane) -> slice:
+        """车道元胞在打包数组中的范围"""
+        i = self.lane_list.index(lane)
+        return slice(self.cell_start[i], self.cell_start[i] + lane.cell_num)
+
+    def _pack(self):
+        """将各车道的元胞打包为整体数组，并生成元胞之间的连接关系"""
+        cell_nums = np.array([lane.cell_num for lane in self.lane_list], dtype=int)
+        self.cell_start = np.concatenate([[0], np.cumsum(cell_nums)[:-1]]).astype(int)
+
+        def concat(name):
+            return np.concatenate([np.asarray(getattr(lane, name), dtype=float) for lane in self.lane_list])
+
+        self.cell_length = concat("cell_length")
+        self.cell_jam_density = concat("cell_jam_density")
+        self.cell_car_length = concat("cell_car_length")
+        self.cell_car_num = concat("cell_car_num")
+        self.cell_density = concat("cell_density")
+        self.cell_flow = concat("cell_flow")
+        self.cell_speed = concat("cell_speed")
+        self._diagram_groups = [(cfm, speed_limit, index + start)
+                                for lane, start in zip(self.lane_list, self.cell_start)
+                                for cfm, speed_limit, index in lane._diagram_groups]
+
+        first = {id(lane): start for lane, start in zip(self.lane_list, self.cell_start)}
+        last = {id(lane): start + lane.cell_num - 1 for lane, start in zip(self.lane_list, self.cell_start)}
+
+        link_up, link_down = [], []
+        for lane, start in zip(self.lane_list, self.cell_start):
+            up = np.arange(start, start + lane.cell_num - 1)
+            link_up.append(up)
+            link_down.append(up + 1)
+            if lane.is_circle:
+                link_up.append(np.array([start + lane.cell_num - 1]))
+                link_down.append(np.array([start]))
+        self._link_up = np.concatenate(link_up).astype(int)
+        self._link_down = np.concatenate(link_down).astype(int)
+
+        move_up, move_down, move_turning, move_priority = [], [], [], []
+        has_upstream, has_downstream = set(), set()
+        for junction in self.junction_list:
+            for i, up in enumerate(junction.upstream):
+                has_downstream.add(id(up))
+                for j, down in enumerate(junction.downstream):
+                    has_upstream.add(id(down))
+                    if junction.turning[i, j] > 0:
+                        move_up.append(last[id(up)])
+                        move_down.append(first[id(down)])
+                        move_turning.append(junction.turning[i, j])
+                        move_priority.append(junction.priority[i])
+        self._move_up = np.array(move_up, dtype=int)
+        self._move_down = np.array(move_down, dtype=int)
+        self._move_turning = np.array(move_turning, dtype=float)
+        self._move_priority = np.array(move_priority, dtype=float)
+
+        source, source_flow, source_length, sink, sink_flow = [], [], [], [], []
+        for lane in self.lane_list:
+            if lane.is_circle:
+                continue
+            if id(lane) not in has_upstream:
+                source.append(first[id(lane)])
+                source_flow.append(lane.flow_in if lane.flow_in is not None else 0.)
+                source_length.append(lane.flow_in_car_length if lane.flow_in_car_length is not None else 0.)
+            if id(lane) not in has_downstream:
+                sink.append(last[id(lane)])
+                sink_flow.append(lane.flow_out if lane.flow_out is not None else np.inf)
+        self._source_cell = np.array(source, dtype=int)
+        self._source_flow = np.array(source_flow, dtype=float)
+        self._source_car_length = np.array(source_length, dtype=float)
+        self._sink_cell = np.array(sink, dtype=int)
+        self._sink_flow = np.array(sink_flow, dtype=float)
+
+        lc_from, lc_to = [], []
+        for segment in self.segment_list:
+            for lane_a in segment:
+                for lane_b in segment:
+                    if abs(lane_a.index - lane_b.index) != 1:
+                        continue
+                    # 按照元胞中点所在位置匹配相邻车道的元胞
+                    center = np.asarray(lane_a.cell_start_pos) + np.asarray(lane_a.cell_length) / 2
+                    pos_b = np.asarray(lane_b.cell_start_pos)
+                    index_b = np.searchsorted(pos_b, center, side="right") - 1
+                    is_valid = (index_b >= 0) & (center < lane_b.lane_length)
+                    lc_from.append(first[id(lane_a)] + np.where(is_valid)[0])
+                    lc_to.append(first[id(lane_b)] + index_b[is_valid])
+        self._lc_from = np.concatenate(lc_from).astype(int) if lc_from else np.empty(0, dtype=int)
+        self._lc_to = np.concatenate(lc_to).astype(int) if lc_to else np.empty(0, dtype=int)
+
+    def _sync_lanes(self):
+        """各车道的元胞数组更新为打包数组的视图"""
+        for lane, start in zip(self.lane_list, self.cell_start):
+            sl = slice(start, start + lane.cell_num)
+            lane.cell_car_length = self.cell_car_length[sl]
+            lane.cell_car_num = self.cell_car_num[sl]
+            lane.cell_density = self.cell_density[sl]
+            lane.cell_flow = self.cell_flow[sl]
+            lane.cell_speed = self.cell_speed[sl]
+            lane.cell_flow_in = self.cell_flow_in[sl]
+            lane.cell_flow_out = self.cell_flow_out[sl]
+            lane.step_, lane.time_, lane.dt = self.step_, self.time_, self.dt
+
+    def run(self, data_save=True, has_ui=False, **kwargs):
+        self.data_save = data_save
+        self.dt = kwargs.get("dt", 1)
+        """仿真步长 [s]"""
+        self.warm_up_step = kwargs.get("warm_up_step", 0)
+        self.sim_step = kwargs.get("sim_step", int(10 * 60 / self.dt))
+        """总仿真步 [次]"""
+        self.yield_ = kwargs.get("if_yield", True)
+        self.has_ui = has_ui
+
+        self._pack()
+        self.cell_flow_in, self.cell_flow_out, self.cell_lc_in, self.cell_lc_out = \
+            (np.zeros(self.cell_num) for _ in range(4))
+        self._sync_lanes()
+        if self.data_save:
+            self._record_init(max(self.sim_step - max(self.warm_up_step, self.step_), 0))
+        if self.has_ui:
+            self.ui.ui_init(caption=kwargs.get("ui_caption", "宏观交通流仿真"), frame_rate=kwargs.get("frame_rate", -1))
+
+        while self.sim_step != self.step_:
+            if self.data_save and self.step_ >= self.warm_up_step:
+                self.record()
+            self.step()
+            if self.yield_: yield self.step_
+            self.update_state()
+            self.step_ += 1
+            self.time_ += self.dt
+            self._sync_lanes()
+            if self.has_ui: self.ui.ui_update()
+
+    def _record_init(self, record_step: int):
+        shape = (record_step, self.cell_num)
+        self.step_list = np.zeros(record_step, dtype=int)
+        self.time_list = np.zeros(record_step)
+        self.cell_density_list, self.cell_flow_list, self.cell_speed_list, self.cell_lc_in_list = \
+            (np.full(shape, np.nan) for _ in range(4))
+        self.record_num = 0
+
+    def record(self):
+        i = self.record_num
+        if i == len(self.step_list):
+            return
+        self.step_list[i] = self.step_
+        self.time_list[i] = self.time_
+        self.cell_density_list[i] = self.cell_density
+        self.cell_flow_list[i] = self.cell_flow
+        self.cell_speed_list[i] = self.cell_speed
+        self.cell_lc_in_list[i] = self.cell_lc_in
+        self.record_num += 1
+
+    def cell_diagram_flow(self, density: np.ndarray, car_length: np.ndarray) -> np.ndarray:
+        flow = np.empty(len(density))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for cfm, speed_limit, index in self._diagram_groups:
+                flow[index] = cfm.basic_diagram_k_to_q(1 / density[index], car_length[index], speed_limit)
+        return flow
+
+    def step(self):
+        demand = np.minimum(self.cell_diagram_flow(self.cell_density, self.cell_car_length),
+                            self.cell_density * self.cell_length / self.dt)
+        supply = (self.cell_jam_density - self.cell_density) * self.cell_length / self.dt
+        car_length = self.cell_car_length
+        n = self.cell_num
+
+        # 车道内部连接
+        link_flow = np.minimum(demand[self._link_up], supply[self._link_down])
+
+        # 节点：按照转向比例拆分需求，下游按照优先级×需求的比例分配接收能力，上游按照FIFO取最受限的比例
+        move_demand = demand[self._move_up] * self._move_turning
+        weight_sum = np.bincount(self._move_down, weights=self._move_priority * move_demand, minlength=n)
+        weight_sum = weight_sum[self._move_down]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            move_ratio = np.where(weight_sum > 0,
+                                  np.minimum(1, supply[self._move_down] * self._move_priority / weight_sum), 1)
+        fifo_ratio = np.ones(n)
+        np.minimum.at(fifo_ratio, self._move_up, move_ratio)
+        move_flow = fifo_ratio[self._move_up] * move_demand
+
+        # 边界条件
+        source_flow = np.minimum(self._source_flow, supply[self._source_cell])
+        sink_flow = np.minimum(demand[self._sink_cell], self._sink_flow)
+
+        flow_in = np.bincount(self._link_down, weights=link_flow, minlength=n) + \
+            np.bincount(self._move_down, weights=move_flow, minlength=n) + \
+            np.bincount(self._source_cell, weights=source_flow, minlength=n)
+        flow_out = np.bincount(self._link_up, weights=link_flow, minlength=n) + \
+            np.bincount(self._move_up, weights=move_flow, minlength=n) + \
+            np.bincount(self._sink_cell, weights=sink_flow, minlength=n)
+        in_length = np.bincount(self._link_down, weights=link_flow * car_length[self._link_up], minlength=n) + \
+            np.bincount(self._move_down, weights=move_flow * car_length[self._move_up], minlength=n) + \
+            np.bincount(self._source_cell, weights=source_flow * self._source_car_length, minlength=n)
+
+        # 换道：相邻车道的密度差向低密度车道松弛，受剩余车辆数与剩余接收能力约束（两侧各取一半）
+        lc_flow = np.zeros(len(self._lc_from))
+        if self.lc_rate > 0 and len(self._lc_from) > 0:
+            k_from, k_to = self.cell_density[self._lc_from], self.cell_density[self._lc_to]
+            lc_flow = self.lc_rate * np.maximum(0, k_from - k_to) * self.cell_length[self._lc_from] / 2
+            remain_num = np.maximum(0, self.cell_car_num / self.dt - flow_out)
+            remain_supply = np.maximum(0, supply - flow_in)
+            lc_flow = np.minimum(lc_flow, np.minimum(remain_num[self._lc_from], remain_supply[self._lc_to]) / 2)
+        self.cell_lc_out = np.bincount(self._lc_from, weights=lc_flow, minlength=n)
+        self.cell_lc_in = np.bincount(self._lc_to, weights=lc_flow, minlength=n)
+        in_length += np.bincount(self._lc_to, weights=lc_flow * car_length[self._lc_from], minlength=n)
+
+        self.cell_flow_in = flow_in
+        self.cell_flow_out = flow_out
+        self._cell_in_length = in_length
+
+    def update_state(self):
+        in_flow = self.cell_flow_in + self.cell_lc_in
+        out_flow = self.cell_flow_out + self.cell_lc_out
+        # 更新平均车长
+        flow_in_num = in_flow * self.dt
+        stay_num = self.cell_car_num - out_flow * self.dt
+        total_num = flow_in_num + stay_num
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.cell_car_length = np.where(
+                total_num != 0,
+                (self._cell_in_length * self.dt + stay_num * self.cell_car_length) / total_num,
+                self.cell_car_length
+            )
+        self.cell_density = self.cell_density + (in_flow - out_flow) * self.dt / self.cell_length
+
+        self.cell_car_num = self.cell_density * self.cell_length
+        self.cell_flow = self.cell_diagram_flow(self.cell_density, self.cell_car_length)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.cell_speed = self.cell_flow / self.cell_density
+
+    @property
+    def cell_occ(self):
+        return self.cell_car_length * self.cell_car_num / self.cell_length
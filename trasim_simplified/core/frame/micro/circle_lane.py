@@ -3,8 +3,11 @@
 # @Author : yzbyx
 # @File : circle_lane.py
 # @Software : PyCharm
+import numpy as np
 
 from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
+from trasim_simplified.core.frame.micro.lane_state import RingBatchState
+from trasim_simplified.msg.trasimError import TrasimError
 
 
 class LaneCircle(LaneAbstract):
@@ -13,13 +16,113 @@ class LaneCircle(LaneAbstract):
         self.is_circle = True
 
     def step(self):
+        if self.array_state is not None:
+            self.step_array()
+            return
         for i, car in enumerate(self.car_list):
             car.step(i)
 
     def update_state(self):
-        for car in self.car_list:
+        if self.array_state is not None:
+            self._update_state_array()
+            return
+        wrapped = []
+        for i, car in enumerate(self.car_list):
             self.car_state_update_common(car)
 
-            car.x -= self.lane_length if car.x > self.lane_length else 0
+            if car.x > self.lane_length:
+                car.x -= self.lane_length
+                wrapped.append(i)
+
+        # 车辆顺序不变时，越过车道终点的只可能是最下游的若干车辆，将其轮转到列表头部即可
+        car_num = len(self.car_list)
+        if wrapped == list(range(car_num - len(wrapped), car_num)):
+            if 0 < len(wrapped) < car_num:
+                self.car_list = self.car_list[-len(wrapped):] + self.car_list[:-len(wrapped)]
+        else:
+            self.car_list = sorted(self.car_list, key=lambda c: c.x)
+
+    def _update_state_array(self):
+        state = self.array_state
+        self.car_state_update_array()
+        is_wrapped = state.x > self.lane_length
+        state.x[is_wrapped] -= self.lane_length
+        state.invalidate()
+
+        wrapped_num = int(np.count_nonzero(is_wrapped))
+        if wrapped_num == 0:
+            return
+        # 与update_state相同，只有最下游的若干车辆越过终点时轮转，数组与车辆的槽位均不变
+        if np.all(is_wrapped[(state.head - np.arange(1, wrapped_num + 1)) % state.car_num]):
+            state.rotate(wrapped_num)
+            if wrapped_num < len(self.car_list):
+                self.car_list = self.car_list[-wrapped_num:] + self.car_list[:-wrapped_num]
+        else:
+            state.permute(np.argsort(state.x, kind="stable"))
+            self.car_list = list(state.car_list)
+
+
+class LaneCircleBatch(LaneCircle):
+    """
+    多个相互独立、长度相同的环形车道的批量仿真，所有车辆堆叠在同一个数组化状态中，每个仿真步统一计算
+
+    只支持数组化状态，不记录轨迹数据，预热结束后在线累计各环形车道的平均速度
+    """
+    def __init__(self, lane_length: float):
+        super().__init__(lane_length)
+        self.ring_offsets: list[int] = [0]
+        """各环形车道的起始车辆序号，长度为环形车道数 + 1"""
+        self.speed_sum: np.ndarray = np.empty(0)
+        """预热结束后各环形车道每个仿真步平均速度的累加值 [m/s]"""
+        self.sample_step = 0
+        """已累计的仿真步数"""
+
+    @property
+    def ring_num(self):
+        return len(self.ring_offsets) - 1
+
+    def add_ring(self, ring: LaneCircle):
+        """将已完成car_load的环形车道上的车辆加入批量仿真，车辆ID重新编号"""
+        if ring.lane_length != self.lane_length:
+            raise TrasimError(f"环形车道长度{ring.lane_length}与批量仿真车道长度{self.lane_length}不一致！")
+        for car in ring.car_list:
+            car.lane = self
+            car.ID = self._get_new_car_id()
+            self.car_list.append(car)
+            self._car_index_add(car)
+        ring.car_list = []
+        self.ring_offsets.append(len(self.car_list))
+        self._array_state_changed()
+        self._pos_index_invalidate()
+
+    def run(self, data_save=False, has_ui=False, **kwargs):
+        if data_save or has_ui:
+            raise TrasimError("LaneCircleBatch不支持轨迹数据记录与UI显示！")
+        kwargs["array_state"] = True
+        self.speed_sum = np.zeros(self.ring_num)
+        self.sample_step = 0
+        yield from super().run(data_save=False, has_ui=False, **kwargs)
+
+    def _new_array_state(self):
+        return RingBatchState(self, np.array(self.ring_offsets, dtype=int))
+
+    def step(self):
+        if self.step_ >= self.warm_up_step:
+            self.speed_sum += np.add.reduceat(self.array_state.v, self.ring_offsets[:-1])\
+                / np.diff(self.ring_offsets)
+            self.sample_step += 1
+        self.step_array()
+
+    def update_state(self):
+        # 车辆位置不回绕，环形车道内的车辆顺序与前后车关系保持不变
+        self.car_state_update_array()
+
+    def get_avg_speed(self) -> np.ndarray:
+        """预热结束后各环形车道的平均速度 [m/s]"""
+        return self.speed_sum / self.sample_step
+
+    def get_speed_limit(self, pos, car_type: int) -> float:
+        return super().get_speed_limit(pos % self.lane_length, car_type)
 
-        self.car_list = sorted(self.car_list, key=lambda c: c.x)
+    def get_speed_limit_array(self, pos: np.ndarray, car_type: np.ndarray) -> np.ndarray:
+        return super().get_speed_limit_array(np.mod(pos, self.lane_length), car_type)
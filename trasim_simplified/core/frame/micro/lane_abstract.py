@@ -4,6 +4,7 @@
 # @File : frame.py
 # @Software : PyCharm
 import abc
+import bisect
 from abc import ABC
 from typing import Optional, TYPE_CHECKING, Union
 
@@ -12,6 +13,9 @@ import numpy as np
 from trasim_simplified.core.constant import SECTION_TYPE, V_TYPE, CFM
 from trasim_simplified.core.data.data_container import DataContainer
 from trasim_simplified.core.data.data_processor import DataProcessor
+from trasim_simplified.core.data.detector import VirtualDetector
+from trasim_simplified.core.frame.micro.lane_state import LaneState
+from trasim_simplified.core.ui.async_ui import AsyncUI
 from trasim_simplified.core.ui.sim_ui import UI
 from trasim_simplified.core.vehicle import Vehicle
 from trasim_simplified.core.data.data_container import Info as C_Info
@@ -51,6 +55,12 @@ class LaneAbstract(ABC):
         self.lc_param_list: list[dict] = []
 
         self.car_list: list[Vehicle] = []
+        self.array_state: Optional[LaneState] = None
+        """数组化的车辆状态，run()中通过array_state=True开启"""
+        self._car_index: dict[int, Vehicle] = {}
+        """车辆ID到车道上车辆的索引"""
+        self._pos_index: Optional[list[float]] = None
+        """按car_list顺序（上游到下游）排列的车辆位置，用于二分查找前后车，None代表需要重建"""
         self._dummy_car_list: list[Vehicle] = []
         self.out_car_has_data: list[Vehicle] = []
 
@@ -93,6 +103,8 @@ class LaneAbstract(ABC):
         self.data_save = False
         self.data_container: DataContainer = DataContainer(self)
         self.data_processor: DataProcessor = DataProcessor()
+        self.detectors: list[VirtualDetector] = []
+        """在线更新的虚拟检测器，预热结束后每个仿真步更新"""
 
         self.has_ui = False
         self.ui: UI = UI(self)
@@ -226,6 +238,7 @@ class LaneAbstract(ABC):
             vehicle.set_car_param(self.car_param_list[i])
 
             self.car_list.append(vehicle)
+            self._car_index_add(vehicle)
 
             if index != car_num_total - 1:
                 length = self.car_length_list[car_type_index_list[index + 1]]
@@ -255,6 +268,8 @@ class LaneAbstract(ABC):
         if self.is_circle is True:
             self.car_list[0].follower = self.car_list[-1]
             self.car_list[-1].leader = self.car_list[0]
+        self._array_state_changed()
+        self._pos_index_invalidate()
 
         return [car.ID for car in self.car_list]
 
@@ -272,6 +287,8 @@ class LaneAbstract(ABC):
         frame_rate = kwargs.get("frame_rate", -1)
         """pygame刷新率 [fps]"""
         caption = kwargs.get("ui_caption", "微观交通流仿真")
+        ui_async = kwargs.get("ui_async", False)
+        """是否在独立进程中按照frame_rate渲染UI，仿真不等待渲染"""
         self.yield_ = kwargs.get("if_yield", True)
         """run()是否为迭代器"""
         self.has_ui = has_ui
@@ -279,25 +296,41 @@ class LaneAbstract(ABC):
         self.force_speed_limit = kwargs.get("force_speed_limit", False)
         """是否强制车辆速度不超过道路限速"""
         self.state_update_method = kwargs.get("state_update_method", "Euler")
+        if kwargs.get("array_state", False):
+            self.array_state = self._new_array_state()
 
+        # 异步UI只用于本次仿真，不替换self.ui
+        ui = AsyncUI(self) if ui_async else self.ui
         if self.has_ui and not self.road_control:
-            self.ui.ui_init(caption=caption, frame_rate=frame_rate)
-
-        # 整个仿真能够运行sim_step的仿真步
-        while self.sim_step != self.step_:
-            if not self.is_circle:
-                self.car_summon()
-            # 能够记录warm_up_step仿真步时的车辆数据
-            if self.data_save and self.step_ >= self.warm_up_step:
-                self.record()
-            self.step()  # 未更新状态，但已经计算跟驰结果
-            # 控制车辆对应的step需要在下一个仿真步才能显现到数据记录中
-            if self.yield_: yield self.step_
-            self.update_state()  # 更新车辆状态
-            if self.road_control: yield self.step_
-            self.step_ += 1
-            self.time_ += self.dt
-            if self.has_ui and not self.road_control: self.ui.ui_update()
+            ui.ui_init(caption=caption, frame_rate=frame_rate)
+
+        try:
+            # 整个仿真能够运行sim_step的仿真步
+            while self.sim_step != self.step_:
+                if not self.is_circle:
+                    self.car_summon()
+                self.sync_array_state()
+                # 能够记录warm_up_step仿真步时的车辆数据
+                if self.data_save and self.step_ >= self.warm_up_step:
+                    self.record()
+                if len(self.detectors) != 0 and self.step_ >= self.warm_up_step:
+                    for detector in self.detectors:
+                        detector.update()
+                self.step()  # 未更新状态，但已经计算跟驰结果
+                # 控制车辆对应的step需要在下一个仿真步才能显现到数据记录中
+                if self.yield_: yield self.step_
+                self.sync_array_state()
+                self.update_state()  # 更新车辆状态
+                self._pos_index_invalidate()
+                if self.road_control: yield self.step_
+                self.step_ += 1
+                self.time_ += self.dt
+                if self.has_ui and not self.road_control: ui.ui_update()
+        finally:
+            # 迭代提前结束（break或close）时同样关闭渲染进程，并输出流式记录的最后一个窗口
+            if isinstance(ui, AsyncUI):
+                ui.ui_close()
+            self.data_container.flush()
 
     def car_state_update_common(self, car: Vehicle):
         car_speed_before = car.v
@@ -331,6 +364,102 @@ class LaneAbstract(ABC):
         else:
             TrasimError(f"{self.state_update_method}更新方式未实现！")
 
+    def step_array(self):
+        """按照跟驰模型对车辆分组，每组调用一次批量计算，未实现批量计算的模型逐车计算"""
+        state = self.array_state
+        for i in state.sort_slots(np.where(state.cf_id == -1)[0]):
+            state.car_list[i].step(state.get_index(i))
+        for name, slots in state.cf_groups.items():
+            slots, param = state.get_param_block(name)
+            cf_acc = type(state.car_list[slots[0]].cf_model).step_batch(self, slots, param)
+            if cf_acc is None:
+                for i in state.sort_slots(slots):
+                    state.car_list[i].step(state.get_index(i))
+            else:
+                state.cf_acc[slots] = cf_acc
+
+    def car_state_update_array(self):
+        """car_state_update_common的数组化实现，一次性更新车道上所有车辆的状态"""
+        state = self.array_state
+        speed_before = state.v.copy()
+
+        if self.state_update_method in ["Ballistic", "Euler"]:
+            speed = speed_before + state.cf_acc * self.dt
+        elif self.state_update_method == "Trapezoidal":
+            speed = speed_before + (state.cf_acc + state.a) * self.dt / 2
+        else:
+            TrasimError(f"{self.state_update_method}更新方式未实现！")
+            speed = speed_before.copy()
+
+        if self.force_speed_limit:
+            speed_limit = self.get_speed_limit_array(state.x, state.type)
+            speed = np.where(speed > speed_limit, speed_limit, speed)
+
+        is_negative = speed < 0
+        if np.any(is_negative):
+            TrasimWarning(f"车辆速度出现负数！")
+        state.a[:] = np.where(is_negative, - (speed_before / self.dt), state.cf_acc)
+        state.v[:] = np.where(is_negative, 0, speed)
+
+        if self.state_update_method == "Ballistic":
+            state.x += (speed_before + state.v) * self.dt / 2
+        elif self.state_update_method == "Euler":
+            state.x += state.v * self.dt
+        elif self.state_update_method == "Trapezoidal":
+            state.x += speed_before * self.dt + state.a * (self.dt ** 2) / 2
+        else:
+            TrasimError(f"{self.state_update_method}更新方式未实现！")
+        state.invalidate()
+
+    def get_speed_limit_array(self, pos: np.ndarray, car_type: np.ndarray) -> np.ndarray:
+        """get_speed_limit的数组化实现"""
+        if self.force_speed_limit is False:
+            return np.full(len(pos), np.Inf)
+        speed_limit = np.full(len(pos), float(self._default_speed_limit))
+        for type_, speed_limit_for_type in self.speed_limit.items():
+            # 逆序赋值，使得先设置的限速区间优先
+            for key, pos_ in reversed(list(speed_limit_for_type.items())):
+                speed_limit[(car_type == type_) & (pos_[0] <= pos) & (pos <= pos_[1])] = key
+        return speed_limit
+
+    def _new_array_state(self) -> LaneState:
+        return LaneState(self)
+
+    def sync_array_state(self):
+        """车辆列表发生变化时重新打包数组化的车辆状态"""
+        if self.array_state is None:
+            return
+        if self.array_state.stale or self.array_state.car_num != len(self.car_list):
+            self.array_state.pack(self.car_list)
+
+    def _array_state_changed(self):
+        if self.array_state is not None:
+            self.array_state.stale = True
+
+    def get_pos_index(self) -> list[float]:
+        """获取按car_list顺序排列的车辆位置（升序），在车辆状态更新后的首次查询时重建"""
+        if self._pos_index is None:
+            state = self.array_state
+            if state is not None and not state.stale and state.car_num == len(self.car_list):
+                self._pos_index = state.x[state.get_order()].tolist()
+            else:
+                self._pos_index = [float(car.x) for car in self.car_list]
+        return self._pos_index
+
+    def _pos_index_invalidate(self):
+        self._pos_index = None
+
+    def _car_index_add(self, car: Vehicle):
+        self._car_index[car.ID] = car
+        if self.road_control:
+            self.road.car_index_add(car)
+
+    def _car_index_remove(self, car: Vehicle):
+        if self._car_index.get(car.ID, None) is car:
+            del self._car_index[car.ID]
+        if self.road_control:
+            self.road.car_index_remove(car)
+
     @abc.abstractmethod
     def update_state(self):
         pass
@@ -344,9 +473,19 @@ class LaneAbstract(ABC):
         pass
 
     def record(self):
-        for car in self.car_list:
-            if car.type != V_TYPE.OBSTACLE:
-                car.record()
+        self.data_container.record()
+
+    def add_detector(self, pos: float, width: float, d_step: int) -> VirtualDetector:
+        """
+        添加虚拟线圈检测器，data_save=False时同样可用
+
+        :param pos: 检测区域起点 [m]
+        :param width: 检测区域长度 [m]
+        :param d_step: 每个检测周期的仿真步数
+        """
+        detector = VirtualDetector(self, pos, width, d_step)
+        self.detectors.append(detector)
+        return detector
 
     def _make_dummy_car(self, pos):
         car = Vehicle(self, V_TYPE.OBSTACLE, -1, 1e-5)
@@ -370,9 +509,9 @@ class LaneAbstract(ABC):
 
     def take_over(self, car_id: int, acc_values: float):
         """控制指定车辆运动"""
-        for car in self.car_list:
-            if car.ID == car_id:
-                car.cf_acc = acc_values
+        car = self._get_car(car_id)
+        if car is not None:
+            car.cf_acc = acc_values
 
     def car_insert(self, car_length: float, car_type: str, car_pos: float, car_speed: float, car_acc: float,
                    cf_name: str, cf_param: dict[str, float], car_param: dict,
@@ -385,9 +524,13 @@ class LaneAbstract(ABC):
     def car_remove(self, car: Vehicle, put_out_car_has_data=False):
         if put_out_car_has_data:
             self.out_car_has_data.append(car)
+        if self._pos_index is not None:
+            self._pos_index.pop(self.car_list.index(car))
         self.car_list.remove(car)
-        if hasattr(car, "plot_item"):
-            car.__getattribute__("screen").removeItem(car.plot_item)
+        self._car_index_remove(car)
+        if self.array_state is not None and car.get_state() is self.array_state:
+            car.unbind_state()
+        self._array_state_changed()
         if car.leader is not None:
             car.leader.follower = car.follower
         if car.follower is not None:
@@ -405,16 +548,15 @@ class LaneAbstract(ABC):
         return car
 
     def car_insert_by_instance(self, car: Vehicle, is_dummy=False):
+        self._array_state_changed()
         car.lane = self
         car.leader = car.follower = None
         if len(self.car_list) != 0:
-            pos_list = np.array([car.x for car in self.car_list])
-            index = np.where(pos_list < car.x)[0]
-            if len(index) != 0:
-                index = index[-1]
+            # 最后一辆位置小于car.x的车辆为后车，不存在时环形车道的后车为最下游车辆
+            index = bisect.bisect_left(self.get_pos_index(), car.x) - 1
+            if index >= 0:
                 follower = self.car_list[index]
             else:
-                index = -1
                 follower = self.car_list[-1] if self.is_circle else None
 
             if follower is not None:
@@ -431,34 +573,36 @@ class LaneAbstract(ABC):
 
             if not is_dummy:
                 self.car_list.insert(index + 1, car)
+                self._pos_index.insert(index + 1, float(car.x))
+                self._car_index_add(car)
         else:
             if not is_dummy:
                 self.car_list.append(car)
+                self._pos_index = [float(car.x)]
+                self._car_index_add(car)
             if self.is_circle:
                 car.leader = car
                 car.follower = car
         return True
 
     def get_car_info(self, id_: int, info_name: str):
-        for car in self.car_list:
-            if car.ID == id_:
-                if info_name == C_Info.x:
-                    return car.x
-                if info_name == C_Info.v:
-                    return car.v
-                if info_name == C_Info.a:
-                    return car.a
-                if info_name == C_Info.gap:
-                    return car.gap
-                if info_name == C_Info.dhw:
-                    return car.dhw
-                raise TrasimError(f"{info_name}未创建！")
-        return None
-
-    def _get_car(self, id_):
-        for car in self.car_list:
-            if car.ID == id_:
-                return car
+        car = self._get_car(id_)
+        if car is None:
+            return None
+        if info_name == C_Info.x:
+            return car.x
+        if info_name == C_Info.v:
+            return car.v
+        if info_name == C_Info.a:
+            return car.a
+        if info_name == C_Info.gap:
+            return car.gap
+        if info_name == C_Info.dhw:
+            return car.dhw
+        raise TrasimError(f"{info_name}未创建！")
+
+    def _get_car(self, id_) -> Optional[Vehicle]:
+        return self._car_index.get(id_, None)
 
     def car_insert_middle(self, car_length: float, car_type: str, car_speed: float, car_acc: float,
                           cf_name: str, cf_param: dict[str, float], car_param: dict, front_car_id: int,
@@ -486,18 +630,19 @@ class LaneAbstract(ABC):
 
     def _get_relative_car_by_id(self, id_, offset: int):
         assert offset - int(offset) == 0, "offset必须是整数"
-        for car in self.car_list:
-            if car.ID == id_:
-                while offset != 0:
-                    if offset > 0:
-                        if car.leader is not None:
-                            car = car.leader
-                        offset -= 1
-                    else:
-                        if car.follower is not None:
-                            car = car.follower
-                        offset += 1
-                return car
+        car = self._get_car(id_)
+        if car is None:
+            return None
+        while offset != 0:
+            if offset > 0:
+                if car.leader is not None:
+                    car = car.leader
+                offset -= 1
+            else:
+                if car.follower is not None:
+                    car = car.follower
+                offset += 1
+        return car
 
     def get_relative_car(self, car: Vehicle = None)\
             -> tuple[Optional[Vehicle], Optional[Vehicle]]:
@@ -570,9 +715,11 @@ class LaneAbstract(ABC):
         return follower_, leader_
 
     def _common_get_relative_car(self, pos: float):
-        for car in self.car_list:
-            if car.x > pos:
-                return car.follower, car
+        # 第一辆位置大于pos的车辆为前车
+        index = bisect.bisect_right(self.get_pos_index(), pos)
+        if index < len(self.car_list):
+            car = self.car_list[index]
+            return car.follower, car
         if len(self.car_list) != 0:
             if self.is_circle is True:
                 return self.car_list[-1], self.car_list[0]
@@ -583,6 +730,8 @@ class LaneAbstract(ABC):
     def car_param_update(self, id_, cf_param: dict[str, float] = None, lc_param: dict[str, float] = None,
                          car_param: dict[str, float] = None):
         car = self._get_car(id_)
+        if self.array_state is not None:
+            self.array_state.param_changed(car.cf_model)
         car.cf_model.param_update(cf_param if cf_param is not None else {})
         car.lc_model.param_update(lc_param if lc_param is not None else {})
         car.set_car_param(car_param if car_param is not None else {})
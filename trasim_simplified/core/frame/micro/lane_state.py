@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 10:12
+# @Author : yzbyx
+# @File : lane_state.py
+# Software: PyCharm
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from trasim_simplified.core.constant import V_TYPE
+from trasim_simplified.core.kinematics.cfm import get_cf_id
+from trasim_simplified.msg.trasimError import TrasimError
+
+if TYPE_CHECKING:
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
+    from trasim_simplified.core.vehicle import Vehicle
+
+
+class LaneState:
+    """
+    车道车辆状态的数组化存储 (Structure of Arrays)
+
+    车辆按照car_list的顺序（上游到下游）依次占据数组的槽位，Vehicle的x、v、a、cf_acc为对应槽位的视图；
+    环形车道的槽位首尾相接，car_list从head槽位开始，车辆越过终点时只移动head，不移动数组与车辆的槽位
+    """
+    def __init__(self, lane: 'LaneAbstract'):
+        self.lane = lane
+        self.car_list: list['Vehicle'] = []
+
+        self.x = np.empty(0)
+        """位置 [m]"""
+        self.v = np.empty(0)
+        """速度 [m/s]"""
+        self.a = np.empty(0)
+        """加速度 [m/s^2]"""
+        self.cf_acc = np.empty(0)
+        """跟驰模型计算的加速度 [m/s^2]"""
+        self.length = np.empty(0)
+        """车辆长度 [m]"""
+        self.type = np.empty(0, dtype=int)
+        """车辆类型"""
+        self.ID = np.empty(0, dtype=int)
+        """车辆ID"""
+        self.leader = np.empty(0, dtype=int)
+        """前车槽位，-1代表无前车"""
+        self.cf_id = np.empty(0, dtype=int)
+        """跟驰模型ID，-1代表障碍物"""
+        self.expect_acc = np.empty(0)
+        """跟驰模型的期望加速度 [m/s^2]"""
+        self.expect_dec = np.empty(0)
+        """跟驰模型的期望减速度 [m/s^2]，值为正数"""
+
+        self.cf_groups: dict[str, np.ndarray] = {}
+        """跟驰模型名称对应的车辆槽位"""
+        self.cf_param_names: dict[str, list[str]] = {}
+        """跟驰模型名称对应的参数名称顺序"""
+        self.cf_param_blocks: dict[str, np.ndarray] = {}
+        """跟驰模型名称对应的参数矩阵 (车辆数 × 参数数)"""
+        self._param_maps: dict = {}
+
+        self.head = 0
+        """car_list首辆车（最上游车辆）所在的槽位"""
+        self.spare = 0
+        """数组头部的空闲槽位数，供开边界车道生成车辆时使用，对应car_list中的None"""
+        self._group_buffers: dict[str, tuple[np.ndarray, np.ndarray, int]] = {}
+
+        self.stale = True
+        """车辆列表或前后车关系已改变，需要重新打包"""
+
+        self._dhw: Optional[np.ndarray] = None
+        self._gap: Optional[np.ndarray] = None
+        self._dv: Optional[np.ndarray] = None
+
+    @property
+    def car_num(self):
+        return len(self.car_list) - self.spare
+
+    def pack(self, car_list: list['Vehicle']):
+        """按照car_list重新打包数组，并将车辆绑定为对应槽位的视图"""
+        car_num = len(car_list)
+        type_, id_, cf_id = (np.empty(car_num, dtype=int) for _ in range(3))
+        length, expect_acc, expect_dec = (np.empty(car_num) for _ in range(3))
+        old_slots = np.full(car_num, -1, dtype=int)
+        slot_map = {}
+        groups: dict[str, list[int]] = {}
+        for i, car in enumerate(car_list):
+            if car.get_state() is self:
+                old_slots[i] = car.get_slot()
+            length[i] = car.length
+            type_[i] = car.type
+            id_[i] = car.ID
+            slot_map[id(car)] = i
+            expect_acc[i] = car.cf_model.get_expect_acc()
+            expect_dec[i] = car.cf_model.get_expect_dec()
+            if car.type == V_TYPE.OBSTACLE:
+                cf_id[i] = -1
+            else:
+                cf_id[i] = get_cf_id(car.cf_model.name)
+                groups.setdefault(car.cf_model.name, []).append(i)
+        # 已绑定的车辆直接从原数组中取值，新加入的车辆从车辆自身取值
+        is_bound = old_slots >= 0
+        x, v, a, cf_acc = (old[np.where(is_bound, old_slots, 0)] if len(old) > 0 else np.zeros(car_num)
+                           for old in (self.x, self.v, self.a, self.cf_acc))
+        for i in np.where(~is_bound)[0]:
+            car = car_list[i]
+            x[i], v[i], a[i], cf_acc[i] = car.x, car.v, car.a, car.cf_acc
+        leader = np.array([slot_map.get(id(car.leader), -1) for car in car_list], dtype=int)
+
+        for car in self.car_list:
+            if car is not None and car.get_state() is self and id(car) not in slot_map:
+                car.unbind_state()
+
+        self.car_list = list(car_list)
+        self.x, self.v, self.a, self.cf_acc, self.length = x, v, a, cf_acc, length
+        self.type, self.ID, self.leader, self.cf_id = type_, id_, leader, cf_id
+        self.expect_acc, self.expect_dec = expect_acc, expect_dec
+        for i, car in enumerate(car_list):
+            car.bind_state(self, i)
+
+        self.cf_groups = {name: np.array(slots, dtype=int) for name, slots in groups.items()}
+        self._pack_param_blocks()
+        self.head = self.spare = 0
+        self.stale = False
+        self.invalidate()
+
+    def _get_param_map(self, cf_model) -> dict:
+        param_map = self._param_maps.get(cf_model, None)
+        if param_map is None:
+            param_map = {k: value for k, value in cf_model.get_param_map().items()
+                         if isinstance(value, (int, float, np.number)) and not isinstance(value, bool)}
+        return param_map
+
+    def _pack_param_blocks(self):
+        param_maps = {}
+        self.cf_param_names.clear()
+        self.cf_param_blocks.clear()
+        for name, slots in self.cf_groups.items():
+            group_maps = []
+            for i in slots:
+                cf_model = self.car_list[i].cf_model
+                param_map = self._get_param_map(cf_model)
+                param_maps[cf_model] = param_map
+                group_maps.append(param_map)
+            param_names = list(group_maps[0].keys())
+            self.cf_param_names[name] = param_names
+            self.cf_param_blocks[name] = np.array(
+                [[param_map.get(k, np.nan) for k in param_names] for param_map in group_maps], dtype=float
+            ).reshape(len(slots), len(param_names))
+        self._param_maps = param_maps
+
+    def _reserve(self):
+        """
+        在数组头部预留空闲槽位（数量不小于现有槽位数），已有车辆的槽位整体后移
+
+        只在空闲槽位用尽时调用，重新绑定车辆的开销均摊到之后的各次insert_first
+        """
+        num = max(len(self.x), 16)
+
+        def pad(old: np.ndarray, fill) -> np.ndarray:
+            return np.concatenate([np.full(num, fill, dtype=old.dtype), old])
+
+        self.x, self.v, self.a, self.cf_acc, self.length, self.expect_acc, self.expect_dec = (
+            pad(old, fill) for old, fill in zip(
+                (self.x, self.v, self.a, self.cf_acc, self.length, self.expect_acc, self.expect_dec),
+                (np.nan, 0, 0, 0, np.nan, 0, 0)))
+        # 空闲槽位的cf_id为-2，不会被当作障碍物（-1）或跟驰车辆
+        self.type, self.ID, self.cf_id = pad(self.type, -1), pad(self.ID, -1), pad(self.cf_id, -2)
+        self.leader = pad(np.where(self.leader >= 0, self.leader + num, -1), -1)
+        for name, slots in self.cf_groups.items():
+            self.cf_groups[name] = slots + num
+        self._group_buffers = {}
+
+        self.car_list = [None] * num + self.car_list
+        self.head += num
+        self.spare += num
+        for i in range(self.head, len(self.car_list)):
+            self.car_list[i].bind_state(self, i)
+
+    def _prepend_group(self, name: str, slot: int, row: np.ndarray):
+        """在跟驰模型分组头部加入槽位与参数行，分组数组同样在头部预留空间"""
+        slots = self.cf_groups.get(name, None)
+        num = 0 if slots is None else len(slots)
+        buffer, block_buffer, start = self._group_buffers.get(name, (None, None, 0))
+        # 分组数组被重新打包或重排后，原有的预留空间失效
+        if start == 0 or slots is None or slots.base is not buffer:
+            start = max(num, 16)
+            buffer = np.empty(start + num, dtype=int)
+            block_buffer = np.empty((start + num, len(row)))
+            if slots is not None:
+                buffer[start:] = slots
+                block_buffer[start:] = self.cf_param_blocks[name]
+        start -= 1
+        buffer[start] = slot
+        block_buffer[start] = row
+        self._group_buffers[name] = (buffer, block_buffer, start)
+        self.cf_groups[name] = buffer[start: start + num + 1]
+        self.cf_param_blocks[name] = block_buffer[start: start + num + 1]
+
+    def insert_first(self, car: 'Vehicle'):
+        """
+        在car_list头部（最上游）加入车辆，不重新打包：新车辆占据head之前的空闲槽位，其余车辆的槽位不变
+
+        用于开边界车道的车辆生成，需要数组与car_list一致
+        """
+        if self.spare == 0:
+            self._reserve()
+        slot = self.head - 1
+        self.x[slot], self.v[slot], self.a[slot], self.cf_acc[slot] = car.x, car.v, car.a, car.cf_acc
+        self.length[slot], self.type[slot], self.ID[slot] = car.length, car.type, car.ID
+        self.expect_acc[slot] = car.cf_model.get_expect_acc()
+        self.expect_dec[slot] = car.cf_model.get_expect_dec()
+        self.leader[slot] = car.leader.get_slot() \
+            if car.leader is not None and car.leader.get_state() is self else -1
+        if car.type == V_TYPE.OBSTACLE:
+            self.cf_id[slot] = -1
+        else:
+            name = car.cf_model.name
+            self.cf_id[slot] = get_cf_id(name)
+            param_map = self._param_maps[car.cf_model] = self._get_param_map(car.cf_model)
+            param_names = self.cf_param_names.setdefault(name, list(param_map.keys()))
+            self._prepend_group(name, slot, np.array([param_map.get(k, np.nan) for k in param_names]))
+
+        self.car_list[slot] = car
+        self.head = slot
+        self.spare -= 1
+        car.bind_state(self, slot)
+        self.invalidate()
+
+    def remove_last(self, num: int):
+        """
+        移除car_list尾部（最下游）的num辆车，不重新打包，其余车辆的槽位不变
+
+        用于开边界车道的车辆驶出，需要移除前数组与car_list一致
+        """
+        size = len(self.car_list) - num
+        removed = self.car_list[size:]
+        del self.car_list[size:]
+        for car in removed:
+            if car.get_state() is self:
+                car.unbind_state()
+            self._param_maps.pop(car.cf_model, None)
+        self.x, self.v, self.a, self.cf_acc, self.length = \
+            self.x[:size], self.v[:size], self.a[:size], self.cf_acc[:size], self.length[:size]
+        self.type, self.ID, self.cf_id = self.type[:size], self.ID[:size], self.cf_id[:size]
+        self.expect_acc, self.expect_dec = self.expect_acc[:size], self.expect_dec[:size]
+        self.leader = self.leader[:size]
+        # 只有被移除车辆的后车可能以被移除的槽位为前车
+        for car in removed:
+            follower = car.follower
+            if follower is not None and follower.get_state() is self and follower.get_slot() < size:
+                leader = follower.leader
+                self.leader[follower.get_slot()] = leader.get_slot() \
+                    if leader is not None and leader.get_state() is self and leader.get_slot() < size else -1
+
+        for name in list(self.cf_groups.keys()):
+            slots = self.cf_groups[name]
+            kept_num = np.searchsorted(slots, size)
+            if kept_num == len(slots):
+                continue
+            if kept_num == 0:
+                del self.cf_groups[name], self.cf_param_blocks[name], self.cf_param_names[name]
+                self._group_buffers.pop(name, None)
+                continue
+            self.cf_groups[name] = slots[:kept_num]
+            self.cf_param_blocks[name] = self.cf_param_blocks[name][:kept_num]
+
+        self.stale = False
+        self.invalidate()
+
+    def param_changed(self, cf_model):
+        """模型参数更新后调用，使参数矩阵在下次打包时重新计算"""
+        self._param_maps.pop(cf_model, None)
+        self.stale = True
+
+    def get_param_block(self, cf_name: str) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        """
+        获取指定跟驰模型的车辆槽位以及参数列向量
+
+        :param cf_name: 跟驰模型名称
+        :return: (车辆槽位, {参数名称: 参数列向量})
+        """
+        slots = self.cf_groups.get(cf_name, np.empty(0, dtype=int))
+        if len(slots) == 0:
+            return slots, {}
+        block = self.cf_param_blocks[cf_name]
+        return slots, {k: block[:, j] for j, k in enumerate(self.cf_param_names[cf_name])}
+
+    def split_by_leader(self, slots: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        按照是否存在前车划分车辆
+
+        :param slots: 车辆槽位
+        :return: (是否存在前车的掩码, 存在前车的车辆槽位, 对应的前车槽位)
+        """
+        has_leader = self.leader[slots] >= 0
+        index = slots[has_leader]
+        return has_leader, index, self.leader[index]
+
+    def get_index(self, slots):
+        """:return: 槽位对应的车辆在car_list中的序号"""
+        return (slots - self.head) % len(self.x)
+
+    def get_order(self) -> np.ndarray:
+        """:return: 按car_list顺序排列的全部车辆槽位（不含空闲槽位）"""
+        if self.head == 0:
+            return np.arange(self.car_num)
+        if self.spare != 0:
+            return np.arange(self.head, len(self.x))
+        return np.concatenate([np.arange(self.head, self.car_num), np.arange(self.head)])
+
+    def sort_slots(self, slots: np.ndarray) -> np.ndarray:
+        """:return: 按car_list顺序排列的槽位"""
+        if self.head == 0:
+            return slots
+        return slots[np.argsort(self.get_index(slots), kind="stable")]
+
+    def is_first(self) -> np.ndarray:
+        """对应Vehicle.is_first，前车不存在或为障碍物"""
+        leader_type = self.type[np.where(self.leader >= 0, self.leader, 0)]
+        return (self.leader < 0) | (leader_type == V_TYPE.OBSTACLE)
+
+    def invalidate(self):
+        """位置、速度等状态更新后，清空派生指标的缓存"""
+        self._dhw = self._gap = self._dv = None
+
+    def _cal_derived(self):
+        if len(self.x) == 0:
+            self._dhw = self._gap = self._dv = np.empty(0)
+            return
+        has_leader = self.leader >= 0
+        leader = np.where(has_leader, self.leader, 0)
+        dhw = np.where(has_leader, self.x[leader] - self.x, np.nan)
+        is_negative = dhw < 0
+        if self.lane.is_circle:
+            # 最下游车辆的前车为最上游车辆，间距跨越车道终点
+            last = (self.head + self.car_num - 1) % len(self.x)
+            if is_negative[last]:
+                dhw[last] += self.lane.lane_length
+                is_negative[last] = False
+        if np.any(is_negative):
+            index = int(self.sort_slots(np.where(is_negative)[0])[0])
+            raise TrasimError(f"车头间距小于0！\n" + self.car_list[index].get_basic_info())
+        self._dhw = dhw
+        self._gap = dhw - np.where(has_leader, self.length[leader], np.nan)
+        self._dv = np.where(has_leader, self.v[leader] - self.v, np.nan)
+
+    @property
+    def dhw(self) -> np.ndarray:
+        if self._dhw is None:
+            self._cal_derived()
+        return self._dhw
+
+    @property
+    def gap(self) -> np.ndarray:
+        if self._gap is None:
+            self._cal_derived()
+        return self._gap
+
+    @property
+    def dv(self) -> np.ndarray:
+        """前车与当前车速度差"""
+        if self._dv is None:
+            self._cal_derived()
+        return self._dv
+
+    def permute(self, order: np.ndarray):
+        """按照新的顺序重排车辆（车辆间的前后车关系不变），order为新car_list顺序对应的原槽位"""
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        self.x, self.v, self.a, self.cf_acc, self.length = \
+            self.x[order], self.v[order], self.a[order], self.cf_acc[order], self.length[order]
+        self.type, self.ID, self.cf_id = self.type[order], self.ID[order], self.cf_id[order]
+        self.expect_acc, self.expect_dec = self.expect_acc[order], self.expect_dec[order]
+        leader = self.leader[order]
+        self.leader = np.where(leader >= 0, inverse[np.where(leader >= 0, leader, 0)], -1)
+        self.car_list = [self.car_list[i] for i in order]
+        for i, car in enumerate(self.car_list):
+            car.bind_state(self, i)
+        self.head = 0
+        for name, slots in self.cf_groups.items():
+            slots = inverse[slots]
+            sort_index = np.argsort(slots)
+            self.cf_groups[name] = slots[sort_index]
+            self.cf_param_blocks[name] = self.cf_param_blocks[name][sort_index]
+        self.invalidate()
+
+    def rotate(self, num: int):
+        """将最下游的num辆车轮转至car_list头部（环形车道车辆越过终点），只移动head，车辆槽位不变"""
+        self.head = (self.head - num) % self.car_num
+
+    def unbind_all(self):
+        for car in self.car_list:
+            if car is not None and car.get_state() is self:
+                car.unbind_state()
+        self.car_list = []
+        self.spare = 0
+
+
+class RingBatchState(LaneState):
+    """
+    多个相互独立、长度相同的环形车道堆叠而成的数组化车辆状态，供LaneCircleBatch使用
+
+    每个环形车道的车辆占据连续的槽位，车辆位置不回绕，各环形车道最下游车辆的前车为该车道最上游车辆
+    """
+    def __init__(self, lane: 'LaneAbstract', ring_offsets: np.ndarray):
+        super().__init__(lane)
+        self.ring_offsets = ring_offsets
+        """各环形车道的起始槽位，长度为环形车道数 + 1"""
+
+    def _cal_derived(self):
+        if self.car_num == 0:
+            self._dhw = self._gap = self._dv = np.empty(0)
+            return
+        has_leader = self.leader >= 0
+        leader = np.where(has_leader, self.leader, 0)
+        dhw = np.where(has_leader, self.x[leader] - self.x, np.nan)
+        dhw[self.ring_offsets[1:] - 1] += self.lane.lane_length
+        if np.any(dhw < 0):
+            index = int(np.where(dhw < 0)[0][0])
+            raise TrasimError(f"车头间距小于0！\n" + self.car_list[index].get_basic_info())
+        self._dhw = dhw
+        self._gap = dhw - np.where(has_leader, self.length[leader], np.nan)
+        self._dv = np.where(has_leader, self.v[leader] - self.v, np.nan)
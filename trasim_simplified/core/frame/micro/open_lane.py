@@ -49,6 +49,9 @@ class LaneOpen(LaneAbstract):
         self.car_num_percent = np.array(self.car_num_list) / sum(self.car_num_list)
 
     def step(self):
+        if self.array_state is not None:
+            self.step_array()
+            return
         for i, car in enumerate(self.car_list):
             car.step(i)
 
@@ -105,6 +108,13 @@ class LaneOpen(LaneAbstract):
                 self.car_list[0].follower = vehicle
 
             self.car_list.insert(0, vehicle)
+            self._car_index_add(vehicle)
+            state = self.array_state
+            if state is not None and not state.stale and state.car_num == len(self.car_list) - 1:
+                state.insert_first(vehicle)  # 新车辆位于最上游，占据数组头部的空闲槽位，不重新打包
+            else:
+                self._array_state_changed()
+            self._pos_index_invalidate()
 
             self._set_next_summon_time()
 
@@ -129,6 +139,20 @@ class LaneOpen(LaneAbstract):
         self.next_car_time += thw
 
     def update_state(self):
+        if self.array_state is not None:
+            state = self.array_state
+            self.car_state_update_array()
+            is_run_out = state.x > self.lane_length
+            run_out_cars = [state.car_list[i] for i in np.where(is_run_out)[0]]
+            # 驶出的车辆均为最下游的车辆时，截断数组即可，不重新打包
+            is_tail = not state.stale and state.car_num == len(self.car_list) and \
+                np.all(is_run_out[len(state.x) - len(run_out_cars):])
+            for car in run_out_cars:
+                car.is_run_out = True
+                self.car_remove(car, car.has_data())
+            if len(run_out_cars) > 0 and is_tail:
+                state.remove_last(len(run_out_cars))
+            return
         for car in self.car_list:
             self.car_state_update_common(car)
 
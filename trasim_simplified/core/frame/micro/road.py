@@ -6,16 +6,21 @@
 import time
 from typing import Optional
 
+import numpy as np
 import pandas as pd
 
 from trasim_simplified.core.constant import SECTION_TYPE, V_TYPE
 from trasim_simplified.core.data.data_processor import DataProcessor
+from trasim_simplified.core.data.data_store import TrajectoryStore
 from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 from trasim_simplified.core.frame.micro.open_lane import LaneOpen
 from trasim_simplified.core.frame.micro.circle_lane import LaneCircle
 from trasim_simplified.core.ui.pyqtgraph_ui import PyqtUI
+from trasim_simplified.core.ui.async_ui import AsyncUI
 from trasim_simplified.core.ui.sim_ui import UI
+from trasim_simplified.core.vehicle import Vehicle
 from trasim_simplified.core.data.data_container import Info as C_Info
+from trasim_simplified.msg.trasimError import TrasimError
 from trasim_simplified.msg.trasimWarning import TrasimWarning
 
 
@@ -27,6 +32,8 @@ class Road:
         self.lane_length = length
         self.lane_list: list[LaneAbstract] = []
         self.id_accumulate = 0
+        self._car_index: dict[int, Vehicle] = {}
+        """车辆ID到车辆的索引，车辆所在车道为car.lane，由各车道在车辆加入和移除时维护"""
 
         if pyqtgraph:
             self.ui: PyqtUI = PyqtUI(self)
@@ -80,8 +87,10 @@ class Road:
         """总仿真步 [次]"""
         self.has_ui = has_ui
 
+        # 异步UI只用于本次仿真，不替换self.ui
+        ui = AsyncUI(self) if kwargs.get("ui_async", False) else self.ui
         if self.has_ui:
-            self.ui.ui_init(frame_rate=kwargs.get("frame_rate", -1))
+            ui.ui_init(frame_rate=kwargs.get("frame_rate", -1))
 
         lanes_iter = [lane.run(data_save=data_save, has_ui=False, **kwargs) for lane in self.lane_list]
 
@@ -90,18 +99,25 @@ class Road:
         time_stamp = "%s.%s" % (data_head, str(timeIn).split('.')[-1][:5])
         timeStart = time_stamp
 
-        while self.sim_step != self.step_:
-            for i, lane_iter in enumerate(lanes_iter):
-                self.step_ = lane_iter.__next__()
-            if self.yield_: yield self.step_, 0  # 跟驰
-            for i, lane_iter in enumerate(lanes_iter):
-                self.step_ = lane_iter.__next__()  # 跟驰状态更新
-            self.step_lane_change()
-            if self.yield_: yield self.step_, 1  # 换道
-            self.update_lc_state()  # 换道状态更新
-            self.step_ += 1
-            self.time_ += self.dt
-            if self.has_ui: self.ui.ui_update()
+        try:
+            while self.sim_step != self.step_:
+                for i, lane_iter in enumerate(lanes_iter):
+                    self.step_ = lane_iter.__next__()
+                if self.yield_: yield self.step_, 0  # 跟驰
+                for i, lane_iter in enumerate(lanes_iter):
+                    self.step_ = lane_iter.__next__()  # 跟驰状态更新
+                self.step_lane_change()
+                if self.yield_: yield self.step_, 1  # 换道
+                self.update_lc_state()  # 换道状态更新
+                self.step_ += 1
+                self.time_ += self.dt
+                if self.has_ui: ui.ui_update()
+        finally:
+            # 迭代提前结束（break或close）时同样关闭渲染进程，并输出各车道流式记录的最后一个窗口
+            if isinstance(ui, AsyncUI):
+                ui.ui_close()
+            for lane in self.lane_list:
+                lane.data_container.flush()
 
         timeOut = time.time()
         log_string = '[' + self.run.__name__ + '] ' + 'time usage: ' + timeStart + ' + ' + \
@@ -161,9 +177,25 @@ class Road:
     def get_appropriate_car(self, lane_add_num=0):
         return self.lane_list[lane_add_num].get_appropriate_car()
 
+    def car_index_add(self, car: Vehicle):
+        self._car_index[car.ID] = car
+
+    def car_index_remove(self, car: Vehicle):
+        if self._car_index.get(car.ID, None) is car:
+            del self._car_index[car.ID]
+
+    def get_car(self, car_id: int) -> Optional[Vehicle]:
+        """获取指定ID的车辆，车辆所在车道为car.lane"""
+        return self._car_index.get(car_id, None)
+
+    def get_car_lane(self, car_id: int) -> Optional[LaneAbstract]:
+        car = self.get_car(car_id)
+        return None if car is None else car.lane
+
     def get_car_info(self, car_id: int, info: str, lane_add_num=None):
         if lane_add_num is None:
-            for lane in self.lane_list:
+            lane = self.get_car_lane(car_id)
+            if lane is not None:
                 result = lane.get_car_info(car_id, info)
                 if result is not None:
                     return result
@@ -203,6 +235,25 @@ class Road:
 
         return lefts[0], rights[0]
 
+    def add_detector(self, lane_add_num: int, pos: float, width: float, d_step: int):
+        """在指定车道添加虚拟线圈检测器，见LaneAbstract.add_detector"""
+        return self.lane_list[lane_add_num].add_detector(pos, width, d_step)
+
+    def stream_to(self, path: str, flush_step: int = 1000, file_format: str = "parquet"):
+        """各车道的轨迹数据流式写入同一数据集，按车道分区，见DataContainer.stream_to"""
+        for lane in self.lane_list:
+            lane.data_container.stream_to(path, flush_step, file_format)
+
+    def to_store(self, path: str) -> TrajectoryStore:
+        """将所有车道的轨迹数据写入同一内存映射存储，见DataContainer.to_store"""
+        lane_columns = [lane.data_container.get_columns() for lane in self.lane_list]
+        lane_columns = [columns for columns in lane_columns if len(columns) != 0]
+        if len(lane_columns) == 0:
+            raise TrasimError("没有可写入的轨迹数据！")
+        infos = set.intersection(*[set(columns.keys()) for columns in lane_columns])
+        return TrajectoryStore.write(path, {info: np.concatenate([columns[info] for columns in lane_columns])
+                                            for info in infos})
+
     def data_to_df(self):
         if self.total_data is None:
             self.total_data = pd.concat([lane.data_container.data_to_df() for lane in self.lane_list], axis=0,
@@ -217,8 +268,7 @@ class Road:
 
     def take_over(self, car_id: int, acc_values: float, lc_result: dict):
         """控制指定车辆运动"""
-        for lane in self.lane_list:
-            for car in lane.car_list:
-                if car.ID == car_id:
-                    car.cf_acc = acc_values
-                    car.lc_result = lc_result
+        car = self.get_car(car_id)
+        if car is not None:
+            car.cf_acc = acc_values
+            car.lc_result = lc_result
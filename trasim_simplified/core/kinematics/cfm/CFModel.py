@@ -15,6 +15,7 @@ from trasim_simplified.core.kinematics.model import Model
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 
 class CFModel(Model, ABC):
@@ -44,6 +45,18 @@ class CFModel(Model, ABC):
     def get_expect_speed(self):
         pass
 
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]) -> Optional[np.ndarray]:
+        """
+        批量计算车道上同一跟驰模型车辆下一时间步的加速度，需要车道开启array_state
+
+        :param lane: 车辆所在车道
+        :param slots: 车辆在lane.array_state中的槽位（升序）
+        :param param: 模型参数名称对应的列向量
+        :return: 与slots对应的加速度数组，返回None代表未实现批量计算，由step逐车计算
+        """
+        return None
+
     def get_speed_limit(self):
         if self.vehicle.lane.force_speed_limit is False:
             return np.Inf
@@ -52,9 +65,28 @@ class CFModel(Model, ABC):
     def equilibrium_state(self, *args):
         pass
 
-    def basic_diagram_k_to_q(self, dhw, car_length, speed_limit):
-        """veh/s"""
-        pass
+    def equilibrium_dhw(self, speed: np.ndarray, car_length: float, speed_limit=None) -> Optional[np.ndarray]:
+        """
+        平衡态速度对应的车头间距，用于生成基本图数值表，车头间距 = 平衡态净间距 + car_length
+
+        :param speed: 平衡态速度数组 [m/s]
+        :param car_length: 前车长度 [m]
+        :param speed_limit: 道路限速 [m/s]
+        :return: 平衡态车头间距数组 [m]，超出模型可达速度的部分为nan或inf，返回None代表未实现
+        """
+        return None
+
+    def get_max_speed(self) -> Optional[float]:
+        """平衡态可达的最大速度 [m/s]，用于确定基本图数值表的速度采样上限，返回None代表未知"""
+        return None
+
+    def basic_diagram_k_to_q(self, dhw, car_length, speed_limit=None):
+        """veh/s，dhw与car_length可为数组"""
+        from trasim_simplified.core.kinematics.cfm.diagram_table import get_diagram_table
+        table = get_diagram_table(self, speed_limit)
+        if table is None:
+            return None
+        return table.get_flow(dhw, car_length)
 
     def get_jam_density(self, car_length):
         """veh/m"""
@@ -5,10 +5,13 @@
 # Software: PyCharm
 from typing import TYPE_CHECKING, Optional
 
-from trasim_simplified.core.kinematics.cfm.CFModel_KK import cal_v_safe, CFModel_KK
+import numpy as np
+
+from trasim_simplified.core.kinematics.cfm.CFModel_KK import cal_v_safe, CFModel_KK, cal_v_safe_array
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
 from trasim_simplified.core.constant import CFM, V_TYPE
@@ -55,6 +58,13 @@ class CFModel_ACC(CFModel):
     def _update_v_safe(self):
         self.l_v_a = CFModel_KK.update_v_safe(self)
 
+    def equilibrium_dhw(self, speed, car_length, speed_limit=None):
+        v0 = self.v0 if speed_limit is None else min(self.v0, speed_limit)
+        return np.where(speed <= v0, cf_ACC_equilibrium(self._thw, self._s0, speed) + car_length, np.nan)
+
+    def get_max_speed(self):
+        return self.v0
+
     def get_expect_dec(self):
         return self.b
 
@@ -77,6 +87,31 @@ class CFModel_ACC(CFModel):
                          leader_is_dummy, self.l_v_a)
 
 
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]):
+        state = lane.array_state
+        acc = np.full(len(slots), 3.)
+        has_leader, index, l_index = state.split_by_leader(slots)
+        if len(index) == 0:
+            return acc
+        cf_models: list[CFModel_ACC] = [state.car_list[i].cf_model for i in index]
+        original_acc, v_safe_dispersed, a, b, v0 = (np.array(value) for value in zip(*[
+            (cf_model.original_acc, cf_model.v_safe_dispersed, cf_model.a, cf_model.b, cf_model.v0)
+            for cf_model in cf_models]))
+        for cf_model in cf_models:
+            cf_model.dt = cf_model.tau = lane.dt
+
+        l_v_a = np.zeros(len(index))
+        if not np.all(original_acc):
+            l_v_a = CFModel_KK.update_v_safe_array(lane, cf_models[0].v_safe_dispersed, lane.dt)[1][index]
+        leader_is_dummy = state.type[l_index] == V_TYPE.OBSTACLE
+        acc[has_leader] = calculate_array(
+            param["k1"][has_leader], param["k2"][has_leader], param["thw"][has_leader], param["s0"][has_leader],
+            a, b, original_acc, v_safe_dispersed,
+            lane.dt, state.gap[index], state.v[index], state.v[l_index], v0, leader_is_dummy, l_v_a)
+        return acc
+
+
 def calculate(k1_, k2_, thw_, s0_, a, b, original_acc, v_safe_dispersed,
               tau, gap, v, l_v, v_free, leader_is_dummy, l_v_a):
     acc = k1_ * (gap - thw_ * v) + k2_ * (l_v - v)
@@ -98,6 +133,21 @@ def calculate(k1_, k2_, thw_, s0_, a, b, original_acc, v_safe_dispersed,
     return (v_next - v) / tau
 
 
+def calculate_array(k1_, k2_, thw_, s0_, a, b, original_acc, v_safe_dispersed,
+                    tau, gap, v, l_v, v_free, leader_is_dummy, l_v_a):
+    """calculate的数组化版本"""
+    acc_original = k1_ * (gap - s0_ - thw_ * v) + k2_ * (l_v - v)
+    v_next = v + tau * acc_original
+    acc_original = np.where(v_next > v_free, (v_free - v) / tau, np.where(v_next < 0, - v / tau, acc_original))
+
+    acc = k1_ * (gap - thw_ * v) + k2_ * (l_v - v)
+    v_c = v + tau * np.maximum(- b, np.minimum(acc, a))
+    v_safe = cal_v_safe_array(v_safe_dispersed, tau, l_v, gap, b, b)
+    v_safe = np.where(leader_is_dummy, v_safe, np.minimum(v_safe, (gap / tau) + l_v_a))
+    v_next = np.maximum(0, np.minimum(np.minimum(v_free, v_c), v_safe))
+    return np.where(original_acc, acc_original, (v_next - v) / tau)
+
+
 def cf_ACC_acc(k1, k2, thw, s0, speed, gap, leaderV, **kwargs):
     return k1 * (gap - s0 - thw * speed) + k2 * (leaderV - speed)
 
@@ -5,6 +5,8 @@
 # Software: PyCharm
 from typing import Optional, TYPE_CHECKING
 
+import numpy as np
+
 from trasim_simplified.core.constant import CFM
 from trasim_simplified.core.kinematics.cfm import CFModel
 
@@ -33,17 +35,13 @@ class CFModel_CTM(CFModel):
     def get_jam_density(self, car_length):
         return self._kj
 
-    def basic_diagram_k_to_q(self, dhw, car_length, speed_limit):
+    def basic_diagram_k_to_q(self, dhw, car_length, speed_limit=None):
+        """veh/s，dhw可为数组"""
         self.cal_k1_k2()
         k = 1 / dhw
-        assert k <= self._kj
-        if k < self.k1:
-            q = k * self._v0
-        elif k >= self.k2:
-            q = (self._kj - k) * self._wb
-        else:
-            q = self._qm
-        return q
+        assert np.all(k <= self._kj)
+        q = np.where(k < self.k1, k * self._v0, np.where(k >= self.k2, (self._kj - k) * self._wb, self._qm))
+        return q if np.ndim(q) != 0 else float(q)
 
     def get_qm(self):
         return self._qm
@@ -13,6 +13,7 @@ from trasim_simplified.core.constant import CFM
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 
 class CFModel_Gipps(CFModel):
@@ -42,6 +43,21 @@ class CFModel_Gipps(CFModel):
         f_param = [self._a, self._b, self._v0, self._tau, self._s, self._b_hat]
         return cf_Gipps_acc_jit(*f_param, self.vehicle.v, self.vehicle.gap, self.vehicle.leader.v)
 
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]):
+        state = lane.array_state
+        acc = param["a"].copy()
+        has_leader, index, l_index = state.split_by_leader(slots)
+        if len(index) != 0:
+            # 与step一致，只有存在前车的车辆检查反应时间
+            tau = param["tau"][has_leader]
+            if np.any(lane.dt != tau):
+                print(f"{CFM.GIPPS}模型的反应时间tau需要与仿真步长一致！")
+                lane.dt = tau[0]
+            f_param = [param[k][has_leader] for k in ["a", "b", "v0", "tau", "s", "b_hat"]]
+            acc[has_leader] = cf_Gipps_acc_jit(*f_param, state.v[index], state.gap[index], state.v[l_index])
+        return acc
+
     def equilibrium_state(self, speed, dhw, v_length):
         """
         通过平衡态速度计算三参数
@@ -58,6 +74,15 @@ class CFModel_Gipps(CFModel):
         q = k * v
         return {"K": k, "Q": q, "V": v}
 
+    def equilibrium_dhw(self, speed, car_length, speed_limit=None):
+        v0 = self._v0 if speed_limit is None else min(self._v0, speed_limit)
+        gap = ((np.power(self._b * self._tau, 2) - np.power(speed - self._b * self._tau, 2)) / self._b +
+               speed * self._tau + np.power(speed, 2) / self._b_hat) / 2 + self._s
+        return np.where(speed <= v0, gap + car_length, np.nan)
+
+    def get_max_speed(self):
+        return self._v0
+
     def get_expect_dec(self):
         return - self._b
 
@@ -75,7 +100,7 @@ def cf_Gipps_acc_jit(a, b, v0, tau, s, b_hat, speed, gap, leaderV) -> dict:
     # 安全驾驶限制
     vMax2 = b * tau + np.sqrt((b ** 2) * (tau ** 2) - b * (2 * (gap - s) - speed * tau - (leaderV ** 2) / b_hat))
     # 选取最小的速度限制作为下一时刻t+tau的速度
-    vTau = np.min([vMax1, vMax2], axis=0)
+    vTau = np.minimum(vMax1, vMax2)
     # 计算加速度和位置
     finalAcc = (vTau - speed) / tau
     return finalAcc
@@ -9,6 +9,7 @@ import numpy as np
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
 from trasim_simplified.core.constant import CFM
@@ -69,6 +70,19 @@ class CFModel_IDM(CFModel):
         return cf_IDM_acc_jit(self._s0, self._s1, min(self._v0, self.get_speed_limit()), self._T, self._omega, self._d,
                               self._delta, self.vehicle.v, self.vehicle.gap, self.vehicle.leader.v)
 
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]):
+        state = lane.array_state
+        acc = param["omega"].copy()
+        has_leader, index, l_index = state.split_by_leader(slots)
+        if len(index) != 0:
+            v0 = np.minimum(param["v0"][has_leader], lane.get_speed_limit_array(state.x[index], state.type[index]))
+            acc[has_leader] = cf_IDM_acc_jit(
+                param["s0"][has_leader], param["s1"][has_leader], v0, param["T"][has_leader],
+                param["omega"][has_leader], param["d"][has_leader], param["delta"][has_leader],
+                state.v[index], state.gap[index], state.v[l_index])
+        return acc
+
     def equilibrium_state(self, speed, dhw, v_length):
         """
         通过平衡态速度计算三参数
@@ -85,18 +99,12 @@ class CFModel_IDM(CFModel):
         q = k * v
         return {"K": k, "Q": q, "V": v}
 
-    def basic_diagram_k_to_q(self, dhw, car_length, speed_limit=None):
-        import sympy
-        if speed_limit is not None:
-            v0 = speed_limit
-        else:
-            v0 = self._v0
-        v = sympy.symbols("v", real=True)
-        expr = self._omega * (1 - (v / v0) ** self._delta -
-                              ((self._s0 + self._s1 * sympy.sqrt(v / v0) + self._T * v) / (dhw - car_length)) ** 2)
-        res: list[float] = sympy.solve(expr, v)
-        res.sort()
-        return res[-1] * 3.6
+    def equilibrium_dhw(self, speed, car_length, speed_limit=None):
+        v0 = self._v0 if speed_limit is None else min(self._v0, speed_limit)
+        return cf_IDM_equilibrium_jit(self._s0, self._s1, v0, self._T, self._delta, speed) + car_length
+
+    def get_max_speed(self):
+        return self._v0
 
     def get_jam_density(self, car_length):
         return 1 / (self._s0 + car_length)
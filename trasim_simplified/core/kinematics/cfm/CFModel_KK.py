@@ -13,6 +13,7 @@ from trasim_simplified.msg.trasimError import TrasimError
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 
 class CFModel_KK(CFModel):
@@ -148,6 +149,96 @@ class CFModel_KK(CFModel):
                 if (cf_model.index < len(cf_model.v_a_list) - 1) else None
         return cf_model.l_v_a
 
+    @staticmethod
+    def update_v_safe_array(lane: 'LaneAbstract', v_safe_dispersed, dt) -> tuple[np.ndarray, np.ndarray]:
+        """
+        update_v_safe的数组化版本，一次计算车道上所有车辆的v_safe和v_a
+
+        :return: (各车辆的v_safe, 各车辆前车的v_a)，无对应值时为nan
+        """
+        state = lane.array_state
+        has_v_safe = hasattr(lane, "_v_safe")
+        if not has_v_safe or (has_v_safe and int(getattr(lane, "_update_step")) != lane.step_):
+            has_leader, index, l_index = state.split_by_leader(state.get_order())
+            v_safe = np.full(len(state.x), np.nan)
+            v_safe[index] = cal_v_safe_array(
+                v_safe_dispersed, dt, state.v[l_index], state.gap[index],
+                state.expect_dec[index], state.expect_dec[index]  # 前车期望减速度取当前车的期望减速度，下同
+            )
+            v_a = np.where(state.is_first(), state.v, np.maximum(
+                0, np.minimum(np.minimum(v_safe, state.v), state.gap / dt) - state.expect_acc * dt))
+
+            setattr(lane, "_v_safe", v_safe)
+            setattr(lane, "_v_a", v_a)
+            setattr(lane, "_update_step", lane.step_)
+
+        v_safe = np.asarray(getattr(lane, "_v_safe"), dtype=float)
+        v_a = np.asarray(getattr(lane, "_v_a"), dtype=float)
+        has_leader = state.leader >= 0
+        l_v_a = np.where(has_leader, v_a[np.where(has_leader, state.leader, 0)], np.nan)
+        return v_safe, l_v_a
+
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]):
+        state = lane.array_state
+        for type_ in np.unique(state.type[slots]):
+            if SECTION_TYPE.ON_RAMP in lane.section_type.get(type_, {}):
+                return None  # 匝道区域需要查询相邻车道，由step逐车计算
+        acc = np.zeros(len(slots))
+        has_leader, index, l_index = state.split_by_leader(slots)
+        if len(index) == 0:
+            return acc
+
+        cf_models: list[CFModel_KK] = [state.car_list[i].cf_model for i in index]
+        dt = lane.dt
+        assert np.all(param["tau"] == dt)
+        if lane.state_update_method != "Euler" and cf_models[0].v_safe_dispersed:
+            TrasimError("状态更新方式需要为Euler！")
+        v_safe, l_v_a = CFModel_KK.update_v_safe_array(lane, cf_models[0].v_safe_dispersed, dt)
+        p = {k: value[has_leader] for k, value in param.items()}
+        vf = lane.get_speed_limit_array(state.x[index], state.type[index])
+        v, gap, l_v = state.v[index], state.gap[index], state.v[l_index]
+        v_safe, l_v_a = v_safe[index], l_v_a[index]
+
+        # 与逐车计算保持相同的随机数序列（按car_list顺序抽取）
+        status = np.array([cf_model.status for cf_model in cf_models])
+        r = np.array([cf_models[0].random.random() for _ in range(2 * len(index))])
+        r2, r1 = np.empty(len(index)), np.empty(len(index))
+        order = np.argsort(state.get_index(index), kind="stable")
+        r2[order], r1[order] = r[0::2], r[1::2]
+
+        # ----an,bn计算---- #
+        P_0 = np.where(status == 1, 1, 0.575 + 0.125 * np.minimum(1, v / p["v_01"]))
+        P_1 = np.where(status == -1, 0.48 + 0.32 * (v - p["v_21"] >= 0), p["p_1"])
+        a_n = p["a"] * (P_0 - r2 >= 0)
+        b_n = p["a"] * (P_1 - r2 >= 0)
+
+        # ----G与v_c计算---- #
+        G = np.maximum(0, p["k"] * p["tau"] * v + (1 / p["a"]) * v * (v - l_v))
+        v_c = np.where(gap <= G, v + np.maximum(- b_n * p["tau"], np.minimum(a_n * p["tau"], l_v - v)),
+                       v + a_n * p["tau"])
+
+        # ----v_s与v_hat计算---- #
+        v_s = np.minimum(v_safe, gap / dt + l_v_a)
+        v_hat = np.minimum(np.minimum(vf, v_s), v_c)
+
+        # ----xi扰动计算---- #
+        xi_a = p["a_a"] * dt * (p["p_a"] - r1 >= 0)
+        xi_b = p["a_b"] * dt * (p["p_b"] - r1 >= 0)
+        temp = np.where(r1 < p["p_0"], -1, np.where((r1 < 2 * p["p_0"]) & (v > 0), 1, 0))
+        xi_0 = p["a_0"] * dt * temp
+        S = np.where(v_hat < v, -1, np.where(v_hat > v, 1, 0))
+        xi = np.where(S == -1, - xi_b, np.where(S == 1, xi_a, xi_0))
+
+        # ----最终v计算---- #
+        final_speed = np.maximum(0., np.minimum(np.minimum(np.minimum(vf, v_hat + xi), v + p["a"] * dt), v_s))
+        acc[has_leader] = (final_speed - v) / dt
+
+        for cf_model, S_ in zip(cf_models, S):
+            cf_model.dt = dt
+            cf_model.status = int(S_)
+        return acc
+
     def step(self, index, *args):
         self.index = index
         if self.vehicle.leader is None:
@@ -304,6 +395,23 @@ def cal_v_safe(v_safe_dispersed, dt, leaderV, gap, dec, leader_dec):
         return v_safe
 
 
+def cal_v_safe_array(v_safe_dispersed, dt, leaderV, gap, dec, leader_dec):
+    """cal_v_safe的数组化版本，v_safe_dispersed可为布尔数组"""
+    alpha_l = np.trunc(leaderV / (leader_dec * dt))
+    beta_l = leaderV / (leader_dec * dt) - alpha_l
+    X_d_l = leader_dec * (dt ** 2) * (alpha_l * beta_l + 0.5 * alpha_l * (alpha_l - 1))
+    alpha_safe = np.trunc(np.sqrt(2 * (X_d_l + gap) / (dec * (dt ** 2)) + 0.25) - 0.5)
+    beta_safe = (X_d_l + gap) / ((alpha_safe + 1) * dec * (dt ** 2)) - alpha_safe / 2
+    v_safe_dispersed_ = dec * dt * (alpha_safe + beta_safe)
+
+    x_d_l = (leaderV ** 2) / (2 * leader_dec)
+    total_allow_dist = x_d_l + gap
+    a = 1 / (2 * dec)
+    v_safe = (- dt + np.sqrt(dt ** 2 + 4 * a * total_allow_dist)) / (2 * a)
+
+    return np.where(v_safe_dispersed, v_safe_dispersed_, v_safe)
+
+
 def picud(v_safe_dispersed, tau, v, l_v, gap, dec, leader_dec):
     if v_safe_dispersed:
         alpha = int(l_v / (dec * tau))  # 使用当前车的最大期望减速度
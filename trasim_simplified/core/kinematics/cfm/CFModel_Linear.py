@@ -35,8 +35,8 @@ class CFModel_Linear(CFModel):
     def _update_dynamic(self):
         time = self.vehicle.lane.time_ - self._T
         if time > self._T:
-            index = np.where(((time - 1e-4) < np.array(self.vehicle.time_list)) &
-                             ((time + 1e-4) > np.array(self.vehicle.time_list)))[0][0]
+            time_list = self.vehicle.time_list
+            index = np.where(((time - 1e-4) < time_list) & ((time + 1e-4) > time_list))[0][0]
         else:
             index = 0
         self.pre_v = self.vehicle.speed_list[index]
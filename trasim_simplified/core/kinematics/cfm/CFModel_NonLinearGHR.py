@@ -9,7 +9,7 @@ import numba
 import numpy as np
 
 from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
-from trasim_simplified.core.constant import CFM
+from trasim_simplified.core.constant import CFM, TrackInfo as C_Info
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
@@ -42,11 +42,11 @@ class CFModel_NonLinearGHR(CFModel):
 
     def _update_dynamic(self):
         time = self.vehicle.lane.time_ - self._tau
-        index = np.where(((time - 1e-4) < np.array(self.vehicle.time_list)) &
-                         ((time + 1e-4) > np.array(self.vehicle.time_list)))[0][0]
+        time_list = self.vehicle.time_list
+        index = np.where(((time - 1e-4) < time_list) & ((time + 1e-4) > time_list))[0][0]
         self.pre_x = self.vehicle.pos_list[index]
         self.pre_v = self.vehicle.speed_list[index]
-        self.l_pre_x = self.pre_x + self.vehicle.dhw_list[index]
+        self.l_pre_x = self.pre_x + self.vehicle.get_data_list(C_Info.dhw)[index]
         self.l_pre_v = self.vehicle.leader.speed_list[index]
 
     def step(self, index, *args):
@@ -59,7 +59,8 @@ class CFModel_NonLinearGHR(CFModel):
         if self.vehicle.leader is None:
             return self.get_expect_acc()
         self._update_dynamic()
-        return cf_NonLinearGHR_acc_jit(self.vehicle.v, self.pre_x, self.l_pre_x, self.pre_v, self.l_pre_v)
+        return cf_NonLinearGHR_acc_jit(self._a, self._m, self._l, self.vehicle.v, self.pre_x, self.l_pre_x,
+                                       self.pre_v, self.l_pre_v)
 
     def get_expect_dec(self):
         return self.DEFAULT_EXPECT_DEC
@@ -10,6 +10,7 @@ import numpy as np
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
 from trasim_simplified.core.constant import CFM
@@ -57,6 +58,17 @@ class CFModel_OVM(CFModel):
                               self.vehicle.x + self.vehicle.dhw,
                               self.vehicle.leader.length)
 
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]):
+        state = lane.array_state
+        acc = np.full(len(slots), 3.)
+        has_leader, index, l_index = state.split_by_leader(slots)
+        if len(index) != 0:
+            f_param = [param[k][has_leader] for k in ["a", "V0", "m", "bf", "bc"]]
+            acc[has_leader] = cf_OVM_acc_jit(*f_param, state.v[index], state.x[index],
+                                             state.x[index] + state.dhw[index], state.length[l_index])
+        return acc
+
     def equilibrium_state(self, speed, dhw, v_length):
         """
         通过平衡态速度计算三参数
@@ -71,6 +83,16 @@ class CFModel_OVM(CFModel):
         q = k * v
         return {"K": k, "Q": q, "V": v}
 
+    def equilibrium_dhw(self, speed, car_length, speed_limit=None):
+        if speed_limit is not None:
+            speed = np.where(speed <= speed_limit, speed, np.nan)
+        gap = self._bf + np.arctanh(speed / self._V0 + np.tanh(self._m * (self._bc - self._bf))) / self._m
+        return gap + car_length
+
+    def get_max_speed(self):
+        # 车头间距趋于无穷时的优化速度
+        return self._V0 * (1 - np.tanh(self._m * (self._bc - self._bf)))
+
     def get_expect_dec(self):
         return 3.
 
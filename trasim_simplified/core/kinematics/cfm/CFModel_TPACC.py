@@ -5,12 +5,15 @@
 # Software: PyCharm
 from typing import TYPE_CHECKING, Optional
 
+import numpy as np
+
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
 from trasim_simplified.core.constant import CFM, V_TYPE
-from trasim_simplified.core.kinematics.cfm.CFModel_KK import cal_v_safe, CFModel_KK
+from trasim_simplified.core.kinematics.cfm.CFModel_KK import cal_v_safe, CFModel_KK, cal_v_safe_array
 
 
 class CFModel_TPACC(CFModel):
@@ -89,6 +92,31 @@ class CFModel_TPACC(CFModel):
         return result[0]
 
 
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]):
+        state = lane.array_state
+        acc = np.full(len(slots), 3.)
+        has_leader, index, l_index = state.split_by_leader(slots)
+        if len(index) == 0:
+            return acc
+        cf_models: list[CFModel_TPACC] = [state.car_list[i].cf_model for i in index]
+        if any(cf_model.record_cf_info for cf_model in cf_models):
+            return None  # 需要逐车记录跟驰信息
+        v_safe_dispersed = np.array([cf_model.v_safe_dispersed for cf_model in cf_models])
+        assert all(cf_model.tau == lane.dt for cf_model in cf_models)
+        for cf_model in cf_models:
+            cf_model.dt = lane.dt
+
+        l_v_a = CFModel_KK.update_v_safe_array(lane, cf_models[0].v_safe_dispersed, lane.dt)[1][index]
+        v_free = lane.get_speed_limit_array(state.x[index], state.type[index])
+        leader_is_dummy = state.type[l_index] == V_TYPE.OBSTACLE
+        f_params = [param[k][has_leader] for k in ["kdv", "k1", "k2", "thw", "g_tau", "a", "b"]]
+        acc[has_leader] = calculate_array(*f_params, v_safe_dispersed,
+                                          lane.dt, state.gap[index], state.v[index], state.v[l_index], v_free,
+                                          leader_is_dummy, l_v_a)
+        return acc
+
+
 def calculate(kdv_, k1_, k2_, thw_, g_tau_, acc_, dec_, v_safe_dispersed_,
               dt, gap, v, l_v, v_free, leader_is_dummy, l_v_a):
     if gap > v * g_tau_:
@@ -116,6 +144,18 @@ def calculate(kdv_, k1_, k2_, thw_, g_tau_, acc_, dec_, v_safe_dispersed_,
         is_speed_adaptive, is_acc_constraint, is_thw_constraint, is_v_free_constraint, is_v_safe_constraint
 
 
+def calculate_array(kdv_, k1_, k2_, thw_, g_tau_, acc_, dec_, v_safe_dispersed_,
+                    dt, gap, v, l_v, v_free, leader_is_dummy, l_v_a):
+    """calculate的数组化版本，仅返回加速度"""
+    acc = np.where(gap > v * g_tau_, k1_ * (gap - thw_ * v) + k2_ * (l_v - v), kdv_ * (l_v - v))
+    v_c = v + dt * np.maximum(- dec_, np.minimum(acc, acc_))
+
+    v_safe = cal_v_safe_array(v_safe_dispersed_, dt, l_v, gap, dec_, dec_)
+    v_safe = np.where(leader_is_dummy, v_safe, np.minimum(v_safe, (gap / dt) + l_v_a))
+    v_next = np.maximum(0, np.minimum(np.minimum(v_free, v_c), v_safe))
+    return (v_next - v) / dt
+
+
 def cf_TPACC_acc(kdv, k1, k2, thw, g_tau, a, b, v_safe_dispersed,
                  interval, gap, speed, leaderV, v_free=30, leader_is_dummy=False, l_v_a=0):
     pass
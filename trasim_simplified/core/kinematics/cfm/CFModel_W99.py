@@ -16,6 +16,7 @@ import numpy as np
 
 if TYPE_CHECKING:
     from trasim_simplified.core.vehicle import Vehicle
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
 
 from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
 from trasim_simplified.core.constant import CFM
@@ -100,6 +101,25 @@ class CFModel_W99(CFModel):
         acc, self.status = result
         return acc
 
+    @staticmethod
+    def step_batch(lane: 'LaneAbstract', slots: np.ndarray, param: dict[str, np.ndarray]):
+        state = lane.array_state
+        acc = param["CC9"].copy()
+        has_leader, index, l_index = state.split_by_leader(slots)
+        if len(index) == 0:
+            return acc
+        cf_models = [state.car_list[i].cf_model for i in index]
+        last_is_free = np.array([cf_model.status == 'w' for cf_model in cf_models], dtype=bool)
+        f_param = [param[k][has_leader] for k in
+                   ["CC0", "CC1", "CC2", "CC3", "CC4", "CC5", "CC6", "CC7", "CC8", "CC9", "vDesire", "aggressive"]]
+        acc[has_leader], status = cf_W99_array(
+            *f_param, last_is_free, lane.dt, state.v[index], state.a[index], state.gap[index],
+            state.length[index], state.v[l_index], state.a[l_index])
+        for cf_model, status_ in zip(cf_models, status):
+            cf_model.dt = lane.dt
+            cf_model.status = str(status_)
+        return acc
+
     def getThresholdValues(self, speed, gap, leaderV, leaderA):
         params = [self._CC0, self._CC1, self._CC2, self._CC3, self._CC4, self._CC5, self._CC6, self._aggressive]
         return getThresholdValues(*params, speed, gap, leaderV, leaderA)
@@ -211,6 +231,67 @@ def myRandom(seed):
     return seed
 
 
+def cf_W99_array(cc0, cc1, cc2, cc3, cc4, cc5, cc6, cc7, cc8, cc9, vDesire, aggressive, last_is_free,
+                 interval, speed, acc, gap, length, leaderV, leaderA):
+    """
+    cf_W99_jit的数组化版本
+
+    :param last_is_free: 上一时间步是否为自由状态('w')
+    :return: (加速度数组, 状态数组)
+    """
+    dx = gap
+    dv = leaderV - speed
+
+    sdxc, sdxo, sdxv, sdvc, sdvo = \
+        getThresholdValues_array(cc0, cc1, cc2, cc3, cc4, cc5, cc6, aggressive, speed, dx, leaderV, leaderA)
+
+    is_a = (dv <= sdvo) & (dx <= sdxc)
+    is_b = ~is_a & (dv < sdvc) & (dx < sdxv)
+    is_f = ~is_a & ~is_b & (dv < sdvo) & (dx < sdxo)
+    is_truck = length >= 6.5  # 考虑车型的加速度折减
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Decelerate - Increase Distance
+        acc_a = np.where(dx > cc0, np.minimum(leaderA + (dv ** 2) / (cc0 - dx), acc),
+                         np.minimum(leaderA + 0.5 * (dv - sdvo), acc))
+        acc_a = np.where(acc_a > - cc7, - cc7, np.maximum(acc_a, -10 + 0.5 * np.sqrt(speed)))
+        acc_a = np.where(speed > 0, np.where(dv < 0, acc_a, acc), 0)
+        # Decelerate - Decrease Distance
+        acc_b = np.maximum(0.5 * (dv ** 2) / (sdxc - dx - 0.01), -10 + np.sqrt(speed))
+        # Accelerate/Decelerate - Keep Distance
+        acc_f = np.maximum(acc, cc7)
+        acc_f = np.minimum(np.where(is_truck, acc_f * 0.5, acc_f), (vDesire - speed) / interval)
+        acc_f = np.where(acc <= 0, np.minimum(acc, - cc7), acc_f)
+        # Accelerate/Relax - Increase/Keep Speed
+        acc_max = cc8 + cc9 * np.minimum(speed, 80 / 3.6) + aggressive
+        acc_w = np.where(last_is_free, cc7, np.where(dx < sdxo, np.minimum((dv ** 2) / (sdxo - dx), acc_max), acc_max))
+        acc_w = np.minimum(np.where(is_truck, acc_w * 0.5, acc_w), (vDesire - speed) / interval)
+        acc_w = np.where(dx > sdxc, acc_w, 0)
+
+    finalAcc = np.select([is_a, is_b, is_f], [acc_a, acc_b, acc_f], acc_w)
+    status = np.select([is_a, is_b, is_f], ['A', 'B', 'f'], 'w')
+    return finalAcc, status
+
+
+def getThresholdValues_array(cc0, cc1, cc2, cc3, cc4, cc5, cc6, aggressive, speed, gap, leaderV, leaderA):
+    """getThresholdValues的数组化版本"""
+    cc6 = cc6 / 10000
+
+    dx = gap
+    dv = leaderV - speed
+
+    v_slower = np.where((dv >= 0) | (leaderA < -1), speed, leaderV + dv * (0.5 - aggressive))
+    sdxc = np.where(leaderV <= 0, cc0, cc0 + cc1 * v_slower)
+    sdxo = sdxc + cc2
+    sdxv = sdxo + cc3 * (dv - cc4)
+
+    sdv = cc6 * dx ** 2
+    sdvc = np.where(leaderV > 0, cc4 - sdv, 0)
+    sdvo = np.where(speed > cc5, cc5 + sdv, sdv)
+
+    return sdxc, sdxo, sdxv, sdvc, sdvo
+
+
 def cf_Wiedemann99_acc(cc0, cc1, cc2, cc3, cc4, cc5, cc6, cc7, cc8, cc9, vDesire, aggressive,
                        speed, gap, leaderV, **kwargs):
     return cf_W99_jit(cc0, cc1, cc2, cc3, cc4, cc5, cc6, cc7, cc8, cc9, vDesire, aggressive,
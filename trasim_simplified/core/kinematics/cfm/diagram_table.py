@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 17:05
+# @Author : yzbyx
+# @File : diagram_table.py
+# Software: PyCharm
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
+
+
+class DiagramTable:
+    """
+    跟驰模型平衡态对应的基本图数值表
+
+    由平衡态速度-净间距关系正向计算得到，查询时对净间距插值，代替逐次的数值/符号求解。
+    平衡态车头间距 = 平衡态净间距 + 车长，因此同一张表可服务于不同车长
+    """
+
+    SPEED_NUM = 2000
+    """等间距的速度采样点数"""
+    ASYMPTOTE_NUM = 200
+    """在最大速度附近加密的速度采样点数（部分模型的平衡态间距在期望速度处趋于无穷）"""
+    DEFAULT_MAX_SPEED = 60.
+    """未设置限速时的速度采样上限 [m/s]"""
+
+    def __init__(self, gap: np.ndarray, speed: np.ndarray):
+        self.gap = gap
+        """平衡态净间距 [m]，单调递增"""
+        self.speed = speed
+        """对应的平衡态速度 [m/s]"""
+
+    @classmethod
+    def from_model(cls, cf_model: 'CFModel', speed_limit: Optional[float] = None):
+        max_speed = cls.DEFAULT_MAX_SPEED if speed_limit is None else speed_limit
+        # 渐近线附近的加密采样需要落在模型可达的最大速度处
+        model_max_speed = cf_model.get_max_speed()
+        if model_max_speed is not None:
+            max_speed = min(max_speed, model_max_speed)
+        speed = np.unique(np.concatenate([
+            np.linspace(0, max_speed, cls.SPEED_NUM, endpoint=False),
+            max_speed * (1 - np.logspace(-2, -12, cls.ASYMPTOTE_NUM))
+        ]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap = cf_model.equilibrium_dhw(speed, 0., speed_limit)
+        if gap is None:
+            return None
+        gap = np.asarray(gap, dtype=float)
+        is_valid = np.isfinite(gap)
+        speed, gap = speed[is_valid], gap[is_valid]
+        # 平衡态间距需随速度单调递增，不单调的部分取先到达的速度
+        gap, index = np.unique(np.maximum.accumulate(gap), return_index=True)
+        return cls(gap, speed[index])
+
+    @property
+    def jam_gap(self):
+        """速度为0时的平衡态净间距 [m]"""
+        return self.gap[0]
+
+    def get_speed(self, dhw: Union[float, np.ndarray], car_length: Union[float, np.ndarray] = 0.):
+        """m/s，小于拥堵间距时为0，大于表中最大间距时取最大速度"""
+        return np.interp(dhw - car_length, self.gap, self.speed)
+
+    def get_flow(self, dhw: Union[float, np.ndarray], car_length: Union[float, np.ndarray] = 0.):
+        """veh/s"""
+        return self.get_speed(dhw, car_length) / dhw
+
+
+_TABLE_CACHE: OrderedDict[tuple, Optional[DiagramTable]] = OrderedDict()
+_TABLE_CACHE_SIZE = 128
+
+
+def _get_param_key(cf_model: 'CFModel') -> tuple:
+    return tuple(sorted((k, value) for k, value in cf_model.get_param_map().items()
+                        if isinstance(value, (int, float, str, bool, np.number))))
+
+
+def get_diagram_table(cf_model: 'CFModel', speed_limit: Optional[float] = None) -> Optional[DiagramTable]:
+    """
+    获取跟驰模型的基本图数值表，按照(模型名称, 模型参数, 限速)缓存，超过缓存上限时淘汰最久未使用的表
+
+    :return: 基本图数值表，模型未实现equilibrium_dhw时返回None
+    """
+    key = (cf_model.name, _get_param_key(cf_model), None if speed_limit is None else float(speed_limit))
+    if key in _TABLE_CACHE:
+        _TABLE_CACHE.move_to_end(key)
+        return _TABLE_CACHE[key]
+    table = DiagramTable.from_model(cf_model, speed_limit)
+    _TABLE_CACHE[key] = table
+    if len(_TABLE_CACHE) > _TABLE_CACHE_SIZE:
+        _TABLE_CACHE.popitem(last=False)
+    return table
+
+
+def clear_diagram_table_cache():
+    _TABLE_CACHE.clear()
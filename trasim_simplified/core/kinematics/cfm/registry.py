@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 22:30
+# @Author : yzbyx
+# @File : registry.py
+# Software: PyCharm
+import importlib
+from typing import Optional, Callable, TYPE_CHECKING
+
+from trasim_simplified.core.constant import CFM
+from trasim_simplified.msg.trasimError import ErrorMessage as rem, TrasimError
+
+if TYPE_CHECKING:
+    from trasim_simplified.core.kinematics.cfm.CFModel import CFModel
+
+
+class CFModelSpec:
+    """
+    跟驰模型的注册信息
+
+    模型所在模块只记录模块路径，在首次获取模型类或函数时才导入
+    """
+    def __init__(self, name: str, cf_id: int, module: str, class_name: str,
+                 acc_func: Optional[str] = None, equilibrium_func: Optional[str] = None):
+        """
+        :param name: 模型名称（CFM中的常量）
+        :param cf_id: 模型的整数编号，用于轨迹数据记录与批量计算分组，不可重复
+        :param module: 模型所在模块的完整路径
+        :param class_name: 模型类名称
+        :param acc_func: 单车加速度计算函数名称，None代表未提供
+        :param equilibrium_func: 平衡态函数名称，None代表未提供
+        """
+        self.name = name
+        self.cf_id = cf_id
+        self.module = module
+        self.class_name = class_name
+        self.acc_func_name = acc_func
+        self.equilibrium_func_name = equilibrium_func
+        self._model_class: Optional[type['CFModel']] = None
+        self._default_param: Optional[dict[str, float]] = None
+
+    def get_attr(self, attr: str):
+        return getattr(importlib.import_module(self.module), attr)
+
+    @property
+    def model_class(self) -> type['CFModel']:
+        if self._model_class is None:
+            self._model_class = self.get_attr(self.class_name)
+        return self._model_class
+
+    @property
+    def acc_func(self) -> Callable:
+        """单车加速度计算函数"""
+        if self.acc_func_name is None:
+            raise TrasimError(f"{self.name} is not be configured!")
+        return self.get_attr(self.acc_func_name)
+
+    @property
+    def equilibrium_func(self) -> Callable:
+        """平衡态函数"""
+        if self.equilibrium_func_name is None:
+            raise TrasimError(f"{self.name} is not be configured!")
+        return self.get_attr(self.equilibrium_func_name)
+
+    @property
+    def step_batch(self) -> Callable:
+        """批量加速度计算函数，见CFModel.step_batch"""
+        return self.model_class.step_batch
+
+    @property
+    def default_param(self) -> dict[str, float]:
+        """模型参数名称及默认值"""
+        if self._default_param is None:
+            self._default_param = self.model_class(None, {}).get_param_map()
+        return dict(self._default_param)
+
+
+_CF_MODELS: dict[str, CFModelSpec] = {}
+"""模型名称对应的注册信息"""
+_CF_IDS: dict[int, str] = {}
+"""模型编号对应的模型名称"""
+
+
+def register_cf_model(name: str, cf_id: int, module: str, class_name: str,
+                      acc_func: Optional[str] = None, equilibrium_func: Optional[str] = None) -> CFModelSpec:
+    """注册跟驰模型，参数见CFModelSpec"""
+    if _CF_IDS.get(cf_id, name) != name:
+        raise TrasimError(f"跟驰模型编号{cf_id}已被{_CF_IDS[cf_id]}使用！")
+    if name in _CF_MODELS:
+        _CF_IDS.pop(_CF_MODELS[name].cf_id, None)
+    spec = CFModelSpec(name, cf_id, module, class_name, acc_func, equilibrium_func)
+    _CF_MODELS[name] = spec
+    _CF_IDS[cf_id] = name
+    return spec
+
+
+def get_cf_spec(name: str) -> CFModelSpec:
+    spec = _CF_MODELS.get(name, None)
+    if spec is None:
+        raise TrasimError(rem.NO_MODEL.format(name))
+    return spec
+
+
+def get_cf_names() -> list[str]:
+    """已注册的模型名称"""
+    return list(_CF_MODELS.keys())
+
+
+_PREFIX = "trasim_simplified.core.kinematics.cfm."
+register_cf_model(CFM.IDM, 0, _PREFIX + "CFModel_IDM", "CFModel_IDM", "cf_IDM_acc", "cf_IDM_equilibrium")
+register_cf_model(CFM.GIPPS, 1, _PREFIX + "CFModel_Gipps", "CFModel_Gipps", "cf_Gipps_acc_jit")
+register_cf_model(CFM.LINEAR, 2, _PREFIX + "CFModel_Linear", "CFModel_Linear")
+register_cf_model(CFM.WIEDEMANN_99, 3, _PREFIX + "CFModel_W99", "CFModel_W99", "cf_Wiedemann99_acc")
+register_cf_model(CFM.NON_LINEAR_GHR, 4, _PREFIX + "CFModel_NonLinearGHR", "CFModel_NonLinearGHR",
+                  "cf_NonLinearGHR_acc")
+register_cf_model(CFM.OPTIMAL_VELOCITY, 5, _PREFIX + "CFModel_OVM", "CFModel_OVM", "cf_OVM_acc")
+register_cf_model(CFM.KK, 6, _PREFIX + "CFModel_KK", "CFModel_KK")
+register_cf_model(CFM.ACC, 7, _PREFIX + "CFModel_ACC", "CFModel_ACC", "cf_ACC_acc", "cf_ACC_equilibrium")
+register_cf_model(CFM.TPACC, 8, _PREFIX + "CFModel_TPACC", "CFModel_TPACC", "cf_TPACC_acc")
+register_cf_model(CFM.DUMMY, -1, _PREFIX + "CFModel_Dummy", "CFModel_Dummy")
+register_cf_model(CFM.CACC, 9, _PREFIX + "CFModel_CACC", "CFModel_CACC")
+register_cf_model(CFM.LCM, 10, _PREFIX + "CFModel_LCM", "CFModel_LCM")
+register_cf_model(CFM.CTM, 11, _PREFIX + "CFModel_CTM", "CFModel_CTM")
+register_cf_model(CFM.IDM_SZ, 12, _PREFIX + "CFM_IDM_SZ", "CFModel_IDM_SZ", "cf_IDM_SZ_acc_jit",
+                  "cf_IDM_SZ_equilibrium")
+register_cf_model(CFM.IDM_VS, 13, _PREFIX + "CFM_IDM_VS", "CFModel_IDM_VS", "cf_IDM_VS_acc_jit",
+                  "cf_IDM_VS_equilibrium")
+register_cf_model(CFM.IDM_VZ, 14, _PREFIX + "CFM_IDM_Z", "CFModel_IDM_Z", "cf_IDM_Z_acc_jit",
+                  "cf_IDM_Z_equilibrium")
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 21:30
+# @Author : yzbyx
+# @File : async_ui.py
+# Software: PyCharm
+import multiprocessing as mp
+import queue
+import time
+from typing import TYPE_CHECKING, Union, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
+    from trasim_simplified.core.frame.micro.road import Road
+
+
+class UISnapshot:
+    """某一仿真步所有车辆的绘制信息"""
+    def __init__(self, step: int, lane_index: np.ndarray, x: np.ndarray, length: np.ndarray, width: np.ndarray,
+                 color: np.ndarray):
+        self.step = step
+        self.lane_index = lane_index
+        self.x = x
+        self.length = length
+        self.width = width
+        self.color = color
+        """(车辆数 × 3)的RGB颜色"""
+
+
+class UILayout:
+    """与UI相同的绘制布局参数"""
+    def __init__(self, lane_length: float, width_base=1000, width_scale=1.5, height_scale=2, single_height=20,
+                 base_line_factor=2, lane_width=5):
+        self.lane_length = lane_length
+        self.width_base = width_base
+        self.width_scale = width_scale
+        self.height_scale = height_scale
+        self.single_height = single_height
+        self.base_line_factor = base_line_factor
+        self.lane_width = lane_width
+        self.start_y = base_line_factor * single_height
+        self.row_total = int(lane_length / width_base) + 1
+        self.screen_height = int((int(lane_length / 1000) + base_line_factor) * single_height * height_scale)
+        self.screen_width = int(width_base * width_scale)
+
+    def get_rects(self, snapshot: UISnapshot) -> np.ndarray:
+        """:return: (车辆数 × 4)的矩形(pos_x, pos_y, 长, 宽)，像素坐标"""
+        row = np.trunc(snapshot.x / self.width_base)
+        offset = self.start_y + snapshot.lane_index * self.lane_width + row * self.single_height
+        rects = np.empty((len(snapshot.x), 4), dtype=int)
+        rects[:, 0] = ((snapshot.x - row * self.width_base) * self.width_scale).astype(int)
+        rects[:, 1] = ((offset + self.lane_width / 2 - snapshot.width / 2) * self.height_scale).astype(int)
+        rects[:, 2] = (snapshot.length * self.width_scale).astype(int)
+        rects[:, 3] = (snapshot.width * self.height_scale).astype(int)
+        return rects
+
+
+def get_snapshot(step: int, lane_list: list['LaneAbstract']) -> UISnapshot:
+    """采集各车道所有车辆的绘制信息"""
+    car_list = [(lane.index, car) for lane in lane_list for car in lane.car_list]
+    return UISnapshot(
+        step,
+        np.array([index for index, _ in car_list], dtype=float),
+        np.array([car.x for _, car in car_list], dtype=float),
+        np.array([car.length for _, car in car_list], dtype=float),
+        np.array([car.width for _, car in car_list], dtype=float),
+        np.array([car.color for _, car in car_list], dtype=np.uint8).reshape(-1, 3)
+    )
+
+
+def render_background(layout: UILayout):
+    """绘制背景与车道分隔线，只需绘制一次"""
+    import pygame as pg
+    background = pg.Surface((layout.screen_width, layout.screen_height))
+    background.fill((0, 0, 0))
+    for row in range(layout.row_total):
+        pos_y = int((layout.start_y + row * layout.single_height) * layout.height_scale)
+        pg.draw.line(background, [255, 255, 255], [0, pos_y], [layout.screen_width, pos_y])
+    return background
+
+
+def render_snapshot(screen, background, font, layout: UILayout, snapshot: UISnapshot):
+    """将快照绘制到screen上，矩形的像素坐标由numpy一次计算"""
+    screen.blit(background, (0, 0))
+    screen.blit(font.render("steps: " + str(snapshot.step), True, (255, 255, 255), None), (0, 0))
+    fill = screen.fill
+    for color, rect in zip(snapshot.color.tolist(), layout.get_rects(snapshot).tolist()):
+        fill(color, rect)
+
+
+def _render_loop(snapshot_queue: mp.Queue, layout: UILayout, caption: str, frame_rate: float):
+    """渲染进程：以固定的帧率绘制最新的快照，直到收到None"""
+    import pygame as pg
+    pg.init()
+    screen = pg.display.set_mode((layout.screen_width, layout.screen_height))
+    pg.display.set_caption(caption)
+    font = pg.font.SysFont('Times', 20)
+    background = render_background(layout)
+    clock = pg.time.Clock()
+    snapshot: Optional[UISnapshot] = None
+    running = True
+    while running:
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                running = False
+        updated = False
+        try:
+            while True:
+                item = snapshot_queue.get_nowait()
+                if item is None:
+                    running = False
+                    break
+                snapshot, updated = item, True
+        except queue.Empty:
+            pass
+        if updated and running:
+            render_snapshot(screen, background, font, layout, snapshot)
+            pg.display.flip()
+        clock.tick(frame_rate)
+    pg.quit()
+
+
+class AsyncUI:
+    """
+    与仿真解耦的pygame界面
+
+    仿真进程每步调用ui_update时只检查距离上次快照的时间，按照frame_rate定时采集车辆状态快照并放入队列；
+    独立的渲染进程以固定帧率绘制最新的快照，渲染来不及时直接丢弃快照，仿真速度不受渲染速度限制
+    """
+    DEFAULT_FRAME_RATE = 30
+
+    def __init__(self, frame_abstract: Union['LaneAbstract', 'Road']):
+        self.frame = frame_abstract
+        self.frame_rate = -1
+        """渲染帧率 [fps]，不大于0时使用DEFAULT_FRAME_RATE"""
+
+        if not hasattr(self.frame, "lane_list"):
+            self.lane_list = [self.frame]
+        else:
+            self.lane_list = self.frame.lane_list
+
+        self.layout: Optional[UILayout] = None
+        self._queue: Optional[mp.Queue] = None
+        self._process: Optional[mp.Process] = None
+        self._interval = 0.
+        self._last_time = -np.inf
+
+    def ui_init(self, caption="微观交通流仿真", frame_rate=-1):
+        self.frame_rate = frame_rate if frame_rate > 0 else self.DEFAULT_FRAME_RATE
+        self._interval = 1 / self.frame_rate
+        self.layout = UILayout(self.frame.lane_length)
+        ctx = mp.get_context("spawn")
+        self._queue = ctx.Queue(maxsize=2)
+        self._process = ctx.Process(target=_render_loop, args=(self._queue, self.layout, caption, self.frame_rate),
+                                    daemon=True)
+        self._process.start()
+        self._last_time = -np.inf
+        self.ui_update()
+
+    def get_snapshot(self) -> UISnapshot:
+        return get_snapshot(self.frame.step_, self.lane_list)
+
+    def ui_update(self):
+        now = time.perf_counter()
+        if now - self._last_time < self._interval:
+            return
+        if self._process is None or not self._process.is_alive():
+            return
+        self._last_time = now
+        try:
+            self._queue.put_nowait(self.get_snapshot())
+        except queue.Full:
+            pass  # 渲染进程未取走之前的快照，跳过本帧
+
+    def ui_close(self):
+        """通知渲染进程退出"""
+        if self._process is None:
+            return
+        try:
+            self._queue.put(None, timeout=1)
+        except queue.Full:
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self._queue = None
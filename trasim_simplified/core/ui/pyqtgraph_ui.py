@@ -3,17 +3,26 @@
 # @Author : yzbyx
 # @File : pyqtgraph_ui.py
 # Software: PyCharm
-from typing import Union, Optional
+from typing import Union, Optional, TYPE_CHECKING
 
+import numpy as np
 import pyqtgraph as pg
-from PyQt5 import QtCore
 from PyQt5.QtWidgets import QApplication
 from pyqtgraph import GraphicsLayoutWidget
 
-from trasim_simplified.core.vehicle import Vehicle
+from trasim_simplified.core.ui.async_ui import UILayout, get_snapshot
+
+if TYPE_CHECKING:
+    from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
+    from trasim_simplified.core.frame.micro.road import Road
 
 
 class PyqtUI:
+    """
+    pyqtgraph界面
+
+    所有车道的车辆由一个BarGraphItem按位置、颜色数组整体更新，只绘制与当前视野相交的车辆
+    """
     def __init__(self, frame_abstract: Union['LaneAbstract', 'Road']):
         self.frame = frame_abstract
         self.frame_rate = -1
@@ -34,54 +43,69 @@ class PyqtUI:
 
         self.lane_width = 5
         self.start_y = self.base_line_factor * self.single_height
-        self.text: Optional[pg.TextItem] = pg.TextItem("", color=(255, 255, 255))
+        self.layout: Optional[UILayout] = None
+        self.plot: Optional[pg.PlotItem] = None
+        self.car_item: Optional[pg.BarGraphItem] = None
+        """所有车辆的矩形"""
+        self.text: Optional[pg.TextItem] = None
+        self._brushes: dict[tuple, object] = {}
+        """颜色对应的画刷缓存"""
 
     def ui_init(self, caption="微观交通流仿真", frame_rate=-1):
         self.frame_rate = frame_rate
-        self.screen_height = int((int(self.frame.lane_length / 1000) + self.base_line_factor) *
-                                 self.single_height * self.height_scale)
-        self.screen_width = int(self.width_base * self.width_scale)
+        pg.mkQApp()
+        self.layout = UILayout(self.frame.lane_length, self.width_base, self.width_scale, self.height_scale,
+                               self.single_height, self.base_line_factor, self.lane_width)
+        self.screen_height = self.layout.screen_height
+        self.screen_width = self.layout.screen_width
         win: GraphicsLayoutWidget = pg.GraphicsLayoutWidget(show=True)
         win.resize(self.screen_width, self.screen_height)
         win.setWindowTitle(caption)
 
         self.screen = win
-        self.screen.setBackground('w')
-        self.screen.addItem(self.text)
-        self.text.setText("steps: " + str(self.frame.step_))
+        self.screen.setBackground('k')
+        self.plot = self.screen.addPlot()
+        self.plot.invertY(True)  # 与pygame界面的像素坐标方向一致
+        self.plot.setAspectLocked(True)
+        self.plot.hideAxis("left")
+        self.plot.hideAxis("bottom")
+        self.plot.setRange(xRange=(0, self.screen_width), yRange=(0, self.screen_height), padding=0)
         self.draw_line()
 
-        # self.screen.render()
-        #
-        # timer = QtCore.QTimer()
-        # timer.timeout.connect(self.ui_update)
-        # timer.start(int(1 / frame_rate * 1000))
+        self.car_item = pg.BarGraphItem(x0=[], y0=[], width=[], height=[], pen=None)
+        self.plot.addItem(self.car_item)
+        self.text = pg.TextItem("", color=(255, 255, 255), anchor=(0, 0))
+        self.plot.addItem(self.text, ignoreBounds=True)
+        self.ui_update()
 
     def draw_line(self):
-        row_total = int(self.lane_list[0].lane_length / self.width_base) + 1
-        for row in range(row_total):
+        for row in range(self.layout.row_total):
             pos_y = self.start_y + row * self.single_height
-            self.screen.addItem(pg.InfiniteLine(int(pos_y * self.height_scale), angle=0, pen=(255, 255, 255)))
+            self.plot.addItem(pg.InfiniteLine(int(pos_y * self.height_scale), angle=0, pen=(255, 255, 255)))
+
+    def _get_brush(self, color: tuple):
+        brush = self._brushes.get(color, None)
+        if brush is None:
+            brush = self._brushes[color] = pg.mkBrush(color)
+        return brush
+
+    def get_visible(self, rects: np.ndarray) -> np.ndarray:
+        """:return: 与当前视野相交的矩形"""
+        (x_min, x_max), (y_min, y_max) = self.plot.viewRange()
+        return (rects[:, 0] + rects[:, 2] >= x_min) & (rects[:, 0] <= x_max) & \
+            (rects[:, 1] + rects[:, 3] >= y_min) & (rects[:, 1] <= y_max)
 
     def ui_update(self):
+        (x_min, _), (y_min, _) = self.plot.viewRange()
+        self.text.setPos(x_min, y_min)
         self.text.setText("steps: " + str(self.frame.step_))
 
-        for index, lane in enumerate(self.lane_list):
-            for i, car in enumerate(lane.car_list):
-                car: Vehicle = car
-                row = int(car.x / self.width_base)
-                offset = self.start_y + lane.index * self.lane_width + row * self.single_height
-                pos_y = int((offset + self.lane_width / 2 - car.width / 2) * self.height_scale)
-                pos_x = int((car.x - int(car.x / self.width_base) * self.width_base) * self.width_scale)
-
-                if not hasattr(car, "plot_item"):
-                    carItem = pg.ButtonItem(width=car.width)
-                    carItem.setPos(pos_x, pos_y)
-                    carItem.setBrush(pg.mkBrush(car.color))
-                    car.__setattr__("plot_item", carItem)
-                    car.__setattr__("screen", self.screen)
-                else:
-                    carItem = car.__getattribute__("plot_item")
-                    carItem.setPos(pos_x, pos_y)
-                    self.screen.addItem(carItem)
-        self.screen.render()
+        snapshot = get_snapshot(self.frame.step_, self.lane_list)
+        rects = self.layout.get_rects(snapshot)
+        is_visible = self.get_visible(rects)
+        rects = rects[is_visible]
+        self.car_item.setOpts(
+            x0=rects[:, 0], y0=rects[:, 1], width=rects[:, 2], height=rects[:, 3],
+            brushes=[self._get_brush(color) for color in map(tuple, snapshot.color[is_visible].tolist())]
+        )
+        QApplication.processEvents()
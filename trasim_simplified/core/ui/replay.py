@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 22:00
+# @Author : yzbyx
+# @File : replay.py
+# Software: PyCharm
+import os
+import shutil
+import subprocess
+from typing import Union, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from matplotlib import pyplot as plt
+
+from trasim_simplified.core.constant import TrackInfo as Info, COLOR
+from trasim_simplified.core.data.data_store import TrajectoryStore, get_df
+from trasim_simplified.core.ui.async_ui import UILayout, UISnapshot, render_background, render_snapshot
+from trasim_simplified.msg.trasimError import TrasimError
+
+
+def _render_frames(path: str, file_name: str, layout: UILayout, frame_steps: np.ndarray, row_offsets: np.ndarray,
+                   lane_index: np.ndarray, x: np.ndarray, length: np.ndarray, width: float,
+                   color: np.ndarray) -> list[str]:
+    """渲染进程：绘制一段连续仿真步的帧并保存为图片"""
+    import pygame as pg
+    pg.font.init()
+    screen = pg.Surface((layout.screen_width, layout.screen_height))
+    background = render_background(layout)
+    font = pg.font.SysFont('Times', 20)
+    files = []
+    for i, step in enumerate(frame_steps):
+        rows = slice(row_offsets[i], row_offsets[i + 1])
+        snapshot = UISnapshot(int(step), lane_index[rows], x[rows], length[rows],
+                              np.full(rows.stop - rows.start, width), color[rows])
+        render_snapshot(screen, background, font, layout, snapshot)
+        file = os.path.join(path, file_name.format(int(step)))
+        pg.image.save(screen, file)
+        files.append(file)
+    return files
+
+
+def replay_to_frames(
+        data: Union[pd.DataFrame, TrajectoryStore],
+        path: str,
+        lane_length: float,
+        step_range: Optional[Sequence[int]] = None,
+        frame_step: int = 1,
+        color_info_name: Optional[str] = None,
+        cmap_name="rainbow",
+        value_range: Optional[Sequence[float]] = None,
+        color=COLOR.yellow,
+        car_width=1.8,
+        n_jobs=-1,
+        file_name="frame_{:06d}.png",
+        lane_index: Optional[Sequence[int]] = None,
+) -> list[str]:
+    """
+    由记录的轨迹数据离线绘制与UI相同的画面，不需要显示设备
+
+    按仿真步将帧分为n_jobs段，由多个进程并行绘制并保存为图片
+
+    :param data: DataContainer.data_to_df、Road.data_to_df的结果或TrajectoryStore，需包含车辆ID、仿真步、位置
+    :param path: 图片保存目录
+    :param lane_length: 车道长度 [m]
+    :param step_range: 仿真步范围（闭区间），None代表全部
+    :param frame_step: 每隔frame_step个仿真步绘制一帧
+    :param color_info_name: 决定车辆颜色的记录信息，None代表所有车辆使用color
+    :param value_range: color_info_name对应颜色映射的范围，None代表数据的最小值与最大值
+    :param car_width: 车辆宽度 [m]（轨迹数据中未记录）
+    :param file_name: 图片文件名，由仿真步格式化
+    :param lane_index: 按车道添加顺序（lane_add_num）排列的真实车道编号，即Road.add_lanes的real_index，
+        与UI一样按真实车道编号排列车道；None代表真实编号与添加顺序相同
+    :return: 按仿真步排序的图片路径
+    """
+    columns = [Info.lane_add_num, Info.id, Info.step, Info.x, Info.v_Length]
+    if color_info_name is not None:
+        columns.append(color_info_name)
+    data = get_df(data, step_range=step_range, columns=columns)
+    if step_range is not None:
+        data = data[(data[Info.step] >= step_range[0]) & (data[Info.step] <= step_range[1])]
+    for info in (Info.step, Info.x):
+        if info not in data.columns:
+            raise TrasimError(f"轨迹数据需包含{info}！")
+    if color_info_name is not None and color_info_name not in data.columns:
+        raise TrasimError(f"{color_info_name}未记录！")
+    data = data.sort_values(by=[Info.step], kind="stable")
+
+    steps = data[Info.step].to_numpy()
+    frame_steps = np.unique(steps)[::frame_step]
+    if len(frame_steps) == 0:
+        return []
+    starts = np.searchsorted(steps, frame_steps, side="left")
+    ends = np.searchsorted(steps, frame_steps, side="right")
+    is_frame_row = np.zeros(len(steps), dtype=bool)
+    for start, end in zip(starts, ends):
+        is_frame_row[start: end] = True
+    row_offsets = np.append(0, np.cumsum(ends - starts))
+
+    data = data[is_frame_row]
+    x = data[Info.x].to_numpy(dtype=float)
+    lane_add_num = data[Info.lane_add_num].to_numpy(dtype=int) if Info.lane_add_num in data.columns \
+        else np.zeros(len(x), dtype=int)
+    lane_index = (lane_add_num if lane_index is None else np.asarray(lane_index)[lane_add_num]).astype(float)
+    length = data[Info.v_Length].to_numpy(dtype=float) if Info.v_Length in data.columns else np.full(len(x), 5.)
+    if color_info_name is None:
+        color_data = np.tile(np.asarray(color, dtype=np.uint8), (len(x), 1))
+    else:
+        value = data[color_info_name].to_numpy(dtype=float)
+        if value_range is None:
+            value_range = (np.nanmin(value), np.nanmax(value))
+        scale = value_range[1] - value_range[0]
+        value = (value - value_range[0]) / scale if scale != 0 else np.zeros(len(value))
+        color_data = np.round(plt.get_cmap(cmap_name)(value)[:, :3] * 255).astype(np.uint8)
+
+    os.makedirs(path, exist_ok=True)
+    layout = UILayout(lane_length)
+    n_jobs = min(os.cpu_count() if n_jobs < 0 else n_jobs, len(frame_steps))
+    bounds = np.linspace(0, len(frame_steps), n_jobs + 1).astype(int)
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_render_frames)(
+            path, file_name, layout, frame_steps[i: j], row_offsets[i: j + 1] - row_offsets[i],
+            *(array[row_offsets[i]: row_offsets[j]] for array in (lane_index, x, length)),
+            car_width, color_data[row_offsets[i]: row_offsets[j]]
+        ) for i, j in zip(bounds[:-1], bounds[1:])
+    )
+    return [file for files in results for file in files]
+
+
+def frames_to_video(files: Sequence[str], video_file: str, fps=10):
+    """
+    将图片序列合成为视频
+
+    .gif使用Pillow合成，其余格式调用ffmpeg（需要在PATH中）
+    """
+    if len(files) == 0:
+        raise TrasimError("没有需要合成的图片！")
+    if video_file.lower().endswith(".gif"):
+        from PIL import Image
+        images = []
+        for file in files:
+            with Image.open(file) as image:
+                image.load()
+                images.append(image.copy())  # 读取后立即关闭文件，避免同时打开过多文件
+        images[0].save(video_file, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+        return video_file
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise TrasimError("未找到ffmpeg，无法合成视频！")
+    list_file = video_file + ".txt"
+    with open(list_file, "w", encoding="utf-8") as f:
+        for file in files:
+            f.write(f"file '{os.path.abspath(file)}'\nduration {1 / fps}\n")
+    try:
+        subprocess.run([ffmpeg, "-y", "-f", "concat", "-safe", "0", "-i", list_file,
+                        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-pix_fmt", "yuv420p", "-r", str(fps), video_file],
+                       check=True, capture_output=True)
+    finally:
+        os.remove(list_file)
+    return video_file
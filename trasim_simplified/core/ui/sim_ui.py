@@ -26,6 +26,7 @@ class UI:
         self.screen_height = None
         self.screen: Optional[pg.Surface] = None
         self.clock: Optional[Clock] = None
+        self.font: Optional[pg.font.Font] = None
 
         if not hasattr(self.frame, "lane_list"):
             self.lane_list = [self.frame]
@@ -41,6 +42,7 @@ class UI:
         self.screen = pg.display.set_mode((self.screen_width, self.screen_height))
         pg.display.set_caption(caption)
         self.clock = pg.time.Clock()
+        self.font = pg.font.SysFont('Times', 20)
 
         self.ui_update()
 
@@ -51,8 +53,7 @@ class UI:
 
         start_y = self.base_line_factor * self.single_height
 
-        font = pg.font.SysFont('Times', 20)
-        text = font.render("steps: " + str(self.frame.step_), True, (255, 255, 255), None)
+        text = self.font.render("steps: " + str(self.frame.step_), True, (255, 255, 255), None)
         self.screen.blit(text, (0, 0))
 
         row_total = int(self.lane_list[0].lane_length / self.width_base) + 1
@@ -8,17 +8,22 @@ from typing import TYPE_CHECKING, Optional
 import numpy as np
 
 from trasim_simplified.core.constant import COLOR, V_TYPE, TrackInfo as C_Info
-from trasim_simplified.core.kinematics.cfm import get_cf_model, CFModel, get_cf_id
-from trasim_simplified.core.kinematics.lcm import get_lc_model, LCModel, get_lc_id
+from trasim_simplified.core.kinematics.cfm import get_cf_model, CFModel
+from trasim_simplified.core.kinematics.lcm import get_lc_model, LCModel
 from trasim_simplified.core.obstacle import Obstacle
 from trasim_simplified.msg.trasimError import TrasimError
 
 if TYPE_CHECKING:
     from trasim_simplified.core.frame.micro.lane_abstract import LaneAbstract
+    from trasim_simplified.core.frame.micro.lane_state import LaneState
 
 
 class Vehicle(Obstacle):
     def __init__(self, lane: 'LaneAbstract', type_: int, id_: int, length: float):
+        self._state: Optional['LaneState'] = None
+        """车辆绑定的数组化车道状态，为None时状态保存在车辆自身"""
+        self._slot = -1
+        """车辆在数组化车道状态中的槽位"""
         super().__init__(type_)
         self.ID = id_
         self.length = length
@@ -27,26 +32,7 @@ class Vehicle(Obstacle):
         self.leader: Optional[Vehicle] = None
         self.follower: Optional[Vehicle] = None
 
-        self.lane_id_list = []
-        self.pos_list = []
-        self.speed_list = []
-        self.acc_list = []
-        self.step_list = []
-        self.time_list = []
-        self.dv_list = []
-        """前车与后车速度差"""
-        self.gap_list = []
-        self.thw_list = []
-        self.dhw_list = []
-
-        self.ttc_list = []
-        self.tit_list = []
         self.ttc_star = 1.5
-        self.tet_list = []
-        self.picud_list = []
-        self.picud_KK_list = []
-
-        self.preceding_id_list = []
 
         self.cf_model: Optional[CFModel] = None
         self.lc_model: Optional[LCModel] = None
@@ -60,6 +46,73 @@ class Vehicle(Obstacle):
         self.pre_left_leader_follower: Optional[tuple[Vehicle, Vehicle]] = None
         self.pre_right_leader_follower: Optional[tuple[Vehicle, Vehicle]] = None
 
+    def bind_state(self, state: 'LaneState', slot: int):
+        """将车辆的x、v、a、cf_acc绑定为数组化车道状态的视图"""
+        self._state = state
+        self._slot = slot
+
+    def unbind_state(self):
+        """解除与数组化车道状态的绑定，状态值复制回车辆自身"""
+        if self._state is None:
+            return
+        state, slot = self._state, self._slot
+        self._state = None
+        self._slot = -1
+        self._x, self._v, self._a, self._cf_acc = \
+            float(state.x[slot]), float(state.v[slot]), float(state.a[slot]), float(state.cf_acc[slot])
+
+    def get_state(self) -> Optional['LaneState']:
+        return self._state
+
+    def get_slot(self) -> int:
+        return self._slot
+
+    @property
+    def x(self):
+        return self._x if self._state is None else self._state.x[self._slot]
+
+    @x.setter
+    def x(self, value):
+        if self._state is None:
+            self._x = value
+        else:
+            self._state.x[self._slot] = value
+            self._state.invalidate()
+
+    @property
+    def v(self):
+        return self._v if self._state is None else self._state.v[self._slot]
+
+    @v.setter
+    def v(self, value):
+        if self._state is None:
+            self._v = value
+        else:
+            self._state.v[self._slot] = value
+            self._state.invalidate()
+
+    @property
+    def a(self):
+        return self._a if self._state is None else self._state.a[self._slot]
+
+    @a.setter
+    def a(self, value):
+        if self._state is None:
+            self._a = value
+        else:
+            self._state.a[self._slot] = value
+
+    @property
+    def cf_acc(self):
+        return self._cf_acc if self._state is None else self._state.cf_acc[self._slot]
+
+    @cf_acc.setter
+    def cf_acc(self, value):
+        if self._state is None:
+            self._cf_acc = value
+        else:
+            self._state.cf_acc[self._slot] = value
+
     @property
     def last_step_lc_statu(self):
         """0为保持车道，-1为向左换道，1为向右换道"""
@@ -98,93 +151,52 @@ class Vehicle(Obstacle):
         """主要供TP模型使用"""
         return self.leader is None or self.leader.type == V_TYPE.OBSTACLE
 
-    def get_data_list(self, info):
-        if C_Info.lane_add_num == info:
-            return self.lane_id_list
-        elif C_Info.id == info:
-            return [self.ID] * len(self.pos_list)
-        if C_Info.Preceding_ID == info:
-            return self.preceding_id_list
-        elif C_Info.car_type == info:
-            return [self.type] * len(self.pos_list)
-        elif C_Info.v_Length == info:
-            return [self.length] * len(self.pos_list)
-        elif C_Info.a == info:
-            return self.acc_list
-        elif C_Info.v == info:
-            return self.speed_list
-        elif C_Info.x == info:
-            return self.pos_list
-        elif C_Info.dv == info:
-            return self.dv_list
-        elif C_Info.gap == info:
-            return self.gap_list
-        elif C_Info.dhw == info:
-            return self.dhw_list
-        elif C_Info.thw == info:
-            return self.thw_list
-        elif C_Info.time == info:
-            return self.time_list
-        elif C_Info.step == info:
-            return self.step_list
-        elif C_Info.cf_id == info:
-            return [get_cf_id(self.cf_model.name)] * len(self.pos_list)
-        elif C_Info.lc_id == info:
-            return [get_lc_id(None if self.lc_model is None else self.lc_model.name)] * len(self.pos_list)
-
-        elif C_Info.safe_ttc == info:
-            return self.ttc_list
-        elif C_Info.safe_tit == info:
-            return self.tit_list
-        elif C_Info.safe_tet == info:
-            return self.tet_list
-        elif C_Info.safe_picud == info:
-            return self.picud_list
-        elif C_Info.safe_picud_KK == info:
-            return self.picud_KK_list
-        else:
-            TrasimError(f"{info}未创建！")
-
-    def record(self):
-        for info in self.lane.data_container.save_info:
-            if C_Info.lane_add_num == info:
-                self.lane_id_list.append(self.lane.add_num)
-            if C_Info.Preceding_ID == info:
-                self.preceding_id_list.append(self.leader.ID if self.leader is not None else np.NaN)
-            if C_Info.a == info:
-                self.acc_list.append(self.a)
-            elif C_Info.v == info:
-                self.speed_list.append(self.v)
-            elif C_Info.x == info:
-                self.pos_list.append(self.x)
-            elif C_Info.dv == info:
-                self.dv_list.append(self.dv)
-            elif C_Info.gap == info:
-                self.gap_list.append(self.gap)
-            elif C_Info.dhw == info:
-                self.dhw_list.append(self.dhw)
-            elif C_Info.thw == info:
-                self.thw_list.append(self.thw)
-            elif C_Info.time == info:
-                self.time_list.append(self.lane.time_)
-            elif C_Info.step == info:
-                self.step_list.append(self.lane.step_)
-
-            elif C_Info.safe_ttc == info:
-                self.ttc_list.append(self.ttc)
-            elif C_Info.safe_tit == info:
-                self.tit_list.append(self.tit)
-            elif C_Info.safe_tet == info:
-                self.tet_list.append(self.tet)
-            elif C_Info.safe_picud == info:
-                self.picud_list.append(self.picud)
-            elif C_Info.safe_picud_KK == info:
-                self.picud_KK_list.append(self.picud_KK)
-            else:
-                TrasimError(f"{info}未创建！")
+    def get_data_list(self, info) -> np.ndarray:
+        """获取车辆已记录的单项数据（按仿真步顺序），数据由所经过车道的DataContainer记录"""
+        lanes = self.lane.road.lane_list if self.lane.road_control else [self.lane]
+        containers = [lane.data_container for lane in lanes if lane.data_container.has_data(self.ID)]
+        if len(containers) == 0:
+            return np.empty(0)
+        if len(containers) == 1:
+            return containers[0].get_car_data(self.ID, info)
+        steps = np.concatenate([container.get_car_data(self.ID, C_Info.step) for container in containers])
+        data = np.concatenate([container.get_car_data(self.ID, info) for container in containers])
+        return data[np.argsort(steps, kind="stable")]
+
+    @property
+    def pos_list(self):
+        return self.get_data_list(C_Info.x)
+
+    @property
+    def speed_list(self):
+        return self.get_data_list(C_Info.v)
+
+    @property
+    def acc_list(self):
+        return self.get_data_list(C_Info.a)
+
+    @property
+    def time_list(self):
+        return self.get_data_list(C_Info.time)
+
+    @property
+    def step_list(self):
+        return self.get_data_list(C_Info.step)
+
+    _RECORD_ATTR = {C_Info.dv: "dv", C_Info.gap: "gap", C_Info.dhw: "dhw", C_Info.thw: "thw",
+                    C_Info.safe_ttc: "ttc", C_Info.safe_tit: "tit", C_Info.safe_tet: "tet"}
+
+    def get_record_value(self, info):
+        """获取当前时刻的间距或安全指标，供DataContainer逐车记录"""
+        return getattr(self, self._RECORD_ATTR[info])
+
+    def _use_state_cache(self):
+        return self._state is not None and not self._state.stale
 
     @property
     def gap(self):
+        if self._use_state_cache():
+            return self._state.gap[self._slot]
         if self.leader is not None:
             dhw = self.dhw
             gap = dhw - self.leader.length
@@ -195,6 +207,8 @@ class Vehicle(Obstacle):
     @property
     def dv(self):
         """前车与当前车速度差"""
+        if self._use_state_cache():
+            return self._state.dv[self._slot]
         if self.leader is not None:
             return self.leader.v - self.v
         else:
@@ -202,6 +216,8 @@ class Vehicle(Obstacle):
 
     @property
     def dhw(self):
+        if self._use_state_cache():
+            return self._state.dhw[self._slot]
         if self.leader is not None:
             dhw = self.leader.x - self.x
             if dhw < 0:
@@ -279,7 +295,8 @@ class Vehicle(Obstacle):
             return np.NaN
 
     def has_data(self):
-        return len(self.pos_list) != 0
+        lanes = self.lane.road.lane_list if self.lane.road_control else [self.lane]
+        return any(lane.data_container.has_data(self.ID) for lane in lanes)
 
     def set_car_param(self, param: dict):
         self.color = param.get("color", COLOR.yellow)
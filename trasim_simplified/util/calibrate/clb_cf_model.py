@@ -4,6 +4,7 @@
 # @File : clb_cf_model.py
 # @Software : PyCharm
 import time
+from typing import TYPE_CHECKING
 
 import joblib
 import numpy as np
@@ -13,9 +14,15 @@ from matplotlib import pyplot as plt
 
 from trasim_simplified.core.constant import CFM, TrackInfo as TI, Prefix
 from trasim_simplified.core.kinematics.cfm import get_cf_default_param, get_cf_func
+from trasim_simplified.msg.trasimError import TrasimError
 
-from trasim_simplified.util.calibrate.gof_func import RMSE
-from trasim_simplified.util.calibrate.follow_sim import simulation, customize_sim
+from trasim_simplified.util.calibrate.gof_func import RMSE, RMSPE, Theil_s_U, gof_batch, get_gof_weights
+from trasim_simplified.util.calibrate.follow_sim import simulation, customize_sim, get_sim_kernel, \
+    simulation_population
+
+if TYPE_CHECKING:
+    from trasim_simplified.util.calibrate.clb_runner import CalibrationRunner
+    from trasim_simplified.util.calibrate.clb_store import ClbResultStore
 
 try:
     import geatpy as ea
@@ -25,6 +32,7 @@ try:
 except ImportError as e:
     print(e)
     from sko.GA import GA
+    from sko.tools import set_run_mode
 
     ea = None
     print("Using sko")
@@ -86,7 +94,50 @@ cf_param_ins = {
 }
 
 
-def ga_cal(cf_func, obs_x, obs_v, obs_lx, obs_lv, leaderL, dt, ranges: dict, ins: dict, types, seed, drawing=0):
+def get_population_eval(cf_func, param_names: list[str], obs_x, obs_v, obs_lx, obs_lv, leaderL, dt,
+                        gof=RMSE, eval_params=None, update_method="Euler"):
+    """
+    获取种群的评价函数，一次仿真并评价一代中的所有个体
+
+    跟驰模型已注册编译的仿真函数时，所有个体在同一前车轨迹下同步仿真，否则逐个体调用simulation
+
+    :param param_names: 决策变量对应的参数名称
+    :param gof: 拟合优度函数，RMSE、RMSPE或Theil_s_U
+    :return: 评价函数，输入决策变量矩阵（个体数 × 参数数），返回各个体的目标函数值
+    """
+    eval_params = ["dhw"] if eval_params is None else eval_params
+    obs_x, obs_v, obs_lx, obs_lv = (np.asarray(data, dtype=float) for data in (obs_x, obs_v, obs_lx, obs_lv))
+    init_x, init_v = obs_x[0], obs_v[0]
+    kernel = get_sim_kernel(cf_func)
+    if kernel is not None and all(name in param_names for name in kernel[0]):
+        index = [param_names.index(name) for name in kernel[0]]
+        tau_index = param_names.index("tau") if "tau" in param_names else None
+        gof_kind, w_dhw, w_v = get_gof_weights(gof, eval_params) if gof in (RMSE, RMSPE, Theil_s_U) else (None,) * 3
+
+        def eval_pop(params: np.ndarray) -> np.ndarray:
+            params = np.atleast_2d(np.asarray(params, dtype=float))
+            if tau_index is not None:
+                assert np.all(params[:, tau_index] >= dt)
+            x, v, _, _ = simulation_population(cf_func, init_x, init_v, obs_lx, obs_lv, params[:, index], dt,
+                                               leaderL, update_method)
+            if gof_kind is None:
+                return gof(sim_x=x, sim_v=v, obs_x=obs_x, obs_v=obs_v, obs_lx=obs_lx, eval_params=eval_params)
+            return gof_batch(gof_kind, x, v, obs_x, obs_v, obs_lx, w_dhw, w_v)
+    else:
+        def eval_pop(params: np.ndarray) -> np.ndarray:
+            obj = []
+            for param in np.atleast_2d(params):
+                x, v, _, _ = simulation(
+                    cf_func=cf_func, init_x=init_x, init_v=init_v, obs_lx=obs_lx, obs_lv=obs_lv,
+                    cf_param=dict(zip(param_names, param)), leaderL=leaderL, dt=dt, update_method=update_method)
+                obj.append(gof(sim_x=x, sim_v=np.array(v), obs_x=obs_x, obs_v=obs_v, obs_lx=obs_lx,
+                               eval_params=eval_params))
+            return np.array(obj, dtype=float)
+    return eval_pop
+
+
+def ga_cal(cf_func, obs_x, obs_v, obs_lx, obs_lv, leaderL, dt, ranges: dict, ins: dict, types, seed, drawing=0,
+           gof=RMSE):
     """
     :param cf_func: 跟驰模型函数
     :param dt: 仿真步长
@@ -100,18 +151,17 @@ def ga_cal(cf_func, obs_x, obs_v, obs_lx, obs_lv, leaderL, dt, ranges: dict, ins
     :param types: 参数类型，0：实数；1：整数
     :param seed: GA随机种子
     :param drawing: 是否绘图 0表示不绘图； 1表示绘制最终结果图； 2表示实时绘制目标空间动态图； 3表示实时绘制决策空间动态图。
+    :param gof: 拟合优度函数，RMSE、RMSPE或Theil_s_U
     """
     param_names = list(ranges.keys())
-    init_x = obs_x[0]
-    init_v = obs_v[0]
+    eval_pop = get_population_eval(cf_func, param_names, obs_x, obs_v, obs_lx, obs_lv, leaderL, dt,
+                                   gof=gof, eval_params=["dhw"], update_method="Euler")
 
     if __opti_package == "sko":
-        def eval_vars(params):  # 定义目标函数（含约束）
-            param = {k: v for k, v in zip(ranges.keys(), params)}
-            x, v, _, _ = simulation(
-                cf_func=cf_func, init_x=init_x, init_v=init_v, obs_lx=obs_lx, obs_lv=obs_lv,
-                cf_param=param, leaderL=leaderL, dt=dt, update_method="Euler")
-            return RMSE(sim_x=x, sim_v=v, obs_x=obs_x, obs_v=obs_v, obs_lx=obs_lx, eval_params=["dhw"])
+        def eval_vars(params):  # 定义目标函数（含约束），params为整个种群的决策变量矩阵
+            return eval_pop(params)
+
+        set_run_mode(eval_vars, "vectorization")
 
         time_start = time.time()
         var_types = np.array([types[name] for name in param_names])
@@ -125,13 +175,8 @@ def ga_cal(cf_func, obs_x, obs_v, obs_lx, obs_lv, leaderL, dt, ranges: dict, ins
         res = {"ObjV": best_y, "Vars": {k: v for k, v in zip(ranges.keys(), best_x)}}
 
     elif __opti_package == "geatpy":
-        @ea.Problem.single
-        def eval_vars(params):  # 定义目标函数（含约束）
-            param = {k: v for k, v in zip(ranges.keys(), params)}
-            x, v, _, _ = simulation(
-                cf_func=cf_func, init_x=init_x, init_v=init_v, obs_lx=obs_lx, obs_lv=obs_lv,
-                cf_param=param, leaderL=leaderL, dt=dt, update_method="Euler")
-            return RMSE(sim_x=x, sim_v=v, obs_x=obs_x, obs_v=obs_v, obs_lx=obs_lx, eval_params=["dhw"])
+        def eval_vars(params):  # 定义目标函数（含约束），params为整个种群的决策变量矩阵
+            return eval_pop(params).reshape(-1, 1)
 
         problem = ea.Problem(name='test',
                              M=1,  # 目标维数
@@ -157,15 +202,17 @@ def ga_cal(cf_func, obs_x, obs_v, obs_lx, obs_lv, leaderL, dt, ranges: dict, ins
                           saveFlag=False)
         print(f"{cf_func.__name__}-seed{seed}: {res['ObjV'][0]}, {res['Vars']}, {res['executeTime']}")
         res["Vars"] = {k: v for k, v in zip(ranges.keys(), res["Vars"][0])}
-        res["ObjV"] = res["ObjV"][0]
     else:
         raise ValueError(f"Unknown optimization package: {__opti_package}")
 
+    # sko与geatpy返回的目标函数值为数组，统一为float，与标定结果缓存中读取的结果一致
+    res["ObjV"] = float(np.ravel(res["ObjV"])[0])
     return res
 
 
 def clb_run(cf_func, cf_name, obs_x_s, obs_v_s, obs_lx_s, obs_lv_s, leaderL_s, dt, seed,
-            drawing=0, n_jobs=-1, parallel=True, cf_param_ranges_=None) -> list[dict]:
+            drawing=0, n_jobs=-1, parallel=True, cf_param_ranges_=None,
+            runner: 'CalibrationRunner' = None, id_s=None, store: 'ClbResultStore' = None, gof=RMSE) -> list[dict]:
     """
     :param cf_func 跟驰模型加速度函数
     :param cf_name 跟驰模型名称
@@ -180,31 +227,58 @@ def clb_run(cf_func, cf_name, obs_x_s, obs_v_s, obs_lx_s, obs_lv_s, leaderL_s, d
     :param n_jobs 并行计算的进程数，-1为全部进程
     :param parallel 是否不使用并行计算
     :param cf_param_ranges_ 参数范围
+    :param runner 常驻进程池的标定执行器，不为None时由其执行（轨迹、dt需与创建执行器时一致，否则报错），忽略n_jobs与parallel
+    :param id_s 跟驰对ID，None代表使用序号
+    :param store 标定结果缓存，不为None时跳过已有结果的跟驰对，并在每个跟驰对标定完成后写入结果
+    :param gof 拟合优度函数
     """
     global cf_param_ranges
     if cf_param_ranges_ is not None:
         cf_param_ranges = cf_param_ranges_
+    ranges = cf_param_ranges[cf_name]
+    pair_num = len(obs_x_s)
+    if runner is not None:
+        if len(runner.pair_set) != pair_num or \
+                not np.array_equal(runner.pair_set.lengths, [len(obs_x) for obs_x in obs_x_s]):
+            raise TrasimError("观测轨迹与runner创建时的轨迹不一致！")
+        if runner.dt != dt:
+            raise TrasimError(f"仿真步长{dt}与runner的仿真步长{runner.dt}不一致！")
+    id_s = list(range(pair_num)) if id_s is None else list(id_s)
+    result: list = [None] * pair_num
+    index = list(range(pair_num))
+    on_result = None
+    if store is not None:
+        key = store.get_key(cf_name, ranges, seed, gof, dt)
+        config = store.get_config(cf_name, ranges, seed, gof, dt)
+        cached = store.load(key)
+        index = [i for i in index if id_s[i] not in cached]
+        for i in range(pair_num):
+            result[i] = cached.get(id_s[i], None)
+
+        def on_result(i, res):
+            store.add(key, id_s[i], res, config)
+
+    if runner is not None:
+        for i, res in zip(index, runner.run(cf_func, cf_name, seed, drawing=drawing, cf_param_ranges_=cf_param_ranges,
+                                            gof=gof, index=index, on_result=on_result)):
+            result[i] = res
+        return result
+
+    def get_kwargs(i):
+        return dict(cf_func=cf_func, obs_x=np.array(obs_x_s[i]), obs_v=np.array(obs_v_s[i]),
+                    obs_lx=np.array(obs_lx_s[i]), obs_lv=np.array(obs_lv_s[i]), leaderL=leaderL_s[i],
+                    dt=dt, ranges=ranges, types=cf_param_types[cf_name], ins=cf_param_ins[cf_name],
+                    seed=seed, drawing=drawing, gof=gof)
+
     if parallel:
-        result = joblib.Parallel(n_jobs=n_jobs)(
-            joblib.delayed(ga_cal)(cf_func=cf_func,
-                                   obs_x=np.array(obs_x), obs_v=np.array(obs_v), obs_lx=np.array(obs_lx),
-                                   obs_lv=np.array(obs_lv), leaderL=leaderL,
-                                   dt=dt, ranges=cf_param_ranges[cf_name],
-                                   types=cf_param_types[cf_name],
-                                   ins=cf_param_ins[cf_name],
-                                   seed=seed, drawing=drawing)
-            for obs_x, obs_v, obs_lx, obs_lv, leaderL in
-            tqdm.tqdm(list(zip(obs_x_s, obs_v_s, obs_lx_s, obs_lv_s, leaderL_s))))
+        results = joblib.Parallel(n_jobs=n_jobs, return_as="generator")(
+            joblib.delayed(ga_cal)(**get_kwargs(i)) for i in index)
     else:
-        result = []
-        for obs_x, obs_v, obs_lx, obs_lv, leaderL in zip(obs_x_s, obs_v_s, obs_lx_s, obs_lv_s, leaderL_s):
-            result.append(ga_cal(cf_func=cf_func,
-                                 obs_x=np.array(obs_x), obs_v=np.array(obs_v), obs_lx=np.array(obs_lx),
-                                 obs_lv=np.array(obs_lv), leaderL=leaderL,
-                                 dt=dt, ranges=cf_param_ranges[cf_name],
-                                 types=cf_param_types[cf_name],
-                                 ins=cf_param_ins[cf_name],
-                                 seed=seed, drawing=drawing))
+        results = (ga_cal(**get_kwargs(i)) for i in index)
+    for i, res in zip(index, tqdm.tqdm(results, total=len(index))):
+        result[i] = res
+        if on_result is not None:
+            on_result(i, res)
     return result
 
 
@@ -236,13 +310,20 @@ def get_test_sim_traj(cf_name, cf_func, dt, v_length=5):
     return x_lists, v_lists, a_lists, cf_a_lists
 
 
-def clb_param_to_df(id_s, clb_run_res: list[dict[str, dict]], cf_name):
+def clb_param_to_df(id_s, clb_run_res: list[dict[str, dict]] = None, cf_name=None,
+                    store: 'ClbResultStore' = None, seed=None, dt=None, gof=RMSE, cf_param_ranges_=None):
     """
     将标定后的参数转换为DataFrame
+
+    clb_run_res为None时从标定结果缓存store中读取（需给定seed、dt与gof），id_s为None代表缓存中的全部跟驰对，
+    没有结果的跟驰对被忽略
     """
-    vars_list = [[res["Vars"][name] for name in cf_param_ranges[cf_name].keys()] for res in clb_run_res]
-    vars_array = np.array(vars_list)
-    df = pd.DataFrame(vars_array, columns=list(cf_param_ranges[cf_name].keys()))
+    ranges = (cf_param_ranges_ if cf_param_ranges_ is not None else cf_param_ranges)[cf_name]
+    if clb_run_res is None:
+        id_s, clb_run_res = store.get_results(store.get_key(cf_name, ranges, seed, gof, dt), id_s)
+    vars_list = [[res["Vars"][name] for name in ranges.keys()] for res in clb_run_res]
+    vars_array = np.array(vars_list).reshape(len(vars_list), len(ranges))
+    df = pd.DataFrame(vars_array, columns=list(ranges.keys()))
     df[TI.Pair_ID] = np.array(id_s)
     df["ObjV"] = np.array([res["ObjV"] for res in clb_run_res])
     return df
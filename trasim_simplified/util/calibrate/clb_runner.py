@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 20:10
+# @Author : yzbyx
+# @File : clb_runner.py
+# Software: PyCharm
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Sequence, Callable
+
+import numpy as np
+import tqdm
+
+from trasim_simplified.msg.trasimError import TrasimError
+from trasim_simplified.util.calibrate.clb_cf_model import ga_cal, cf_param_ranges, cf_param_types, cf_param_ins
+from trasim_simplified.util.calibrate.follow_sim import get_sim_kernel, simulation_population
+from trasim_simplified.util.calibrate.gof_func import RMSE
+
+
+class TrajectoryPairSet:
+    """
+    跟驰对观测轨迹的内存映射存储，供标定进程共享读取
+
+    所有跟驰对的x、v、leader x、leader v按行拼接为一个(总行数 × 4)的.npy文件，另存每个跟驰对的起始行号与前车长度
+    """
+    DATA_FILE = "data.npy"
+    OFFSET_FILE = "offsets.npy"
+    LEADER_L_FILE = "leaderL.npy"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: np.ndarray = np.load(os.path.join(path, self.DATA_FILE), mmap_mode="r")
+        """列依次为obs_x、obs_v、obs_lx、obs_lv"""
+        self.offsets: np.ndarray = np.load(os.path.join(path, self.OFFSET_FILE))
+        """各跟驰对的起始行号，长度为跟驰对数 + 1"""
+        self.leaderL: np.ndarray = np.load(os.path.join(path, self.LEADER_L_FILE))
+
+    @classmethod
+    def write(cls, path: str, obs_x_s, obs_v_s, obs_lx_s, obs_lv_s, leaderL_s) -> 'TrajectoryPairSet':
+        os.makedirs(path, exist_ok=True)
+        lengths = np.array([len(obs_x) for obs_x in obs_x_s], dtype=int)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        data = np.lib.format.open_memmap(os.path.join(path, cls.DATA_FILE), mode="w+",
+                                         dtype=float, shape=(int(offsets[-1]), 4))
+        for i, pair in enumerate(zip(obs_x_s, obs_v_s, obs_lx_s, obs_lv_s)):
+            for j, column in enumerate(pair):
+                data[offsets[i]: offsets[i + 1], j] = np.asarray(column, dtype=float)
+        data.flush()
+        del data
+        np.save(os.path.join(path, cls.OFFSET_FILE), offsets)
+        np.save(os.path.join(path, cls.LEADER_L_FILE), np.asarray(leaderL_s, dtype=float))
+        return cls(path)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def get(self, index: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, float]:
+        """
+        :return: (obs_x, obs_v, obs_lx, obs_lv, leaderL)，轨迹复制为连续、可写的数组，
+            与_warm_up编译时的数组类型一致，避免编译函数按只读的跨步视图重新编译
+        """
+        data = np.array(self.data[self.offsets[index]: self.offsets[index + 1]].T, order="C")
+        return data[0], data[1], data[2], data[3], float(self.leaderL[index])
+
+
+_worker_pair_set: Optional[TrajectoryPairSet] = None
+
+
+def _warm_up(cf_func):
+    """以极短的轨迹调用一次编译的仿真函数，触发numba编译"""
+    kernel = get_sim_kernel(cf_func)
+    if kernel is None:
+        return
+    with np.errstate(all="ignore"):
+        simulation_population(cf_func, 0., 1., np.full(2, 100.), np.ones(2), np.ones((1, len(kernel[0]))), 0.1, 1.)
+
+
+def _worker_init(path: str, cf_funcs: Sequence):
+    global _worker_pair_set
+    _worker_pair_set = TrajectoryPairSet(path)
+    for cf_func in cf_funcs:
+        _warm_up(cf_func)
+
+
+def _worker_run(index: int, cf_func, dt, ranges, types, ins, seed, drawing, gof) -> tuple[int, dict]:
+    obs_x, obs_v, obs_lx, obs_lv, leaderL = _worker_pair_set.get(index)
+    return index, ga_cal(cf_func=cf_func, obs_x=obs_x, obs_v=obs_v, obs_lx=obs_lx, obs_lv=obs_lv, leaderL=leaderL,
+                         dt=dt, ranges=ranges, types=types, ins=ins, seed=seed, drawing=drawing, gof=gof)
+
+
+class CalibrationRunner:
+    """
+    跟驰模型标定的任务执行器
+
+    观测轨迹只写入一次内存映射文件，由常驻的进程池共享读取，进程启动时预先编译仿真函数；
+    同一个执行器可以依次标定多个模型、多个随机种子，任务按照轨迹长度从长到短分配
+    """
+    def __init__(self, obs_x_s, obs_v_s, obs_lx_s, obs_lv_s, leaderL_s, dt, n_jobs=-1,
+                 cf_funcs: Optional[Sequence] = None, path: Optional[str] = None):
+        """
+        :param dt: 仿真步长
+        :param n_jobs: 进程数，-1为全部进程
+        :param cf_funcs: 进程启动时预先编译的跟驰模型加速度函数
+        :param path: 内存映射文件目录，None代表使用临时目录并在close时删除
+        """
+        self.dt = dt
+        self._is_temp = path is None
+        self.path = tempfile.mkdtemp(prefix="trasim_clb_") if path is None else path
+        self.pair_set = TrajectoryPairSet.write(self.path, obs_x_s, obs_v_s, obs_lx_s, obs_lv_s, leaderL_s)
+        self.n_jobs = os.cpu_count() if n_jobs < 0 else n_jobs
+        self.cf_funcs = list(cf_funcs) if cf_funcs is not None else []
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_worker_init,
+                                             initargs=(self.path, self.cf_funcs))
+        return self._pool
+
+    def run(self, cf_func, cf_name, seed, drawing=0, cf_param_ranges_=None, gof=RMSE,
+            index: Optional[Sequence[int]] = None, on_result: Optional[Callable[[int, dict], None]] = None) \
+            -> list[dict]:
+        """
+        标定所有（或index指定的）跟驰对
+
+        :param cf_param_ranges_: 参数范围，None代表使用cf_param_ranges中的默认范围
+        :param on_result: 每个跟驰对标定完成时的回调函数，参数为(跟驰对序号, 标定结果)
+        :return: 与跟驰对顺序对应的标定结果
+        """
+        if self.path is None:
+            raise TrasimError("CalibrationRunner已关闭！")
+        ranges = (cf_param_ranges_ if cf_param_ranges_ is not None else cf_param_ranges)[cf_name]
+        index = np.arange(len(self.pair_set)) if index is None else np.asarray(index, dtype=int)
+        order = index[np.argsort(-self.pair_set.lengths[index], kind="stable")]
+        futures = [self.pool.submit(_worker_run, int(i), cf_func, self.dt, ranges, cf_param_types[cf_name],
+                                    cf_param_ins[cf_name], seed, drawing, gof) for i in order]
+        result = {}
+        for future in tqdm.tqdm(as_completed(futures), total=len(futures)):
+            i, res = future.result()
+            result[i] = res
+            if on_result is not None:
+                on_result(i, res)
+        return [result[int(i)] for i in index]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._is_temp and self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
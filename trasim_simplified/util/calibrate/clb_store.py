@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# @Time : 2026/10/18 20:40
+# @Author : yzbyx
+# @File : clb_store.py
+# Software: PyCharm
+import hashlib
+import json
+import os
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def _to_json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, tuple):
+        return tuple(_to_json_value(v) for v in value)
+    return value
+
+
+def _from_json_value(value):
+    """JSON中的数组读取为元组，使(车辆ID, 前车ID)形式的跟驰对ID可以作为字典的键"""
+    if isinstance(value, list):
+        return tuple(_from_json_value(v) for v in value)
+    return value
+
+
+class ClbResultStore:
+    """
+    跟驰模型标定结果的磁盘缓存
+
+    标定配置（模型名称、参数范围、随机种子、拟合优度函数、仿真步长）相同的结果写入同一个{key}.jsonl文件，
+    每个跟驰对标定完成后追加一行，中断后重新运行时跳过已有结果的跟驰对
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._results: dict[str, dict] = {}
+
+    @staticmethod
+    def get_config(cf_name: str, ranges: dict, seed, gof, dt) -> dict:
+        return {"cf_name": cf_name, "ranges": {k: [float(v) for v in value] for k, value in ranges.items()},
+                "seed": _to_json_value(seed), "gof": getattr(gof, "__name__", str(gof)), "dt": float(dt)}
+
+    @staticmethod
+    def get_key(cf_name: str, ranges: dict, seed, gof, dt) -> str:
+        config = ClbResultStore.get_config(cf_name, ranges, seed, gof, dt)
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def _get_file(self, key: str, suffix=".jsonl"):
+        return os.path.join(self.path, key + suffix)
+
+    def load(self, key: str) -> dict:
+        """:return: {跟驰对ID: {"ObjV": 目标函数值, "Vars": {参数名称: 参数值}}}"""
+        if key not in self._results:
+            results = {}
+            if os.path.exists(self._get_file(key)):
+                with open(self._get_file(key), "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue  # 写入过程中断导致的不完整行
+                        pair_id = _from_json_value(record["pair_id"])
+                        results[pair_id] = {"ObjV": record["ObjV"], "Vars": record["Vars"]}
+            self._results[key] = results
+        return self._results[key]
+
+    def add(self, key: str, pair_id, res: dict, config: Optional[dict] = None):
+        """追加一个跟驰对的标定结果，config为标定配置，在首次写入时保存"""
+        if config is not None and not os.path.exists(self._get_file(key, ".json")):
+            with open(self._get_file(key, ".json"), "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False)
+        pair_id = _to_json_value(pair_id)
+        record = {"pair_id": pair_id, "ObjV": float(res["ObjV"]),
+                  "Vars": {k: float(value) for k, value in res["Vars"].items()}}
+        with open(self._get_file(key), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.load(key)[pair_id] = {"ObjV": record["ObjV"], "Vars": record["Vars"]}
+
+    def get_results(self, key: str, id_s: Optional[Sequence] = None) -> tuple[list, list[dict]]:
+        """
+        :param id_s: 跟驰对ID，None代表全部已有结果
+        :return: (跟驰对ID, 对应的标定结果)，没有结果的跟驰对被忽略
+        """
+        results = self.load(key)
+        if id_s is None:
+            id_s = list(results.keys())
+        else:
+            id_s = [id_ for id_ in map(_to_json_value, id_s) if id_ in results]
+        return id_s, [results[id_] for id_ in id_s]
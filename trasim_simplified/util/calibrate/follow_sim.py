@@ -4,32 +4,148 @@
 # @File : follow_sim.py
 # Software: PyCharm
 import typing
+from typing import Optional
 
+import numba
 import numpy as np
 import pandas as pd
 
 from trasim_simplified.core.constant import TrackInfo as TI
+from trasim_simplified.core.kinematics.cfm.CFModel_ACC import cf_ACC_acc
+from trasim_simplified.core.kinematics.cfm.CFModel_Gipps import cf_Gipps_acc, cf_Gipps_acc_jit
+from trasim_simplified.core.kinematics.cfm.CFModel_IDM import cf_IDM_acc, cf_IDM_acc_jit
+from trasim_simplified.core.kinematics.cfm.CFModel_NonLinearGHR import cf_NonLinearGHR_acc
+from trasim_simplified.core.kinematics.cfm.CFModel_OVM import cf_OVM_acc
 
 from trasim_simplified.msg.trasimError import TrasimError
 
 
+@numba.njit()
+def _IDM_acc(p, speed, gap, leaderV, leaderL):
+    return cf_IDM_acc_jit(p[0], 0, p[1], p[2], p[3], p[4], p[5], speed, gap, leaderV)
+
+
+@numba.njit()
+def _Gipps_acc(p, speed, gap, leaderV, leaderL):
+    return cf_Gipps_acc_jit(p[0], p[1], p[2], p[3], p[4], p[5], speed, gap, leaderV)
+
+
+@numba.njit()
+def _ACC_acc(p, speed, gap, leaderV, leaderL):
+    return p[0] * (gap - p[3] - p[2] * speed) + p[1] * (leaderV - speed)
+
+
+@numba.njit()
+def _OVM_acc(p, speed, gap, leaderV, leaderL):
+    return p[0] * (p[1] * (np.tanh(p[2] * (gap + leaderL - p[3])) - np.tanh(p[2] * (p[4] - p[3]))) - speed)
+
+
+@numba.njit()
+def _NonLinearGHR_acc(p, speed, gap, leaderV, leaderL):
+    return p[2] * np.power(speed, p[0]) * (leaderV - speed) / np.power(gap + leaderL, p[1])
+
+
+SIM_KERNELS: dict[typing.Callable, tuple[list[str], typing.Callable]] = {
+    cf_IDM_acc: (["s0", "v0", "T", "omega", "d", "delta"], _IDM_acc),
+    cf_Gipps_acc: (["a", "b", "v0", "tau", "s", "b_hat"], _Gipps_acc),
+    cf_Gipps_acc_jit: (["a", "b", "v0", "tau", "s", "b_hat"], _Gipps_acc),
+    cf_ACC_acc: (["k1", "k2", "thw", "s0"], _ACC_acc),
+    cf_OVM_acc: (["a", "V0", "m", "bf", "bc"], _OVM_acc),
+    cf_NonLinearGHR_acc: (["m", "l", "a"], _NonLinearGHR_acc),
+}
+"""跟驰模型加速度函数对应的(参数名称顺序, 编译后的加速度函数)，编译后的函数以参数数组作为第一个参数"""
+UPDATE_METHODS = {"Euler": 0, "Ballistic": 1}
+
+
+def get_sim_kernel(cf_func) -> Optional[tuple[list[str], typing.Callable]]:
+    """获取跟驰模型的参数名称顺序与编译后的加速度函数，未注册时返回None"""
+    return SIM_KERNELS.get(cf_func, None)
+
+
+@numba.njit()
+def _simulation_jit(acc_func, params, init_x, init_v, obs_lx, obs_lv, leaderL, dt, method):
+    """所有参数组（params的每一行）在同一前车轨迹下同步仿真"""
+    pop_num, step_num = params.shape[0], len(obs_lx)
+    sim_pos, sim_speed, sim_acc, sim_cf_acc = (np.zeros((pop_num, step_num)), np.zeros((pop_num, step_num)),
+                                               np.zeros((pop_num, step_num)), np.zeros((pop_num, step_num)))
+    speed = np.full(pop_num, init_v)
+    pos = np.full(pop_num, init_x)
+    sim_pos[:, 0], sim_speed[:, 0] = init_x, init_v
+    for i in range(step_num - 1):
+        for j in range(pop_num):
+            cf_acc = acc_func(params[j], speed[j], obs_lx[i] - pos[j] - leaderL[i], obs_lv[i], leaderL[i])
+            sim_cf_acc[j, i + 1] = cf_acc
+            speed_before = speed[j]
+            speed[j] += cf_acc * dt
+            if speed[j] < 0:
+                speed[j] = 0.
+            if method == 0:
+                pos[j] += speed[j] * dt
+            else:
+                pos[j] += (speed[j] + speed_before) * dt / 2
+            sim_pos[j, i + 1] = pos[j]
+            sim_speed[j, i + 1] = speed[j]
+            sim_acc[j, i + 1] = (speed[j] - speed_before) / dt
+    return sim_pos, sim_speed, sim_acc, sim_cf_acc
+
+
+def simulation_population(cf_func, init_x, init_v, obs_lx, obs_lv, params: np.ndarray, dt,
+                          leaderL: float | typing.Iterable, update_method="Euler") \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    同一前车轨迹下多组模型参数的同步仿真，用于遗传算法对整个种群的评价
+
+    :param params: 模型参数矩阵（参数组数 × 参数数），参数按照get_sim_kernel的参数名称顺序排列
+    :return: 后车的位置、速度、加速度、跟驰模型加速度矩阵（参数组数 × 仿真步数）
+    """
+    kernel = get_sim_kernel(cf_func)
+    if kernel is None:
+        raise TrasimError(f"{cf_func.__name__}未注册编译的仿真函数！")
+    if update_method not in UPDATE_METHODS:
+        raise TrasimError("update_method must be 'Euler' or 'Ballistic'")
+    params = np.atleast_2d(np.asarray(params, dtype=float))
+    obs_lx = np.asarray(obs_lx, dtype=float)
+    leaderL = np.broadcast_to(np.asarray(leaderL, dtype=float), obs_lx.shape)
+    return _simulation_jit(kernel[1], params, float(init_x), float(init_v), obs_lx,
+                           np.asarray(obs_lv, dtype=float), leaderL, float(dt), UPDATE_METHODS[update_method])
+
+
+def simulation_array(cf_func, init_x, init_v, obs_lx, obs_lv, param: np.ndarray, dt,
+                     leaderL: float | typing.Iterable, update_method="Euler") \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    simulation的编译实现，模型参数为按照get_sim_kernel参数名称顺序排列的数组
+
+    :return: 后车的位置、速度、加速度、跟驰模型加速度数组
+    """
+    result = simulation_population(cf_func, init_x, init_v, obs_lx, obs_lv, param, dt, leaderL, update_method)
+    return result[0][0], result[1][0], result[2][0], result[3][0]
+
+
 def simulation(cf_func, init_x, init_v, obs_lx, obs_lv, cf_param, dt,
-               leaderL: float | typing.Iterable, update_method="Euler") -> tuple[list, list, list, list]:
+               leaderL: float | typing.Iterable, update_method="Euler", use_jit=True) \
+        -> tuple[typing.Sequence, typing.Sequence, typing.Sequence, typing.Sequence]:
     """
     给定前车的位置、速度，以及模型参数，仿真得到后车的位置、速度、加速度，默认前车ID不变
 
+    跟驰模型已注册编译的仿真函数且参数完整时调用simulation_array（返回数组），否则逐步调用cf_func（返回列表）
+
     注意！原始数据的位置、速度的关系需要与模型状态的更新方式相对应
     """
     tau = cf_param.get('tau', False)
     if tau:
         assert tau >= dt
+    kernel = get_sim_kernel(cf_func) if use_jit else None
+    if kernel is not None and all(name in cf_param for name in kernel[0]):
+        return simulation_array(cf_func, init_x, init_v, obs_lx, obs_lv, [cf_param[name] for name in kernel[0]],
+                                dt, leaderL, update_method)
     speed = float(init_v)
     pos = float(init_x)
     sim_pos, sim_speed, sim_acc, sim_cf_acc = [pos], [speed], [0], [0]
     if isinstance(leaderL, float | int | np.float64 | np.float32):
         leaderL = [leaderL] * len(obs_lx)
     for lx, lv, ll in zip(obs_lx[:-1], obs_lv[:-1], leaderL[:-1]):
-        cf_acc = cf_func(**cf_param, speed=speed, gap=lx - pos - ll, leaderV=lv, interval=dt)
+        cf_acc = cf_func(**cf_param, speed=speed, gap=lx - pos - ll, leaderV=lv, leaderL=ll, interval=dt)
         sim_cf_acc.append(cf_acc)
         if update_method == "Euler":  # 差分型，最常用
             speed_before = speed
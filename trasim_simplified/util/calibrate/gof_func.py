@@ -8,51 +8,148 @@
 # i.e., RMSE(s), Theil’s U (s) and MAE(s) are always more preferable than percentage-based GoFs i.e., RMSPE and MAPE
 #
 # About calibration of car-following dynamics of automated and human-driven vehicles: Methodology, guidelines and codes
+
+sim_x、sim_v可以为二维数组（参数组数 × 仿真步数），此时按行计算，返回每组参数的指标
 """
+from typing import Optional
+
+import numba
 import numpy as np
 
+GOF_RMSE = 0
+GOF_RMSPE = 1
+GOF_THEIL_S_U = 2
+V_TH = 1e-1
+"""RMSPE中不参与速度误差计算的极低速度阈值 [m/s]"""
 
-def RMSE(sim_x, sim_v, obs_x, obs_v, obs_lx, eval_params=None):
+
+@numba.njit(error_model="numpy")
+def _gof_kernel(kind, sim_x, sim_v, obs_x, obs_v, obs_lx, w_dhw, w_v, out):
+    """
+    逐行计算拟合优度，一次遍历得到车头间距与速度指标的加权和，结果写入out
+
+    :param kind: GOF_RMSE、GOF_RMSPE或GOF_THEIL_S_U
+    :param w_dhw: 车头间距指标的权重，为0时不计算
+    :param w_v: 速度指标的权重，为0时不计算
+    """
+    pop_num, step_num = sim_x.shape
+    obs_dhw_std = obs_v_std = 0.
+    if kind == GOF_THEIL_S_U:
+        obs_dhw_mean = obs_v_mean = 0.
+        for i in range(step_num):
+            obs_dhw_mean += obs_x[i] - obs_lx[i]
+            obs_v_mean += obs_v[i]
+        obs_dhw_mean /= step_num
+        obs_v_mean /= step_num
+        for i in range(step_num):
+            obs_dhw_std += (obs_x[i] - obs_lx[i] - obs_dhw_mean) ** 2
+            obs_v_std += (obs_v[i] - obs_v_mean) ** 2
+        obs_dhw_std = np.sqrt(obs_dhw_std / step_num)
+        obs_v_std = np.sqrt(obs_v_std / step_num)
+
+    for j in range(pop_num):
+        value = 0.
+        if w_dhw != 0:
+            err_sum = sim_sum = 0.
+            for i in range(step_num):
+                dhw_obs = obs_x[i] - obs_lx[i]
+                dhw_sim = sim_x[j, i] - obs_lx[i]
+                err = dhw_sim - dhw_obs
+                if kind == GOF_RMSPE:
+                    err /= dhw_obs
+                err_sum += err * err
+                sim_sum += dhw_sim
+            metric = np.sqrt(err_sum / step_num)
+            if kind == GOF_THEIL_S_U:
+                sim_mean = sim_sum / step_num
+                sim_var = 0.
+                for i in range(step_num):
+                    sim_var += (sim_x[j, i] - obs_lx[i] - sim_mean) ** 2
+                metric /= np.sqrt(sim_var / step_num) + obs_dhw_std
+            value += w_dhw * metric
+        if w_v != 0:
+            err_sum = sim_sum = 0.
+            count = 0
+            for i in range(step_num):
+                err = sim_v[j, i] - obs_v[i]
+                if kind == GOF_RMSPE:
+                    if not obs_v[i] > V_TH:
+                        continue
+                    err /= obs_v[i]
+                err_sum += err * err
+                sim_sum += sim_v[j, i]
+                count += 1
+            metric = np.sqrt(err_sum / count)
+            if kind == GOF_THEIL_S_U:
+                sim_mean = sim_sum / step_num
+                sim_var = 0.
+                for i in range(step_num):
+                    sim_var += (sim_v[j, i] - sim_mean) ** 2
+                metric /= np.sqrt(sim_var / step_num) + obs_v_std
+            value += w_v * metric
+        out[j] = value
+    return out
+
+
+def _as_float_array(data) -> np.ndarray:
+    return np.asarray(data, dtype=float)
+
+
+def gof_batch(kind: int, sim_x, sim_v, obs_x, obs_v, obs_lx, w_dhw=1., w_v=0.,
+              out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    拟合优度的编译实现，车头间距与速度指标按权重加和
+
+    :param kind: GOF_RMSE、GOF_RMSPE或GOF_THEIL_S_U
+    :param sim_x: 仿真位置（参数组数 × 仿真步数，或一维）
+    :param sim_v: 仿真速度，w_v为0时可以为None
+    :param obs_lx: 前车位置，可以为标量
+    :param out: 预分配的结果数组，长度为参数组数
+    :return: 各组参数的指标
+    """
+    sim_x = np.atleast_2d(_as_float_array(sim_x))
+    sim_v = sim_x if sim_v is None else np.atleast_2d(_as_float_array(sim_v))
+    obs_x = _as_float_array(obs_x)
+    obs_v = obs_x if obs_v is None else _as_float_array(obs_v)
+    obs_lx = np.broadcast_to(_as_float_array(obs_lx), obs_x.shape)
+    if out is None:
+        out = np.empty(sim_x.shape[0])
+    return _gof_kernel(kind, sim_x, sim_v, obs_x, obs_v, obs_lx, float(w_dhw), float(w_v), out)
+
+
+def get_gof_weights(gof, eval_params=None, alpha_x=1, alpha_v=1) -> tuple[int, float, float]:
+    """
+    将RMSE、RMSPE、Theil_s_U及其eval_params转换为gof_batch的参数
+
+    :return: (kind, w_dhw, w_v)
+    """
     if eval_params is None:
         eval_params = ["dhw"]
-    if "dhw" in eval_params:
-        dhw_sim = np.array(sim_x) - np.array(obs_lx)
-        dhw_obs = np.array(obs_x) - np.array(obs_lx)
-        RMSE_dhw = np.sqrt(np.mean(np.power(dhw_sim - dhw_obs, 2)))
-        return RMSE_dhw
-    if "v" in eval_params:
-        RMSE_v = np.sqrt(np.mean(np.power(sim_v - obs_v, 2)))
-        return RMSE_v
+    if gof is RMSE:
+        # RMSE只计算一项指标，dhw优先
+        return GOF_RMSE, float("dhw" in eval_params), float("dhw" not in eval_params and "v" in eval_params)
+    kind = GOF_RMSPE if gof is RMSPE else GOF_THEIL_S_U
+    return (kind, alpha_x / len(eval_params) if "dhw" in eval_params else 0.,
+            alpha_v / len(eval_params) if "v" in eval_params else 0.)
 
 
-def RMSPE(sim_x, sim_v, obs_x, obs_v, obs_lx, eval_params=None, alpha_x=1, alpha_v=1):
+def _gof(gof_args, sim_x, sim_v, obs_x, obs_v, obs_lx):
+    kind, w_dhw, w_v = gof_args
+    result = gof_batch(kind, sim_x, sim_v, obs_x, obs_v, obs_lx, w_dhw, w_v)
+    return result if np.ndim(sim_x) == 2 else result[0]
+
+
+def RMSE(sim_x, sim_v, obs_x, obs_v, obs_lx, eval_params=None):
     if eval_params is None:
         eval_params = ["dhw"]
-    RMSPE_dhw, RMSPE_v = 0, 0
-    if "dhw" in eval_params:
-        dhw_sim = np.array(sim_x) - np.array(obs_lx)
-        dhw_obs = np.array(obs_x) - np.array(obs_lx)
-        RMSPE_dhw = np.sqrt(np.mean(np.power(
-            (dhw_sim - dhw_obs) / dhw_obs, 2)))
-    if "v" in eval_params:
-        # 极低速度不计算
-        v_th = 1e-1
-        temp = (sim_v - obs_v) / obs_v
-        RMSPE_v = np.sqrt(np.mean(np.power(
-            temp[np.where(np.array(obs_v) > v_th)], 2)))
-    return (alpha_x * RMSPE_dhw + alpha_v * RMSPE_v) / len(eval_params)
+    if "dhw" not in eval_params and "v" not in eval_params:
+        return None
+    return _gof(get_gof_weights(RMSE, eval_params), sim_x, sim_v, obs_x, obs_v, obs_lx)
+
+
+def RMSPE(sim_x, sim_v, obs_x, obs_v, obs_lx, eval_params=None, alpha_x=1, alpha_v=1):
+    return _gof(get_gof_weights(RMSPE, eval_params, alpha_x, alpha_v), sim_x, sim_v, obs_x, obs_v, obs_lx)
 
 
 def Theil_s_U(sim_x, sim_v, obs_x, obs_v, obs_lx, eval_params=None, alpha_x=1, alpha_v=1):
-    if eval_params is None:
-        eval_params = ["dhw"]
-    U_dhw, U_v = 0, 0
-    if "dhw" in eval_params:
-        dhw_sim = np.array(sim_x) - np.array(obs_lx)
-        dhw_obs = np.array(obs_x) - np.array(obs_lx)
-        U_dhw = (RMSE(sim_x, sim_v, obs_x, obs_v, obs_lx, eval_params=["dhw"])
-                 / (np.std(dhw_sim) + np.std(dhw_obs)))
-    if "v" in eval_params:
-        U_v = (RMSE(sim_x, sim_v, obs_x, obs_v, obs_lx, eval_params=["v"])
-               / (np.std(sim_v) + np.std(obs_v)))
-    return (alpha_x * U_dhw + alpha_v * U_v) / len(eval_params)
+    return _gof(get_gof_weights(Theil_s_U, eval_params, alpha_x, alpha_v), sim_x, sim_v, obs_x, obs_v, obs_lx)
@@ -10,12 +10,12 @@ import time
 from typing import Optional
 
 import numpy as np
-from joblib import Parallel, delayed
+from joblib import Parallel, delayed, cpu_count
 from matplotlib import pyplot as plt
 
 from trasim_simplified.core.constant import V_TYPE
 from trasim_simplified.core.data.data_plot import Plot
-from trasim_simplified.core.frame.micro.circle_lane import LaneCircle
+from trasim_simplified.core.frame.micro.circle_lane import LaneCircle, LaneCircleBatch
 from trasim_simplified.core.data.data_processor import Info as P_Info
 from trasim_simplified.core.data.data_container import Info as C_Info
 from trasim_simplified.core.kinematics.cfm import get_cf_model
@@ -65,6 +65,12 @@ class BasicDiagram:
 
         time_ = time.time()
 
+        if kwargs.get("batch", False):
+            self._run_batch(warm_up_step, sim_step, dt, jam, update_method,
+                            kwargs.get("parallel", False), kwargs.get("n_jobs", -1))
+            print(f"time_used: {time.time() - time_:.2f}s")
+            return
+
         def cal(i, car_num):
             time_epoch_begin = time.time()
 
@@ -123,6 +129,60 @@ class BasicDiagram:
                 = zip(*(Parallel(n_jobs=-1)(delayed(cal)(i, car_num) for i, car_num in enumerate(self.car_nums))))
             self.save_result(self.file_name, self.result)
 
+    def _run_batch(self, warm_up_step, sim_step, dt, jam, update_method, parallel, n_jobs):
+        """
+        所有occ对应的环形车道堆叠为一个LaneCircleBatch同时仿真，parallel为True时按进程数分块并行
+
+        结果与逐个occ仿真的circle_kqv_cal一致：V为各仿真步平均速度的均值，K为车辆数/车道长度，Q = V * K
+        """
+        index = [i for i in range(len(self.car_nums)) if not self.check_contain_occ(self.occ_seq[i])]
+        if len(index) == 0:
+            return
+        chunk_num = min(len(index), cpu_count() if n_jobs < 0 else n_jobs) if parallel else 1
+        # 交错分块，使各块的车辆总数接近
+        chunks = [index[j::chunk_num] for j in range(chunk_num)]
+        args = (warm_up_step, sim_step, dt, jam, update_method)
+        if chunk_num > 1:
+            speed_chunks = Parallel(n_jobs=chunk_num)(
+                delayed(self.cal_batch)([self.car_nums[i] for i in chunk], *args) for chunk in chunks)
+        else:
+            speed_chunks = [self.cal_batch([self.car_nums[i] for i in chunk], *args) for chunk in chunks]
+
+        speed = np.empty(len(self.car_nums))
+        for chunk, speed_chunk in zip(chunks, speed_chunks):
+            speed[chunk] = speed_chunk
+        for i in index:
+            k = self.car_nums[i] / self.lane_length * 1000
+            self.result["occ"].append(self.occ_seq[i])
+            self.result["V"].append(speed[i] * 3.6)
+            self.result["Q"].append(speed[i] * 3.6 * k)
+            self.result["K"].append(k)
+        order = np.argsort(self.result["occ"], kind="stable")
+        for key in self.result.keys():
+            self.result[key] = [self.result[key][i] for i in order]
+        self.save_result(self.file_name, self.result)
+
+    def cal_batch(self, car_nums: list[int], warm_up_step, sim_step, dt, jam, update_method) -> np.ndarray:
+        """
+        批量仿真多个车辆数的环形车道
+
+        :return: 各环形车道预热结束后的平均速度 [m/s]
+        """
+        lane = LaneCircleBatch(self.lane_length)
+        lane.set_speed_limit(self.speed_limit)
+        for car_num in car_nums:
+            ring = LaneCircle(self.lane_length)
+            ring.set_speed_limit(self.speed_limit)
+            ring.car_config(car_num, self.car_length, V_TYPE.PASSENGER, self.car_initial_speed,
+                            self.speed_with_random, self.cf_mode, self.cf_param, {})
+            ring.car_load(0 if jam else -1)
+            lane.add_ring(ring)
+
+        for _ in lane.run(warm_up_step=warm_up_step, sim_step=sim_step, dt=dt,
+                          state_update_method=update_method, force_speed_limit=False):
+            pass
+        return lane.get_avg_speed()
+
     def get_by_equilibrium_state_func(self):
         cf_model = get_cf_model(None, self.cf_mode, self.cf_param)
         for i, speed in enumerate(self.result["V"]):